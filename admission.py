@@ -0,0 +1,171 @@
+"""Per-class admission control for request threads.
+
+Every worker process has a fixed number of request threads. Without a
+governor a handful of slow requests (PDF exports, bcrypt logins) can hold
+all of them, and autosaves wait behind them. Routes are therefore put into
+lanes, each with its own concurrency limit, a short bounded queue and a
+queue timeout:
+
+    limit          requests of the lane running at once
+    queue          requests allowed to wait for a slot (0: reject at once)
+    timeout        seconds a queued request waits before being rejected
+    shed_at        when set, the lane refuses new requests outright while
+                   that many governed requests (running or queued, any
+                   lane) already tie up this process's threads
+    pressure       whether the lane's requests count towards shed_at; off
+                   for long-lived requests (event streams) that give their
+                   thread back when the process runs out of threads, so
+                   that they don't shed other lanes' work
+
+shed_at is what gives interactive lanes priority: heavy lanes stop taking
+work as soon as the process gets busy, so they can never occupy the last
+threads. A rejected request gets 503 with the lane's Retry-After.
+
+Limits are per process (each gunicorn worker has its own governor); the
+counters exposed by stats() are too. busy_threads() counts every request
+of the process currently holding a thread, governed or not.
+"""
+import time
+import threading
+
+from flask import g, request
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, lane, reason):
+        super().__init__(f"{lane.name}: {reason}")
+        self.lane = lane
+        self.reason = reason
+
+
+class Lane:
+    def __init__(self, name, limit, queue=0, timeout=0.0, shed_at=None, retry_after=2, pressure=True):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.shed_at = shed_at
+        self.retry_after = retry_after
+        self.pressure = pressure
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {'shed': 0, 'queue_full': 0, 'timeout': 0}
+        self.wait_seconds = 0.0
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'queue': self.queue,
+            'timeout': self.timeout,
+            'shed_at': self.shed_at,
+            'pressure': self.pressure,
+            'active': self.active,
+            'waiting': self.waiting,
+            'peak_waiting': self.peak_waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected': dict(self.rejected),
+            'avg_wait_ms': round(self.wait_seconds / self.queued * 1000, 1) if self.queued else 0.0,
+        }
+
+
+class Governor:
+    def __init__(self, lanes, routes):
+        """lanes: iterable of Lane; routes: endpoint name -> lane name.
+        Endpoints without a lane (static files) are not governed. A request
+        whose slot must outlive it (a streamed response) calls acquire() and
+        release() itself instead of being listed in routes."""
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.routes = dict(routes)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def _pressure(self):
+        return sum(lane.active + lane.waiting for lane in self.lanes.values() if lane.pressure)
+
+    def busy_threads(self):
+        """Requests in a view function, plus held slots of lanes that don't
+        count as pressure (their requests have left the view and stream)."""
+        with self._cond:
+            return self.in_flight + sum(lane.active for lane in self.lanes.values() if not lane.pressure)
+
+    def lane_for(self, endpoint):
+        name = self.routes.get(endpoint)
+        return self.lanes.get(name) if name else None
+
+    def acquire(self, lane):
+        """Take a slot in lane, waiting up to lane.timeout. Raises AdmissionRejected."""
+        with self._cond:
+            if lane.shed_at is not None and self._pressure() >= lane.shed_at:
+                lane.rejected['shed'] += 1
+                raise AdmissionRejected(lane, 'shed')
+            if lane.active < lane.limit and not lane.waiting:
+                lane.active += 1
+                lane.admitted += 1
+                return
+            if lane.waiting >= lane.queue:
+                lane.rejected['queue_full'] += 1
+                raise AdmissionRejected(lane, 'queue_full')
+
+            lane.waiting += 1
+            lane.queued += 1
+            lane.peak_waiting = max(lane.peak_waiting, lane.waiting)
+            started = time.monotonic()
+            deadline = started + lane.timeout
+            try:
+                while lane.active >= lane.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if lane.active < lane.limit:
+                            break
+                        lane.rejected['timeout'] += 1
+                        raise AdmissionRejected(lane, 'timeout')
+            finally:
+                lane.waiting -= 1
+                lane.wait_seconds += time.monotonic() - started
+            lane.active += 1
+            lane.admitted += 1
+
+    def release(self, lane):
+        with self._cond:
+            lane.active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def init_app(self, app, on_reject):
+        """Govern app's requests. on_reject(exc) returns the response for a
+        rejected request."""
+        def count_request():
+            with self._cond:
+                self.in_flight += 1
+            g._admission_counted = True
+
+        def before_request():
+            lane = self.lane_for(request.endpoint)
+            if lane is None:
+                return None
+            try:
+                self.acquire(lane)
+            except AdmissionRejected as e:
+                return on_reject(e)
+            g._admission_lane = lane
+            return None
+
+        def teardown_request(exc):
+            if g.pop('_admission_counted', False):
+                with self._cond:
+                    self.in_flight -= 1
+            lane = g.pop('_admission_lane', None)
+            if lane is not None:
+                self.release(lane)
+
+        # First, so that in_flight also covers requests other hooks answer
+        app.before_request_funcs.setdefault(None, []).insert(0, count_request)
+        app.before_request(before_request)
+        app.teardown_request(teardown_request)
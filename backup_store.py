@@ -0,0 +1,399 @@
+"""Content-addressed, chunk-deduplicated backup store for the SQLite database.
+
+Each snapshot takes a consistent copy of the database through SQLite's
+online backup API, splits it into fixed-size chunks (aligned to SQLite
+pages) and only writes chunks the store doesn't have yet, so a daily
+snapshot costs roughly the pages that changed that day.
+
+Layout (under backups/store by default):
+
+    index.json              snapshot index, newest last
+    snapshots/<id>.json     manifest: ordered chunk hashes, size, sha256
+    chunks/ab/abcdef...     zlib-compressed chunk, named by its sha256
+
+Full database copies made before the store existed (journal_backup_<id>.db)
+can be imported as snapshots dated by their file names; the copies are
+deleted once stored, after which retention applies to them like any other
+snapshot.
+
+Usage:
+    python backup_store.py list
+    python backup_store.py create
+    python backup_store.py import-legacy [BACKUP_DIR]
+    python backup_store.py verify [SNAPSHOT_ID | --all]
+    python backup_store.py restore SNAPSHOT_ID OUTPUT_FILE
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+
+DEFAULT_STORE_DIR = os.path.join('backups', 'store')
+DEFAULT_DATABASE = os.path.join('instance', 'journal.db')
+CHUNK_SIZE = 64 * 1024  # a multiple of every SQLite page size
+LOCK_STALE_SECONDS = 600
+LEGACY_PREFIX = 'journal_backup_'
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock_path = os.path.join(root, '.lock')
+
+    # -- index ---------------------------------------------------------------
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': 1, 'chunk_size': self.chunk_size, 'snapshots': []}
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def snapshots(self):
+        return self.load_index()['snapshots']
+
+    def latest(self):
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def manifest(self, snapshot_id):
+        path = os.path.join(self.root, 'snapshots', f'{snapshot_id}.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackupError(f"Snapshot {snapshot_id} not found")
+
+    # -- locking -------------------------------------------------------------
+
+    def _acquire_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # A crashed writer leaves its lock behind; take over stale ones
+            if time.time() - os.path.getmtime(self.lock_path) < LOCK_STALE_SECONDS:
+                raise BackupError("Another backup is in progress")
+            os.remove(self.lock_path)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+
+    def _release_lock(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    # -- chunks --------------------------------------------------------------
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.root, 'chunks', digest[:2], digest)
+
+    def _write_chunk(self, digest, data):
+        path = self._chunk_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(zlib.compress(data, 6))
+        os.replace(tmp, path)
+
+    def read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    # -- operations ----------------------------------------------------------
+
+    def _store_file(self, path, known):
+        """Write the chunks of path the store doesn't have yet. Returns the
+        manifest fields and how much was written."""
+        chunks = []
+        new_chunks = new_bytes = size = 0
+        whole = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                whole.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                if digest not in known and not os.path.exists(self._chunk_path(digest)):
+                    self._write_chunk(digest, data)
+                    new_chunks += 1
+                    new_bytes += len(data)
+                known.add(digest)
+                chunks.append(digest)
+        return chunks, size, whole.hexdigest(), new_chunks, new_bytes
+
+    def _add_snapshot(self, index, path, known, when):
+        """Store path as a snapshot taken at `when` (a datetime) and add its
+        record to index, kept in time order. The caller writes the index."""
+        chunks, size, sha256, new_chunks, new_bytes = self._store_file(path, known)
+
+        snapshot_id = when.strftime('%Y%m%d_%H%M%S')
+        existing_ids = {s['id'] for s in index['snapshots']}
+        suffix = 1
+        while snapshot_id in existing_ids:
+            snapshot_id = f"{when.strftime('%Y%m%d_%H%M%S')}_{suffix}"
+            suffix += 1
+
+        manifest = {'id': snapshot_id, 'size': size, 'sha256': sha256,
+                    'chunk_size': self.chunk_size, 'chunks': chunks}
+        self._write_json(os.path.join(self.root, 'snapshots', f'{snapshot_id}.json'), manifest)
+
+        record = {
+            'id': snapshot_id,
+            'created_at': when.isoformat(timespec='seconds'),
+            'timestamp': when.timestamp(),
+            'size': size,
+            'sha256': sha256,
+            'chunks': len(chunks),
+            'new_chunks': new_chunks,
+            'new_bytes': new_bytes
+        }
+        index['snapshots'].append(record)
+        index['snapshots'].sort(key=lambda s: s['timestamp'])
+        return record
+
+    def create_snapshot(self, database_file):
+        """Snapshot database_file and return its index record."""
+        if not os.path.exists(database_file):
+            raise BackupError(f"Database file not found: {database_file}")
+
+        self._acquire_lock()
+        try:
+            index = self.load_index()
+            previous = index['snapshots'][-1] if index['snapshots'] else None
+            known = set(self.manifest(previous['id'])['chunks']) if previous else set()
+
+            fd, tmp_copy = tempfile.mkstemp(suffix='.db', dir=self.root)
+            os.close(fd)
+            try:
+                src = sqlite3.connect(database_file)
+                dst = sqlite3.connect(tmp_copy)
+                try:
+                    src.backup(dst)
+                finally:
+                    dst.close()
+                    src.close()
+                record = self._add_snapshot(index, tmp_copy, known, datetime.now())
+            finally:
+                os.remove(tmp_copy)
+
+            self._write_json(self.index_path, index)
+            return record
+        finally:
+            self._release_lock()
+
+    def import_legacy(self, directory):
+        """Import the journal_backup_<YYYYmmdd_HHMMSS>.db full copies in
+        directory as snapshots, oldest first, deleting each copy once it is
+        stored. Files that aren't SQLite databases are left in place.
+        Returns the new records."""
+        paths = []
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+        for name in names:
+            if name.startswith(LEGACY_PREFIX) and name.endswith('.db'):
+                paths.append(os.path.join(directory, name))
+        if not paths:
+            return []
+
+        self._acquire_lock()
+        try:
+            index = self.load_index()
+            known = set()
+            records = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                        continue
+                stamp = os.path.basename(path)[len(LEGACY_PREFIX):-len('.db')]
+                try:
+                    when = datetime.strptime(stamp, '%Y%m%d_%H%M%S')
+                except ValueError:
+                    when = datetime.fromtimestamp(os.path.getmtime(path))
+                records.append(self._add_snapshot(index, path, known, when))
+                self._write_json(self.index_path, index)
+                os.remove(path)
+            return records
+        finally:
+            self._release_lock()
+
+    def prune(self, keep=30):
+        """Drop all but the newest `keep` snapshots and delete chunks that no
+        remaining snapshot references. Returns the removed snapshot ids."""
+        self._acquire_lock()
+        try:
+            index = self.load_index()
+            removed = index['snapshots'][:-keep] if keep > 0 else list(index['snapshots'])
+            if not removed:
+                return []
+            kept = index['snapshots'][len(removed):]
+
+            referenced = set()
+            for snapshot in kept:
+                referenced.update(self.manifest(snapshot['id'])['chunks'])
+            orphaned = set()
+            for snapshot in removed:
+                try:
+                    orphaned.update(self.manifest(snapshot['id'])['chunks'])
+                except BackupError:
+                    pass
+
+            index['snapshots'] = kept
+            self._write_json(self.index_path, index)
+
+            for digest in orphaned - referenced:
+                try:
+                    os.remove(self._chunk_path(digest))
+                except FileNotFoundError:
+                    pass
+            for snapshot in removed:
+                try:
+                    os.remove(os.path.join(self.root, 'snapshots', f"{snapshot['id']}.json"))
+                except FileNotFoundError:
+                    pass
+            return [s['id'] for s in removed]
+        finally:
+            self._release_lock()
+
+    def verify(self, snapshot_id):
+        """Check every chunk and the whole-file hash. Returns a list of problems."""
+        manifest = self.manifest(snapshot_id)
+        problems = []
+        whole = hashlib.sha256()
+        size = 0
+        for position, digest in enumerate(manifest['chunks']):
+            try:
+                data = self.read_chunk(digest)
+            except FileNotFoundError:
+                problems.append(f"chunk {position} missing ({digest})")
+                continue
+            except zlib.error:
+                problems.append(f"chunk {position} corrupt ({digest})")
+                continue
+            if hashlib.sha256(data).hexdigest() != digest:
+                problems.append(f"chunk {position} hash mismatch ({digest})")
+            whole.update(data)
+            size += len(data)
+        if not problems:
+            if size != manifest['size']:
+                problems.append(f"size {size} != {manifest['size']}")
+            if whole.hexdigest() != manifest['sha256']:
+                problems.append("file hash mismatch")
+        return problems
+
+    def restore(self, snapshot_id, output_file):
+        """Reassemble a snapshot into output_file (which must not exist)."""
+        if os.path.exists(output_file):
+            raise BackupError(f"{output_file} already exists")
+        problems = self.verify(snapshot_id)
+        if problems:
+            raise BackupError(f"Snapshot {snapshot_id} failed verification: {'; '.join(problems)}")
+
+        manifest = self.manifest(snapshot_id)
+        tmp = output_file + '.tmp'
+        with open(tmp, 'wb') as f:
+            for digest in manifest['chunks']:
+                f.write(self.read_chunk(digest))
+        os.replace(tmp, output_file)
+        return manifest['size']
+
+
+def _format_size(num):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if num < 1024 or unit == 'GiB':
+            return f"{num:.1f} {unit}" if unit != 'B' else f"{num} B"
+        num /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Journal backup store')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='backup store directory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='list snapshots')
+    create = sub.add_parser('create', help='take a snapshot now')
+    create.add_argument('--db', default=DEFAULT_DATABASE)
+    legacy = sub.add_parser('import-legacy', help='import old journal_backup_*.db copies')
+    legacy.add_argument('directory', nargs='?', default=os.path.dirname(DEFAULT_STORE_DIR))
+    verify = sub.add_parser('verify', help='verify snapshot integrity')
+    verify.add_argument('snapshot', nargs='?', help='snapshot id (default: latest)')
+    verify.add_argument('--all', action='store_true', help='verify every snapshot')
+    restore = sub.add_parser('restore', help='restore a snapshot to a new file')
+    restore.add_argument('snapshot')
+    restore.add_argument('output')
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.store)
+    try:
+        if args.command == 'list':
+            snapshots = store.snapshots()
+            if not snapshots:
+                print("No snapshots")
+            for s in snapshots:
+                print(f"{s['id']}  {s['created_at']}  size {_format_size(s['size'])}  "
+                      f"new {_format_size(s['new_bytes'])} ({s['new_chunks']}/{s['chunks']} chunks)")
+        elif args.command == 'create':
+            record = store.create_snapshot(args.db)
+            print(f"Created {record['id']}: wrote {_format_size(record['new_bytes'])} "
+                  f"of {_format_size(record['size'])}")
+        elif args.command == 'import-legacy':
+            records = store.import_legacy(args.directory)
+            for record in records:
+                print(f"Imported {record['id']}: wrote {_format_size(record['new_bytes'])} "
+                      f"of {_format_size(record['size'])}")
+            print(f"{len(records)} legacy backup(s) imported")
+        elif args.command == 'verify':
+            if args.all:
+                ids = [s['id'] for s in store.snapshots()]
+            elif args.snapshot:
+                ids = [args.snapshot]
+            else:
+                latest = store.latest()
+                ids = [latest['id']] if latest else []
+            failed = False
+            for snapshot_id in ids:
+                problems = store.verify(snapshot_id)
+                print(f"{snapshot_id}: {'OK' if not problems else 'FAILED'}")
+                for problem in problems:
+                    print(f"  {problem}")
+                failed = failed or bool(problems)
+            return 1 if failed else 0
+        elif args.command == 'restore':
+            size = store.restore(args.snapshot, args.output)
+            print(f"Restored {args.snapshot} to {args.output} ({_format_size(size)})")
+            print("Stop the server before replacing instance/journal.db with it.")
+    except BackupError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
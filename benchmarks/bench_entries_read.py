@@ -0,0 +1,84 @@
+"""Benchmark the /api/entries read path on large histories.
+
+Compares the ORM path (JournalEntry objects, content decoded to dicts,
+to_dict() copies, then encoded again) with load_user_entries_json, which
+splices the stored JSON text into the body. Reports CPU time per build and
+the peak Python allocation measured with tracemalloc, and checks that both
+bodies decode to the same entries.
+
+Runs a copy of the backend from a temporary directory: Flask puts the
+database under the app module's instance/ folder, so the real one is
+never touched.
+
+Usage: python benchmarks/bench_entries_read.py [years ...]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_json import make_journal
+
+
+def cpu_ms(fn, number):
+    best = None
+    for _ in range(5):
+        started = time.process_time()
+        for _ in range(number):
+            fn()
+        elapsed = (time.process_time() - started) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(years_list):
+    workdir = tempfile.mkdtemp(prefix='bench-entries-')
+    for module in glob.glob(os.path.join(ROOT, '*.py')):
+        shutil.copy(module, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    import serv
+
+    with serv.app.app_context():
+        for user_id, years in enumerate(years_list, start=1):
+            serv.db.session.add(serv.User(id=user_id, username=f'bench{user_id}', password_hash='x'))
+            serv.db.session.bulk_insert_mappings(serv.JournalEntry, [
+                {'user_id': user_id, 'date': date_key, 'content': content}
+                for date_key, content in make_journal(years).items()
+            ])
+            serv.db.session.commit()
+
+            def orm():
+                return serv.app.json.dumps_bytes(serv.load_user_entries(user_id))
+
+            def raw():
+                return serv.load_user_entries_json(user_id)
+
+            assert json.loads(orm()) == json.loads(raw()), "read paths disagree"
+            number = max(1, int(10 / years))
+            print(f"\n{years} year(s), {serv.count_user_entries(user_id)} entries")
+            for label, fn in (('ORM + dumps_bytes (old)', orm), ('load_user_entries_json', raw)):
+                print(f"  {label:<26} {cpu_ms(fn, number):9.2f} ms CPU "
+                      f"{peak_kib(fn):10.1f} KiB peak {len(fn()) / 1024:10.1f} KiB body")
+            serv.db.session.remove()
+
+
+if __name__ == '__main__':
+    main([float(a) for a in sys.argv[1:]] or [1, 3, 5])
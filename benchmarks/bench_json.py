@@ -0,0 +1,101 @@
+"""Benchmark JSON encoding of /api/entries and export payloads.
+
+Compares the previous encoders (jsonify's sorted stdlib output and the
+indent=2 export) with FastJSONProvider on synthetic multi-year journals
+shaped like real sanitized entries.
+
+Usage: python benchmarks/bench_json.py [years ...]
+"""
+import os
+import sys
+import json
+import random
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from json_provider import FastJSONProvider, orjson
+
+WORDS = ("journée fatigue travail sommeil réveil anxiété marche café ami "
+         "famille pensée calme colère tristesse joie respiration lecture").split()
+
+
+def _text(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def make_entry(rng, day):
+    """Build one entry resembling the output of sanitize_entry_data."""
+    entry = {
+        'date': day.isoformat(),
+        'generalMood': rng.randint(0, 10),
+        'dailyNote': _text(rng, rng.randint(10, 80)),
+        'sleep': {'bedtime': '23:30', 'wake': '07:15', 'quality': rng.randint(0, 10)},
+        'sleepHours': [rng.random() < 0.3 for _ in range(24)],
+        'caffeine': [{'time': f'{rng.randint(6, 18):02d}:00'} for _ in range(rng.randint(0, 3))],
+        'exercise': [{'time': '18:00'}] if rng.random() < 0.4 else [],
+        'timeSlots': [
+            {
+                'time': f'{h:02d}:00',
+                'activities': [
+                    {'id': rng.randint(1, 10**9), 'name': _text(rng, 3),
+                     'plaisir': rng.randint(0, 10), 'maitrise': rng.randint(0, 10),
+                     'satisfaction': rng.randint(0, 10)}
+                    for _ in range(rng.randint(0, 2))
+                ],
+            }
+            for h in range(7, 23)
+        ],
+        'viciousCycles': [],
+    }
+    for _ in range(rng.randint(0, 2)):
+        entry['viciousCycles'].append({
+            'id': rng.randint(1, 10**9),
+            'situation': _text(rng, 15),
+            'emotions': [{'id': i, 'name': rng.choice(WORDS), 'score': rng.randint(0, 10)}
+                         for i in range(rng.randint(1, 4))],
+            'thoughts': [{'id': 1, 'text': _text(rng, 20)}],
+            'behaviors': [{'id': 1, 'text': _text(rng, 10)}],
+            'consequences': [{'id': 1, 'text': _text(rng, 10)}],
+        })
+    return entry
+
+
+def make_journal(years, seed=42):
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    return {e['date']: e for e in
+            (make_entry(rng, start + timedelta(days=i)) for i in range(int(365 * years)))}
+
+
+def bench(label, fn, number):
+    out = fn()
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<34} {seconds * 1000:9.2f} ms {len(out) / 1024:10.1f} KiB")
+
+
+def main(years_list):
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    print(f"FastJSONProvider backend: {provider.backend}")
+    for years in years_list:
+        data = make_journal(years)
+        number = max(1, int(10 / years))
+        print(f"\n{years} year(s), {len(data)} entries")
+        bench('stdlib jsonify (sorted, old)',
+              lambda: json.dumps(data, sort_keys=True).encode('utf-8'), number)
+        bench('stdlib indent=2 export (old)',
+              lambda: json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'), number)
+        bench('stdlib compact',
+              lambda: provider._dumps_std(data).encode('utf-8'), number)
+        if orjson is not None:
+            bench('orjson compact',
+                  lambda: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), number)
+        bench('FastJSONProvider.dumps_bytes',
+              lambda: provider.dumps_bytes(data), number)
+
+
+if __name__ == '__main__':
+    main([float(a) for a in sys.argv[1:]] or [1, 3, 5])
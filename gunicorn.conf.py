@@ -0,0 +1,77 @@
+"""Gunicorn configuration for production.
+
+Usage: gunicorn -c gunicorn.conf.py serv:app   (or: python run_server.py)
+
+Every setting can be overridden through the environment, see below.
+Signals: HUP reloads this config and gracefully replaces workers, TERM
+drains in-flight requests for up to ``graceful_timeout`` seconds. Since
+the app is preloaded, deploying new code needs a full restart (or the
+USR2 + WINCH binary upgrade).
+"""
+import os
+import secrets
+import multiprocessing
+
+# serv.py's import-time init is deferred so that schema creation and the JSON
+# migration run exactly once in the master (on_starting) rather than once
+# per worker.
+os.environ.setdefault('JOURNAL_DEFER_INIT', '1')
+
+# Workers must agree on the secret key; a per-process random key would
+# invalidate every session handled by another worker.
+os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+
+_cpus = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}")
+
+# SQLite takes one writer at a time, so more processes than cores only adds
+# lock contention. Threads cover the I/O waits (DB, filesystem sessions) and
+# the long-lived /api/events streams, each of which holds one thread.
+workers = int(os.getenv('WEB_CONCURRENCY', min(2 * _cpus + 1, 8)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app once in the master; workers fork with it already loaded.
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth; jitter keeps them
+# from all restarting at the same moment.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+proc_name = 'moodix'
+
+
+def on_starting(server):
+    for directory in ('logs', 'instance', 'backups', 'flask_session'):
+        os.makedirs(directory, exist_ok=True)
+    import serv
+    serv.init_app_data()
+    server.log.info("Startup init complete (schema, migration, job schedule)")
+
+
+def post_fork(server, worker):
+    # SQLite connections must never cross a fork: drop whatever the master
+    # opened so each worker starts with a fresh pool.
+    import serv
+    with serv.app.app_context():
+        serv.db.engine.dispose(close=False)
+    serv.log_pipeline.reinit_after_fork()
+    # Every worker runs a scheduler thread; job leases in the DB make sure
+    # each run happens in only one of them (likewise the replication lock)
+    serv.start_background_threads()
+
+
+def worker_exit(server, worker):
+    import serv
+    with serv.app.app_context():
+        serv.db.engine.dispose()
+    serv.log_pipeline.stop()
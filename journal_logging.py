@@ -0,0 +1,170 @@
+"""Non-blocking logging pipeline.
+
+Request threads only push records onto a bounded in-memory queue; a single
+QueueListener thread formats them as JSON lines and does all file writes
+and rotations. Records are routed per level:
+
+    logs/journal.log   everything at or above the app log level
+    logs/errors.log    WARNING and above
+
+High-volume INFO events can be sampled (see LOG_SAMPLING) so that e.g.
+every autosave doesn't produce a log line. Warnings and errors are never
+sampled.
+"""
+import os
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Keep 10% of "Entry saved" lines by default. Keys are message template
+# prefixes, values the fraction kept.
+DEFAULT_SAMPLING = {
+    'Entry saved': 0.1,
+    'Settings saved': 0.5,
+}
+
+# LogRecord attributes that are not user-supplied `extra` fields.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sample_rate'}
+
+
+def parse_sampling(spec):
+    """Parse 'Entry saved=0.1,Settings saved=0.5' into a rate mapping."""
+    rates = {}
+    for part in (spec or '').split(','):
+        if '=' not in part:
+            continue
+        prefix, _, rate = part.rpartition('=')
+        try:
+            rates[prefix.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class JSONLineFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, pid, msg, plus extras."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'msg': record.getMessage(),
+        }
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None:
+            data['sample_rate'] = rate
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a fraction of high-volume records, matched on the message template."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        template = record.msg if isinstance(record.msg, str) else ''
+        for prefix, rate in self.rates.items():
+            if template.startswith(prefix):
+                if rate >= 1.0:
+                    return True
+                record.sample_rate = rate
+                return random.random() < rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: when the queue is full the record is
+    dropped and counted instead of stalling the request thread."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback on the caller's thread (mutable
+        # args are captured as logged, tracebacks aren't picklable) but keep
+        # the traceback in exc_text so it lands in its own JSON field.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class LoggingPipeline:
+    def __init__(self, log_dir='logs', level=logging.INFO, sampling=None,
+                 max_bytes=10000000, backup_count=3, queue_size=10000):
+        os.makedirs(log_dir, exist_ok=True)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.setLevel(level)
+        self.handler.addFilter(SamplingFilter(DEFAULT_SAMPLING if sampling is None else sampling))
+
+        formatter = JSONLineFormatter()
+        main = RotatingFileHandler(os.path.join(log_dir, 'journal.log'),
+                                   maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        main.setLevel(level)
+        main.setFormatter(formatter)
+        errors = RotatingFileHandler(os.path.join(log_dir, 'errors.log'),
+                                     maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        errors.setLevel(logging.WARNING)
+        errors.setFormatter(formatter)
+        self.targets = (main, errors)
+        self.listener = None
+
+    def start(self):
+        """Start the background writer thread."""
+        self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def reinit_after_fork(self):
+        """Restart the writer in a forked worker.
+
+        Threads do not survive fork(): the listener inherited from a
+        preloading master is gone in the child, and the inherited queue may
+        hold a lock taken by it. Both are replaced.
+        """
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.start()
+
+    def stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        self.listener = None
+
+
+def setup_logging(logger, log_dir='logs', level=logging.INFO, sampling=None):
+    """Attach a started LoggingPipeline to ``logger`` and return it."""
+    if sampling is None and os.getenv('LOG_SAMPLING') is not None:
+        sampling = parse_sampling(os.getenv('LOG_SAMPLING'))
+    pipeline = LoggingPipeline(log_dir=log_dir, level=level, sampling=sampling)
+    logger.addHandler(pipeline.handler)
+    logger.setLevel(level)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
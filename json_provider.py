@@ -0,0 +1,96 @@
+"""Fast JSON provider for the Flask app.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Output is compact and unsorted by default: the frontend never
+depends on key order, and sorting/indenting the large /api/entries and
+export payloads is pure CPU cost.
+"""
+import re
+import json
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# A run of 19+ digits may be an integer outside orjson's 64-bit range,
+# which it would read back as a float
+_LONG_NUMBER = re.compile(rb'\d{19,}')
+
+
+def _default(o):
+    """Fallback for types neither encoder handles natively."""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes straight to bytes with orjson if available."""
+
+    sort_keys = False
+    compact = True
+    ensure_ascii = False
+
+    @property
+    def backend(self):
+        return 'orjson' if orjson is not None else 'json'
+
+    def dumps_bytes(self, obj, pretty=False):
+        """Encode ``obj`` to UTF-8 bytes, the form responses are sent in."""
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=_default, option=option)
+            except orjson.JSONEncodeError:
+                # e.g. integers beyond 64 bits, which the stdlib encodes fine
+                pass
+        return self._dumps_std(obj, pretty).encode('utf-8')
+
+    def _dumps_std(self, obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, default=_default, ensure_ascii=self.ensure_ascii,
+                              sort_keys=self.sort_keys, indent=2)
+        return json.dumps(obj, default=_default, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, separators=(',', ':'))
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        if orjson is not None:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return self._dumps_std(obj)
+
+    def loads(self, s, **kwargs):
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers
+        # and Werkzeug's bad-request handling see the usual exception.
+        if orjson is not None and not kwargs:
+            raw = s.encode('utf-8') if isinstance(s, str) else s
+            if not _LONG_NUMBER.search(raw):
+                return orjson.loads(raw)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1,449 @@
+"""Continuous standby replica of the SQLite database, fed by WAL shipping.
+
+One process (the one holding an flock on <replica>.lock; gunicorn workers
+compete for it and a survivor takes over when the holder exits) follows
+the primary's write-ahead log. Every `interval` seconds, if another
+connection has committed (PRAGMA data_version), it reads the frames
+appended since the last shipped position, checks them the way SQLite's
+own recovery does (salts and cumulative checksums, up to the last commit
+frame) and writes the committed page images into the replica. The replica
+therefore trails the primary by about `interval` seconds, and each sync
+costs I/O proportional to what changed, not to the database size.
+
+Keeping the position valid:
+  * The leader always holds a read transaction on the primary ("pin"),
+    moved forward on every sync by opening the next one before closing the
+    previous. While a reader is pinned, no checkpoint can restart the WAL,
+    so frames are never overwritten before they are shipped.
+  * Because of that pin the WAL would never start over by itself. Once
+    restart_frames frames are shipped, the leader takes the write lock,
+    ships the rest, drops the pin for a PASSIVE checkpoint and pins again;
+    the next writer then restarts the WAL (new salts, checkpoint sequence
+    + 1), which the next sync follows from frame 1.
+  * Anything else (a restart that skipped a sequence number, a page size
+    change, a torn apply marked by <replica>.dirty, a new leader finding
+    another WAL generation) falls back to a full copy through SQLite's
+    online backup API, taken under the primary's write lock so its WAL
+    position is exact. Full copies are also how the replica starts, and
+    happen at most once per min_copy_interval (and no more often than
+    COPY_DURATION_FACTOR times the last copy's duration).
+
+A primary that is not in WAL mode is replicated with full copies only.
+
+Pages are written with the replica under an EXCLUSIVE lock; readers open
+it read-only in rollback-journal mode, and the bumped change counter in
+its header makes them drop cached pages.
+
+<replica>.state records the shipped WAL position and when the replica was
+last known to match the primary (its mtime is refreshed on every check
+that finds it current), which gives the replication lag seen by other
+processes and lets a new leader resume without a full copy.
+
+Recovery: stop the server and copy the replica over instance/journal.db.
+"""
+import os
+import json
+import time
+import struct
+import sqlite3
+import logging
+import threading
+
+WAL_MAGIC = (0x377f0682, 0x377f0683)
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+# Shipped frames after which the leader lets the WAL start over
+WAL_RESTART_FRAMES = 1000
+# A full copy may take at most 1/COPY_DURATION_FACTOR of the leader's time
+COPY_DURATION_FACTOR = 10
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only, always leader
+    fcntl = None
+
+
+class ResyncNeeded(Exception):
+    """The WAL no longer continues from the shipped position."""
+
+
+def wal_checksum(data, s0, s1, big_endian):
+    """SQLite's cumulative WAL checksum of data (a multiple of 8 bytes)."""
+    words = struct.unpack(f"{'>' if big_endian else '<'}{len(data) // 4}I", data)
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def wal_header(f):
+    """The WAL header read from file object f, or None if it is missing or
+    invalid (SQLite then treats the WAL as empty)."""
+    header = f.read(WAL_HEADER_SIZE)
+    if len(header) < WAL_HEADER_SIZE:
+        return None
+    magic, _, page_size, checkpoint, salt1, salt2, c1, c2 = struct.unpack('>8I', header)
+    if magic not in WAL_MAGIC or wal_checksum(header[:24], 0, 0, magic & 1) != (c1, c2):
+        return None
+    return {'page_size': page_size, 'checkpoint': checkpoint, 'salt': [salt1, salt2],
+            'checksum': [c1, c2], 'big_endian': magic & 1}
+
+
+def read_wal(path, position=None):
+    """Committed frames of the WAL at path after `position`.
+
+    position is a dict {salt, checkpoint, frame, checksum, page_size} as
+    returned by a previous call, or None to read the current generation
+    from its first frame. Returns (pages, db_size, position): the last
+    image of each page changed by the new commits, the database size in
+    pages after the last of them (None if there is none) and the position
+    to continue from. Raises ResyncNeeded if frames after `position` may
+    have been lost.
+    """
+    empty = {'salt': None, 'checkpoint': None, 'frame': 0, 'checksum': None, 'page_size': None}
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return {}, None, position or empty
+    with f:
+        header = wal_header(f)
+        if header is None:
+            return {}, None, position or empty
+        page_size, checkpoint, salt = header['page_size'], header['checkpoint'], header['salt']
+        generation_start = dict(empty, salt=salt, checkpoint=checkpoint, checksum=header['checksum'],
+                                page_size=page_size)
+
+        if position is None or position['salt'] is None:
+            start = generation_start
+        elif position['page_size'] != page_size:
+            raise ResyncNeeded(f"WAL page size changed to {page_size}")
+        elif position['salt'] == salt:
+            start = position
+        elif checkpoint == (position['checkpoint'] + 1) & 0xFFFFFFFF:
+            # The WAL restarted once; everything before it was shipped
+            start = generation_start
+        else:
+            raise ResyncNeeded(f"WAL checkpoint sequence jumped from {position['checkpoint']} to {checkpoint}")
+
+        frame = start['frame']
+        checksum = tuple(start['checksum'])
+        f.seek(WAL_HEADER_SIZE + frame * (WAL_FRAME_HEADER_SIZE + page_size))
+        pages, pending, db_size = {}, {}, None
+        new_position = start if position is None or start is position else position
+        while True:
+            frame_header = f.read(WAL_FRAME_HEADER_SIZE)
+            if len(frame_header) < WAL_FRAME_HEADER_SIZE:
+                break
+            page, commit, fs1, fs2, fc1, fc2 = struct.unpack('>6I', frame_header)
+            if [fs1, fs2] != salt:
+                break
+            data = f.read(page_size)
+            if len(data) < page_size:
+                break
+            checksum = wal_checksum(frame_header[:8] + data, *checksum, header['big_endian'])
+            if checksum != (fc1, fc2):
+                break
+            frame += 1
+            pending[page] = data
+            if commit:
+                pages.update(pending)
+                pending = {}
+                db_size = commit
+                new_position = dict(start, frame=frame, checksum=list(checksum))
+        return pages, db_size, new_position
+
+
+class Replicator:
+    def __init__(self, primary, replica, interval=2.0, logger=None, min_copy_interval=10.0,
+                 restart_frames=WAL_RESTART_FRAMES):
+        self.primary = primary
+        self.replica = replica
+        self.interval = interval
+        self.min_copy_interval = min_copy_interval
+        self.restart_frames = restart_frames
+        self.logger = logger or logging.getLogger(__name__)
+        self.wal_path = primary + '-wal'
+        self.lock_path = replica + '.lock'
+        self.state_path = replica + '.state'
+        self.dirty_path = replica + '.dirty'
+        self.full_copies = 0
+        self._pid = None
+        self._lock_fd = None
+        self._start_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Connections and descriptors inherited through fork, or left in an
+        # unknown state by a failure, are dropped without being closed
+        self._source = None
+        self._writer = None
+        self._pins = []
+        self._replica_fd = None
+        self._synced = False
+        self._wal = False
+        self._position = None
+        self._last_version = None
+        self._next_copy = 0.0
+
+    # -- status (any process) ------------------------------------------------
+
+    def state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data['checked_at'] = os.path.getmtime(self.state_path)
+            return data
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def lag(self):
+        """Seconds since the replica was last confirmed current, or None."""
+        state = self.state()
+        return None if state is None else max(time.time() - state['checked_at'], 0.0)
+
+    def readable(self, max_lag):
+        lag = self.lag()
+        return lag is not None and lag <= max_lag and os.path.exists(self.replica)
+
+    # -- leader --------------------------------------------------------------
+
+    def _try_lead(self):
+        if self._lock_fd is not None:
+            return True
+        if fcntl is None:
+            self._lock_fd = -1
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self.logger.info("Replication leader: pid %s", os.getpid())
+        return True
+
+    def _connect(self, timeout=10):
+        return sqlite3.connect(self.primary, timeout=timeout, isolation_level=None, check_same_thread=False)
+
+    def _pin(self):
+        """Open a read transaction on the primary, then close the previous
+        one: one is always open, so no checkpoint can restart the WAL over
+        frames that are not shipped yet."""
+        if not self._pins:
+            self._pins = [self._connect(), self._connect()]
+        held, spare = self._pins
+        spare.execute('BEGIN')
+        spare.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        if held.in_transaction:
+            held.execute('COMMIT')
+        self._pins = [spare, held]
+
+    def _unpin(self):
+        for conn in self._pins:
+            if conn.in_transaction:
+                conn.execute('COMMIT')
+
+    def _write_lock(self, timeout):
+        """BEGIN IMMEDIATE on the primary: no commit lands until ROLLBACK."""
+        if self._writer is None:
+            self._writer = self._connect(timeout)
+        self._writer.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+        self._writer.execute('BEGIN IMMEDIATE')
+        return self._writer
+
+    def _write_state(self, started, mode, **extra):
+        state = {
+            'synced_at': time.time(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'mode': mode,
+            'position': self._position,
+            'leader_pid': os.getpid(),
+            **extra
+        }
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _resume(self):
+        """Continue from the position a previous leader recorded, if the WAL
+        is still in that generation and the replica was not left torn."""
+        state = self.state()
+        position = state.get('position') if state else None
+        if not position or position['salt'] is None or os.path.exists(self.dirty_path) \
+                or not os.path.exists(self.replica):
+            return False
+        self._pin()
+        try:
+            with open(self.wal_path, 'rb') as f:
+                header = wal_header(f)
+        except FileNotFoundError:
+            return False
+        if header is None or (header['salt'], header['checkpoint']) != (position['salt'], position['checkpoint']):
+            return False
+        self._position = position
+        self._wal = self._synced = True
+        self.logger.info("Replica resumed at WAL frame %s", position['frame'])
+        return True
+
+    def sync_once(self, force=False):
+        """Bring the replica up to date. Ships new WAL commits; takes a full
+        copy instead when the replica is not known to be consistent or the
+        WAL cannot be followed (force always copies). Returns True if the
+        replica changed."""
+        if self._source is None:
+            self._source = self._connect()
+        if not force and not self._synced and os.path.exists(self.state_path):
+            self._resume()
+        version = self._source.execute('PRAGMA data_version').fetchone()[0]
+        if not force and self._synced:
+            if version == self._last_version:
+                os.utime(self.state_path)
+                return False
+            if self._wal:
+                try:
+                    return self._ship(version)
+                except ResyncNeeded as e:
+                    self.logger.warning("Replica needs a full copy: %s", e)
+                    self._synced = False
+            if time.monotonic() < self._next_copy:
+                return False
+        return self._full_copy()
+
+    def _ship(self, version):
+        started = time.perf_counter()
+        self._pin()
+        pages, db_size, position = read_wal(self.wal_path, self._position)
+        if db_size is None:
+            # A commit not fully in the WAL yet: retried on the next sync
+            self._position = position
+            return False
+        self._apply(pages, db_size, position['page_size'])
+        self._position = position
+        self._last_version = version
+        if position['frame'] >= self.restart_frames:
+            self._rewind_wal()
+        self._write_state(started, 'wal', pages=db_size, shipped_pages=len(pages))
+        return True
+
+    def _rewind_wal(self):
+        """Let the WAL start over: under the write lock ship what is left,
+        then drop the pin for a PASSIVE checkpoint and pin again. If a
+        reader still needs the WAL the checkpoint stays partial and this is
+        retried after the next shipped commit."""
+        try:
+            writer = self._write_lock(timeout=1)
+        except sqlite3.OperationalError:
+            return
+        try:
+            pages, db_size, position = read_wal(self.wal_path, self._position)
+            if db_size is not None:
+                self._apply(pages, db_size, position['page_size'])
+            self._position = position
+            self._last_version = self._source.execute('PRAGMA data_version').fetchone()[0]
+            self._unpin()
+            self._pins[0].execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+            self._pin()
+        finally:
+            writer.execute('ROLLBACK')
+
+    def _apply(self, pages, db_size, page_size):
+        """Write committed page images into the replica."""
+        with open(self.dirty_path, 'w'):
+            pass
+        dest = sqlite3.connect(self.replica, timeout=30, isolation_level=None)
+        try:
+            # Readers wait on this lock, then see the new change counter
+            dest.execute('BEGIN EXCLUSIVE')
+            if self._replica_fd is None:
+                # Kept open: closing a descriptor drops every POSIX lock this
+                # process holds on the file, including SQLite's own
+                self._replica_fd = os.open(self.replica, os.O_RDWR)
+            fd = self._replica_fd
+            header = bytearray(pages[1] if 1 in pages else os.pread(fd, 100, 0))
+            counter = (struct.unpack('>I', os.pread(fd, 4, 24))[0] + 1) & 0xFFFFFFFF
+            # Rollback journal (the primary's pages say WAL), change counter,
+            # page count and the counter value the page count is valid for
+            header[18] = header[19] = 1
+            struct.pack_into('>I', header, 24, counter)
+            struct.pack_into('>I', header, 28, db_size)
+            struct.pack_into('>I', header, 92, counter)
+            for page, data in pages.items():
+                if page != 1 and page <= db_size:
+                    os.pwrite(fd, data, (page - 1) * page_size)
+            os.pwrite(fd, bytes(header), 0)
+            os.ftruncate(fd, db_size * page_size)
+            os.fsync(fd)
+            dest.execute('ROLLBACK')
+        finally:
+            dest.close()
+        os.remove(self.dirty_path)
+
+    def _full_copy(self):
+        started = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(self.replica)), exist_ok=True)
+        # Under the write lock the copy and the WAL position below agree
+        writer = self._write_lock(timeout=30)
+        try:
+            with open(self.dirty_path, 'w'):
+                pass
+            dest = sqlite3.connect(self.replica, timeout=30)
+            try:
+                self._source.backup(dest)
+                # The copied header carries the primary's WAL flag; readers
+                # open the replica read-only, which needs a rollback journal
+                dest.execute('PRAGMA journal_mode=DELETE')
+                pages = dest.execute('PRAGMA page_count').fetchone()[0]
+            finally:
+                dest.close()
+            os.remove(self.dirty_path)
+            self._wal = self._source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            self._position = read_wal(self.wal_path)[2] if self._wal else None
+            self._last_version = self._source.execute('PRAGMA data_version').fetchone()[0]
+            if self._wal:
+                self._pin()
+        finally:
+            writer.execute('ROLLBACK')
+        self._synced = True
+        self.full_copies += 1
+        duration = time.perf_counter() - started
+        self._next_copy = time.monotonic() + max(self.min_copy_interval, duration * COPY_DURATION_FACTOR)
+        self._write_state(started, 'wal' if self._wal else 'copy', pages=pages, full_copy=True)
+        return True
+
+    def _close(self):
+        """Close the primary connections, releasing the pin."""
+        for conn in [self._source, self._writer, *self._pins]:
+            try:
+                if conn is not None:
+                    conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _run(self):
+        while True:
+            if not self._try_lead():
+                time.sleep(self.interval * 5)
+                continue
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.logger.error("Replica sync failed: %s", e)
+                self._close()
+                fd = self._replica_fd
+                self._reset()
+                self._replica_fd = fd
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start this process's replication thread (once per process)."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Locks and connections inherited through fork belong to the parent
+            self._pid = os.getpid()
+            self._lock_fd = None
+            self._reset()
+            threading.Thread(target=self._run, name='replication', daemon=True).start()
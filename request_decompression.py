@@ -0,0 +1,205 @@
+"""Compressed request bodies (Content-Encoding: gzip, deflate, br).
+
+RequestDecompressor is WSGI middleware. For a compressed API request it
+replaces wsgi.input with a stream that inflates on demand, so a body is
+only ever decompressed as far as the application reads it. Two limits
+apply:
+
+    max_wire_length      compressed bytes received (Content-Length, or
+                         counted while reading a chunked body)
+    max_decoded_length   decompressed bytes handed to the application;
+                         path_limits overrides it per path prefix (the
+                         longest matching prefix wins)
+
+Exceeding either answers 413. Decoder output is capped per read, so a
+decompression bomb is stopped after at most one read's worth of output.
+
+Brotli needs the optional brotli package, in a release whose decoder can
+cap its output (output_buffer_limit, brotli >= 1.2); without it "br"
+bodies get 415 like any other unknown encoding.
+"""
+import io
+import json
+import zlib
+
+from flask import Request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.wsgi import LimitedStream
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+if brotli is not None and not hasattr(brotli.Decompressor, 'can_accept_more_data'):
+    # Older decoders can't bound the output of a single call
+    brotli = None
+
+READ_SIZE = 64 * 1024
+ENVIRON_KEY = 'journal.content_encoding'
+
+
+def supported_encodings():
+    encodings = {'gzip', 'x-gzip', 'deflate'}
+    if brotli is not None:
+        encodings.add('br')
+    return encodings
+
+
+class DecompressingStream(io.RawIOBase):
+    def __init__(self, raw, encoding, max_wire_length, max_decoded_length):
+        self._raw = raw
+        self._encoding = encoding
+        self._max_wire = max_wire_length
+        self._max_decoded = max_decoded_length
+        self._decoder = None
+        self._buffer = b''
+        self._done = False
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    def readable(self):
+        return True
+
+    def _read_raw(self):
+        data = self._raw.read(READ_SIZE)
+        self.wire_bytes += len(data)
+        if self._max_wire is not None and self.wire_bytes > self._max_wire:
+            raise RequestEntityTooLarge()
+        return data
+
+    def _count(self, data):
+        self.decoded_bytes += len(data)
+        if self._max_decoded is not None and self.decoded_bytes > self._max_decoded:
+            raise RequestEntityTooLarge()
+        return data
+
+    def _zlib_decoder(self, first):
+        if self._encoding in ('gzip', 'x-gzip'):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # "deflate" should be zlib-wrapped, but some clients send raw deflate
+        wrapped = len(first) >= 2 and first[0] & 0x0F == 8 and ((first[0] << 8) | first[1]) % 31 == 0
+        return zlib.decompressobj(zlib.MAX_WBITS if wrapped else -zlib.MAX_WBITS)
+
+    def _decode_zlib(self, size):
+        while not self._done:
+            data = self._decoder.unconsumed_tail if self._decoder is not None else b''
+            if not data:
+                if self._decoder is not None and self._decoder.eof:
+                    self._done = True
+                    break
+                data = self._read_raw()
+                if not data:
+                    self._done = True
+                    if self._decoder is None:
+                        break
+                    out = self._decoder.flush()
+                    if not self._decoder.eof:
+                        raise BadRequest("Truncated compressed body")
+                    return out
+                if self._decoder is None:
+                    self._decoder = self._zlib_decoder(data)
+            out = self._decoder.decompress(data, size)
+            if out:
+                return out
+        return b''
+
+    def _decode_brotli(self, size):
+        if self._decoder is None:
+            self._decoder = brotli.Decompressor()
+        while not self._buffer and not self._done:
+            # Output held back by the previous call's limit comes first
+            out = self._decoder.process(b'', output_buffer_limit=size)
+            if not out and self._decoder.can_accept_more_data():
+                data = self._read_raw()
+                if not data:
+                    self._done = True
+                    if not self._decoder.is_finished():
+                        raise BadRequest("Truncated compressed body")
+                    break
+                out = self._decoder.process(data, output_buffer_limit=size)
+            self._buffer = self._count(out)
+        out, self._buffer = self._buffer[:size], self._buffer[size:]
+        return out
+
+    def readinto(self, buffer):
+        size = len(buffer)
+        if not size:
+            return 0
+        try:
+            if self._encoding == 'br':
+                out = self._decode_brotli(size)
+            else:
+                out = self._count(self._decode_zlib(size))
+        except (zlib.error, getattr(brotli, 'error', zlib.error)):
+            raise BadRequest("Invalid compressed body")
+        buffer[:len(out)] = out
+        return len(out)
+
+
+class DecompressedRequest(Request):
+    """Flask request class for use with RequestDecompressor: compressed
+    bodies were already limited there, so MAX_CONTENT_LENGTH (checked
+    against the Content-Length of what was sent) does not apply again to
+    their decompressed size."""
+
+    @property
+    def max_content_length(self):
+        if ENVIRON_KEY in self.environ:
+            return None
+        return super().max_content_length
+
+
+class RequestDecompressor:
+    def __init__(self, app, max_wire_length, max_decoded_length, prefix='/api/', path_limits=None):
+        self.app = app
+        self.max_wire_length = max_wire_length
+        self.max_decoded_length = max_decoded_length
+        self.prefix = prefix
+        self.path_limits = sorted((path_limits or {}).items(), key=lambda item: -len(item[0]))
+        self.encodings = supported_encodings()
+
+    def decoded_limit(self, path):
+        for path_prefix, limit in self.path_limits:
+            if path.startswith(path_prefix):
+                return limit
+        return self.max_decoded_length
+
+    @staticmethod
+    def _error(environ, start_response, status, message):
+        body = json.dumps({"error": message}).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding in ('', 'identity') or not environ.get('PATH_INFO', '').startswith(self.prefix):
+            return self.app(environ, start_response)
+        if encoding not in self.encodings:
+            return self._error(environ, start_response, '415 Unsupported Media Type',
+                               f"Unsupported Content-Encoding: {encoding}")
+
+        raw = environ['wsgi.input']
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or -1)
+        except ValueError:
+            content_length = -1
+        if content_length >= 0:
+            if self.max_wire_length is not None and content_length > self.max_wire_length:
+                return self._error(environ, start_response, '413 Request Entity Too Large',
+                                   "Request body too large")
+            raw = LimitedStream(raw, content_length)
+        elif not environ.get('wsgi.input_terminated'):
+            # Same as Werkzeug: a body of unknown length can't be read safely
+            raw = io.BytesIO()
+
+        stream = DecompressingStream(raw, encoding, self.max_wire_length,
+                                     self.decoded_limit(environ['PATH_INFO']))
+        environ['wsgi.input'] = io.BufferedReader(stream, READ_SIZE)
+        environ['wsgi.input_terminated'] = True
+        environ[ENVIRON_KEY] = encoding
+        environ.pop('CONTENT_LENGTH', None)
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.app(environ, start_response)
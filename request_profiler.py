@@ -0,0 +1,335 @@
+"""Admin-toggled request profiling and per-endpoint SQL query budgets.
+
+A profiled request gets:
+  * a sampling profile: a helper thread snapshots the request thread's
+    stack every few milliseconds and aggregates the samples into folded
+    stacks and per-function self/total counts;
+  * the full list of SQL statements it ran, each with its duration.
+
+Which requests are profiled is set in a small JSON config shared by all
+worker processes (enabled, sample_rate, endpoints, user_ids); an admin can
+also force a single request with the "X-Profile: 1" header. Profiles are
+kept as JSON files in a bounded ring (the oldest are dropped), so every
+worker writes to and reads from the same buffer.
+
+Independently of profiling, every request counts its SQL statements.
+Endpoints listed in the budgets mapping that exceed their budget log a
+warning, or raise QueryBudgetExceeded when strict or under app.testing,
+which catches N+1 regressions. count_queries() offers the same check
+around arbitrary code.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MAX_RECORDED_QUERIES = 500
+MAX_STACK_DEPTH = 60
+TOP_STACKS = 50
+TOP_FUNCTIONS = 40
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                labels.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            folded = ';'.join(reversed(labels))
+            self.stacks[folded] = self.stacks.get(folded, 0) + 1
+            self.samples += 1
+
+    def summary(self):
+        functions = {}
+        for folded, count in self.stacks.items():
+            labels = folded.split(';')
+            for label in set(labels):
+                functions.setdefault(label, [0, 0])[1] += count
+            functions[labels[-1]][0] += count
+        top_stacks = sorted(self.stacks.items(), key=lambda item: -item[1])[:TOP_STACKS]
+        top_functions = sorted(functions.items(), key=lambda item: (-item[1][0], -item[1][1]))[:TOP_FUNCTIONS]
+        return {
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'functions': [{'function': label, 'self': own, 'total': total}
+                          for label, (own, total) in top_functions],
+            'stacks': [{'stack': folded, 'count': count} for folded, count in top_stacks],
+        }
+
+
+class ProfileStore:
+    """Bounded ring of profile records stored as one JSON file each."""
+
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+
+    def _files(self):
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def add(self, record):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{int(record['ts'] * 1000):015d}-{record['id']}.json"
+        tmp = os.path.join(self.directory, name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, separators=(',', ':'), default=str)
+        os.replace(tmp, os.path.join(self.directory, name))
+        for old in self._files()[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except FileNotFoundError:
+                pass
+
+    def _load(self, name):
+        try:
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self):
+        """Summaries of the stored profiles, newest first."""
+        summaries = []
+        for name in reversed(self._files()):
+            record = self._load(name)
+            if record is not None:
+                summaries.append({key: value for key, value in record.items()
+                                  if key not in ('queries', 'profile')})
+        return summaries
+
+    def get(self, profile_id):
+        for name in self._files():
+            if name.endswith(f'-{profile_id}.json'):
+                return self._load(name)
+        return None
+
+    def clear(self):
+        for name in self._files():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilerConfig:
+    """Profiling switches in a JSON file, re-read when it changes.
+
+    The file is checked at most once per check_interval seconds, so a
+    request costs no stat() call; other workers see an update within that.
+    """
+
+    DEFAULTS = {'enabled': False, 'sample_rate': 0.0, 'endpoints': [], 'user_ids': []}
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._checked = None
+        self._mtime = None
+        self._values = dict(self.DEFAULTS)
+
+    def get(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return self._values
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime = None
+            self._values = dict(self.DEFAULTS)
+            return self._values
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._values = {**self.DEFAULTS, **json.load(f)}
+            except ValueError:
+                self._values = dict(self.DEFAULTS)
+            self._mtime = mtime
+        return self._values
+
+    def update(self, values):
+        merged = {**self.get(), **values}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(merged, f)
+        os.replace(tmp, self.path)
+        self._checked = None
+        return self.get()
+
+
+class _ActiveProfile:
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_seconds = 0.0
+
+
+class RequestProfiler:
+    def __init__(self, store, config, budgets=None, strict=False, sampling_interval=0.005):
+        self.store = store
+        self.config = config
+        self.budgets = budgets if budgets is not None else {}
+        self.strict = strict
+        self.sampling_interval = sampling_interval
+        self._counter = threading.local()
+
+    def init_app(self, app, user_id=lambda: None, can_force=lambda: False):
+        """Hook into app's request cycle and every SQLAlchemy engine.
+
+        user_id() returns the current user for filtering and records;
+        can_force() tells whether the current request may force profiling.
+        """
+        self.user_id = user_id
+        self.can_force = can_force
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # -- selection -----------------------------------------------------------
+
+    def _wants_profile(self):
+        if request.headers.get('X-Profile') == '1' and self.can_force():
+            return True
+        config = self.config.get()
+        if not config['enabled']:
+            return False
+        if config['endpoints'] and request.endpoint not in config['endpoints']:
+            return False
+        if config['user_ids'] and self.user_id() not in config['user_ids']:
+            return False
+        return random.random() < config['sample_rate']
+
+    # -- request hooks -------------------------------------------------------
+
+    def _before_request(self):
+        g._query_count = 0
+        g._profile = None
+        if self._wants_profile():
+            sampler = StackSampler(threading.get_ident(), self.sampling_interval)
+            g._profile = _ActiveProfile(sampler)
+            sampler.start()
+
+    def _after_request(self, response):
+        count = g.get('_query_count', 0)
+        profile = g.get('_profile')
+        if profile is not None:
+            g._profile = None
+            profile.sampler.stop()
+            self._save(profile, response, count)
+        self.check_budget(request.endpoint, count)
+        return response
+
+    def _teardown_request(self, exc):
+        # Requests that failed before after_request still stop their sampler
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            profile.sampler.stop()
+
+    def _save(self, profile, response, count):
+        record = {
+            'id': uuid.uuid4().hex[:12],
+            'ts': time.time(),
+            'pid': os.getpid(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'user_id': self.user_id(),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - profile.started) * 1000, 2),
+            'query_count': count,
+            'sql_ms': round(profile.sql_seconds * 1000, 2),
+            'queries': profile.queries,
+            'profile': profile.sampler.summary(),
+        }
+        self.store.add(record)
+
+    # -- SQL hooks -----------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        counter = getattr(self._counter, 'value', None)
+        if counter is not None:
+            counter[0] += 1
+        if g:
+            g._query_count = g.get('_query_count', 0) + 1
+            if g.get('_profile') is not None:
+                conn.info.setdefault('_profile_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not g or g.get('_profile') is None or not conn.info.get('_profile_start'):
+            return
+        profile = g._profile
+        elapsed = time.perf_counter() - conn.info['_profile_start'].pop()
+        profile.sql_seconds += elapsed
+        if len(profile.queries) < MAX_RECORDED_QUERIES:
+            profile.queries.append({'sql': statement, 'ms': round(elapsed * 1000, 3)})
+
+    # -- budgets -------------------------------------------------------------
+
+    def check_budget(self, endpoint, count):
+        budget = self.budgets.get(endpoint)
+        if budget is None or count <= budget:
+            return
+        message = f"{endpoint} ran {count} SQL queries (budget {budget})"
+        if self.strict or current_app.testing:
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning("Query budget exceeded: %s", message)
+
+    @contextmanager
+    def count_queries(self, budget=None):
+        """Count SQL statements run on this thread inside the block:
+
+            with profiler.count_queries(budget=3) as counter:
+                client.get('/api/entries')
+            counter[0]  # number of queries
+
+        Raises QueryBudgetExceeded on exit if budget is given and exceeded.
+        """
+        previous = getattr(self._counter, 'value', None)
+        counter = self._counter.value = [0]
+        try:
+            yield counter
+        finally:
+            self._counter.value = previous
+        if budget is not None and counter[0] > budget:
+            raise QueryBudgetExceeded(f"{counter[0]} SQL queries (budget {budget})")
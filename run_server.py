@@ -0,0 +1,67 @@
+"""Production launcher.
+
+Starts gunicorn with gunicorn.conf.py when it is available (Linux/Mac) and
+falls back to waitress otherwise (Windows, or gunicorn not installed).
+
+Usage: python run_server.py [--server auto|gunicorn|waitress] [--host H] [--port P]
+"""
+import os
+import sys
+import argparse
+import importlib.util
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONFIG = os.path.join(BASE_DIR, 'gunicorn.conf.py')
+
+
+def gunicorn_available():
+    return os.name != 'nt' and importlib.util.find_spec('gunicorn') is not None
+
+
+def run_gunicorn(host, port):
+    os.environ.setdefault('GUNICORN_BIND', f'{host}:{port}')
+    argv = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONFIG, 'serv:app']
+    print(f"Starting gunicorn on {os.environ['GUNICORN_BIND']}")
+    os.execv(sys.executable, argv)
+
+
+def run_waitress(host, port):
+    from waitress import serve
+    from serv import app
+
+    threads = int(os.getenv('WAITRESS_THREADS', min(4 * (os.cpu_count() or 1), 16)))
+    print(f"Starting waitress on {host}:{port} with {threads} threads")
+    serve(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        connection_limit=int(os.getenv('WAITRESS_CONNECTION_LIMIT', 200)),
+        channel_timeout=int(os.getenv('WAITRESS_CHANNEL_TIMEOUT', 60)),
+        ident='moodix',
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the journal app in production')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress'],
+                        default=os.getenv('APP_SERVER', 'auto'))
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    args = parser.parse_args()
+
+    os.chdir(BASE_DIR)
+    os.environ.setdefault('FLASK_ENV', 'production')
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if gunicorn_available() else 'waitress'
+
+    if server == 'gunicorn':
+        run_gunicorn(args.host, args.port)
+    else:
+        run_waitress(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,16 +3,18 @@ import json
 import secrets
 import bcrypt
 from functools import wraps
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, send_from_directory, send_file, session, g, has_app_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as SQLAlchemySession
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from flask_session import Session
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from datetime import datetime, timedelta
 import logging
-from logging.handlers import RotatingFileHandler
-import shutil
 import csv
 from io import StringIO, BytesIO
 from reportlab.lib.pagesizes import letter
@@ -22,8 +24,31 @@ from reportlab.lib.units import inch
 from html import escape
 import bleach
 import re
+import time
+import math
+import zlib
+import hashlib
+import threading
+import random
+import socket
+import struct
+import shutil
+import sqlite3
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from json_provider import FastJSONProvider
+from journal_logging import setup_logging
+from backup_store import BackupStore
+from request_profiler import RequestProfiler, ProfileStore, ProfilerConfig
+from replication import Replicator
+from admission import AdmissionRejected, Governor, Lane
+from request_decompression import RequestDecompressor, DecompressedRequest
+from contextlib import contextmanager
 
 app = Flask(__name__, static_folder='static')
+app.json = FastJSONProvider(app)
+app.request_class = DecompressedRequest
 
 FLASK_ENV = os.getenv('FLASK_ENV', 'development').lower()
 IS_PRODUCTION = FLASK_ENV == 'production'
@@ -31,7 +56,20 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(32))
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///journal.db?timeout=10'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True, 'pool_recycle': 3600}
+# Limits what is sent. gzip/deflate/br API bodies may inflate to the same
+# size, except on the paths below (see RequestDecompressor): small for
+# credentials and settings, MAX_DECOMPRESSED_LENGTH for SQLite imports.
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024
+MAX_DECOMPRESSED_LENGTH = int(os.getenv('MAX_DECOMPRESSED_LENGTH', 50 * 1024 * 1024))
+DECOMPRESSED_PATH_LIMITS = {
+    '/api/login': 16 * 1024,
+    '/api/settings': 256 * 1024,
+    '/api/admin/users': 64 * 1024,
+    '/api/admin/users/bulk': app.config['MAX_CONTENT_LENGTH'],
+    '/api/import/': MAX_DECOMPRESSED_LENGTH,
+}
+app.wsgi_app = RequestDecompressor(app.wsgi_app, app.config['MAX_CONTENT_LENGTH'],
+                                   app.config['MAX_CONTENT_LENGTH'], path_limits=DECOMPRESSED_PATH_LIMITS)
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False
@@ -61,7 +99,15 @@ limiter = Limiter(
     strategy="fixed-window"
 )
 
-db = SQLAlchemy(app)
+class RoutingSession(SQLAlchemySession):
+    """Sends queries made inside replica_reads() to the standby replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('_replica_reads'):
+            return replica_engine()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 
 MAX_STRING_LENGTH = 10000
 MAX_CYCLES = 50
@@ -99,13 +145,31 @@ def validate_time(time_str):
     except:
         return False
 
-def validate_number(num, min_val=0, max_val=10):
-    """Validate number is within range"""
-    try:
-        val = int(num) if isinstance(num, str) else num
-        return min_val <= val <= max_val
-    except:
-        return False
+def parse_number(value):
+    """int or float for a JSON number or numeric string, else None.
+
+    Stored entries keep numbers numeric so json_extract() comparisons in SQL
+    agree with the Python filters over archived entries.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return None
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, float) or not math.isfinite(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+def sanitize_mood(mood):
+    """generalMood as a number in 0-10; unset is None, invalid becomes 5."""
+    if mood is None or mood == '':
+        return None
+    number = parse_number(mood)
+    return number if number is not None and 0 <= number <= 10 else 5
 
 def sanitize_entry_data(data):
     """Sanitize and validate entry data"""
@@ -124,11 +188,7 @@ def sanitize_entry_data(data):
             sanitized[field] = sanitize_string(data.get(field, ''))
 
     if 'generalMood' in data:
-        mood = data['generalMood']
-        if mood and not validate_number(mood, 0, 10):
-            sanitized['generalMood'] = 5
-        else:
-            sanitized['generalMood'] = mood
+        sanitized['generalMood'] = sanitize_mood(data['generalMood'])
 
     if 'sleep' in data and isinstance(data['sleep'], dict):
         sleep_obj = data['sleep']
@@ -138,8 +198,8 @@ def sanitize_entry_data(data):
         if 'wake' in sleep_obj and validate_time(sleep_obj['wake']):
             sanitized['sleep']['wake'] = sleep_obj['wake']
         if 'quality' in sleep_obj:
-            quality = sleep_obj['quality']
-            if validate_number(quality, 0, 10):
+            quality = parse_number(sleep_obj['quality'])
+            if quality is not None and 0 <= quality <= 10:
                 sanitized['sleep']['quality'] = int(quality)
 
     for field in ['bedtime', 'wakeup']:
@@ -244,16 +304,8 @@ def sanitize_entry_data(data):
 
     return sanitized
 
-if not os.path.exists('logs'):
-    os.mkdir('logs')
-file_handler = RotatingFileHandler('logs/journal.log', maxBytes=10000000, backupCount=3)
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-app.logger.addHandler(file_handler)
-
-if IS_PRODUCTION:
-    app.logger.setLevel(logging.WARNING)
-else:
-    app.logger.setLevel(logging.DEBUG)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING' if IS_PRODUCTION else 'DEBUG').upper()
+log_pipeline = setup_logging(app.logger, log_dir='logs', level=getattr(logging, LOG_LEVEL, logging.INFO))
 
 @app.before_request
 def verify_origin():
@@ -268,7 +320,7 @@ def verify_origin():
         expected_host = request.host
 
         if parsed_origin.netloc and parsed_origin.netloc != expected_host:
-            app.logger.warning(f"CSRF attempt detected: Origin {origin} doesn't match {expected_host}")
+            app.logger.warning("CSRF attempt detected: Origin %s doesn't match %s", origin, expected_host)
             return jsonify({"error": "Invalid request origin"}), 403
 
     return None
@@ -276,73 +328,132 @@ def verify_origin():
 OLD_DATA_FILE = 'sleep_data.json'
 BACKUP_DIR = 'backups'
 DATABASE_FILE = 'instance/journal.db'
+# Entries older than this many days move to compressed yearly archives (0 disables)
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+# Server-Sent Events: how often a stream checks for changes made by other
+# workers (a stat of CHANGE_STAMP_FILE; the DB is only queried when it
+# moved), and how long a stream stays open before the client reconnects
+SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 2))
+SSE_KEEPALIVE = 15
+SSE_MAX_DURATION = int(os.getenv('SSE_MAX_DURATION', 55))
+CHANGE_STAMP_FILE = os.path.join('instance', 'changes.stamp')
+# Each open stream holds a request thread; see the 'stream' admission lane
+# for the per-worker cap. A stream gives its thread back (the client
+# reconnects and resumes) as soon as all REQUEST_THREADS are busy.
+SSE_MAX_STREAMS_PER_USER = int(os.getenv('SSE_MAX_STREAMS_PER_USER', 2))
+REQUEST_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+CHANGE_EVENT_RETENTION_HOURS = 24
+# Entry revision history: saves closer together than the coalesce window
+# update the latest revision instead of adding one; every REVISION_FULL_EVERY
+# revisions is a full snapshot, the others are deltas against the previous one
+REVISION_COALESCE_SECONDS = int(os.getenv('REVISION_COALESCE_SECONDS', 120))
+REVISION_FULL_EVERY = 20
+REVISION_KEEP = int(os.getenv('REVISION_KEEP', 100))
+REVISION_MAX_AGE_DAYS = int(os.getenv('REVISION_MAX_AGE_DAYS', 180))
+# Account deletion: data is removed PURGE_BATCH_SIZE rows per transaction;
+# accounts with more rows than PURGE_INLINE_MAX_ROWS are purged in the background
+PURGE_BATCH_SIZE = 500
+PURGE_INLINE_MAX_ROWS = int(os.getenv('PURGE_INLINE_MAX_ROWS', 2000))
+PURGE_BATCH_PAUSE = 0.05
+# Background maintenance: the scheduler thread of each worker wakes every
+# MAINTENANCE_TICK seconds (+/- half) and runs the jobs that are due; see
+# MAINTENANCE_JOBS for the default cadences
+MAINTENANCE_ENABLED = os.getenv('MAINTENANCE_ENABLED', '1') == '1'
+MAINTENANCE_TICK = 30
+MAINTENANCE_JITTER = 0.1
+MAINTENANCE_LEASE_SECONDS = 3600
+# Free pages above this share of the file switch the DB to incremental vacuum
+RECLAIM_VACUUM_RATIO = 0.2
+RECLAIM_MAX_PAGES = 2000
+# Standby replica: when REPLICA_PATH is set (ideally on another disk) the
+# primary switches to WAL mode and is checked for commits every
+# REPLICA_SYNC_INTERVAL seconds; new commits are shipped from the WAL, so
+# the replica trails by about that long. Full copies (first sync, resync)
+# happen at most once per REPLICA_MIN_COPY_INTERVAL seconds, see
+# replication.py. REPLICA_READS=1 also sends read-only endpoints to the
+# replica when it is current enough.
+REPLICA_PATH = os.getenv('REPLICA_PATH')
+REPLICA_SYNC_INTERVAL = float(os.getenv('REPLICA_SYNC_INTERVAL', 2))
+REPLICA_MIN_COPY_INTERVAL = float(os.getenv('REPLICA_MIN_COPY_INTERVAL', 10))
+REPLICA_READS = os.getenv('REPLICA_READS') == '1'
+REPLICA_MAX_LAG = 30
+# Per-user SQLite exports: how long a request waits for a build before
+# answering 202, and how many days an export file nobody downloads is kept
+EXPORT_DIR = os.path.join('instance', 'exports')
+EXPORT_WAIT = 5
+EXPORT_BATCH_SIZE = 500
+EXPORT_KEEP_DAYS = int(os.getenv('EXPORT_KEEP_DAYS', 30))
+# Number of request profiles kept in logs/profiles
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+# Concurrency limits per route class, per worker process, e.g. "export=2,auth=4"
+# (see ADMISSION_LANES)
+ADMISSION_LIMITS = os.getenv('ADMISSION_LIMITS')
+# Upper bound for the in-process cache of serialised entries/settings
+READ_CACHE_MAX_BYTES = int(os.getenv('READ_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+backup_store = BackupStore(os.path.join(BACKUP_DIR, 'store'))
 
 def create_backup():
+    """Take a deduplicated snapshot of the database into the backup store."""
     try:
-        if not os.path.exists(BACKUP_DIR):
-            os.makedirs(BACKUP_DIR)
-
         if not os.path.exists(DATABASE_FILE):
             app.logger.warning("Database file not found for backup")
             return False
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = os.path.join(BACKUP_DIR, f'journal_backup_{timestamp}.db')
-
-        shutil.copy2(DATABASE_FILE, backup_file)
-        app.logger.info(f"Backup created: {backup_file}")
+        record = backup_store.create_snapshot(DATABASE_FILE)
+        app.logger.info("Backup created: snapshot %s (%s new bytes of %s)",
+                        record['id'], record['new_bytes'], record['size'])
 
         cleanup_old_backups()
         return True
     except Exception as e:
-        app.logger.error(f"Backup failed: {e}")
+        app.logger.error("Backup failed: %s", e)
         return False
 
-def cleanup_old_backups(keep=30):
+def import_legacy_backups():
+    """Import the full copies left by the backups the store replaced; once
+    imported they are deleted and retention covers them. Runs at startup."""
     try:
-        if not os.path.exists(BACKUP_DIR):
-            return
-
-        backups = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('journal_backup_') and filename.endswith('.db'):
-                filepath = os.path.join(BACKUP_DIR, filename)
-                backups.append((filepath, os.path.getmtime(filepath)))
-
-        backups.sort(key=lambda x: x[1], reverse=True)
+        for record in backup_store.import_legacy(BACKUP_DIR):
+            app.logger.info("Imported legacy backup as snapshot %s", record['id'])
+    except Exception as e:
+        app.logger.error("Legacy backup import failed: %s", e)
 
-        for filepath, _ in backups[keep:]:
-            os.remove(filepath)
-            app.logger.info(f"Removed old backup: {filepath}")
+def cleanup_old_backups(keep=30):
+    try:
+        for snapshot_id in backup_store.prune(keep):
+            app.logger.info("Removed old backup snapshot: %s", snapshot_id)
     except Exception as e:
-        app.logger.error(f"Backup cleanup failed: {e}")
+        app.logger.error("Backup cleanup failed: %s", e)
 
 def should_create_backup():
     try:
-        if not os.path.exists(BACKUP_DIR):
+        latest = backup_store.latest()
+        if not latest:
             return True
-
-        backups = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('journal_backup_') and filename.endswith('.db'):
-                filepath = os.path.join(BACKUP_DIR, filename)
-                backups.append((filepath, os.path.getmtime(filepath)))
-
-        if not backups:
-            return True
-
-        most_recent = max(backups, key=lambda x: x[1])
-        last_backup_time = datetime.fromtimestamp(most_recent[1])
-
-        return (datetime.now() - last_backup_time).total_seconds() > 86400
+        return time.time() - latest['timestamp'] > 86400
     except Exception as e:
-        app.logger.error(f"Backup check failed: {e}")
+        app.logger.error("Backup check failed: %s", e)
         return True
 
+def session_is_valid():
+    """Logged in, and the account has not been deleted since. A deleted
+    account's session is cleared rather than left valid until the purge."""
+    if not session.get('logged_in'):
+        return False
+    user_id = session.get('user_id')
+    if user_id is None:
+        return True
+    row = db.session.query(User.deleted_at).filter(User.id == user_id).first()
+    if row is None or row[0] is not None:
+        session.clear()
+        return False
+    return True
+
 def require_login(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        if not session.get('logged_in'):
+        if not session_is_valid():
             return jsonify({"error": "Not authenticated"}), 401
         return f(*args, **kwargs)
     return decorated
@@ -350,14 +461,104 @@ def require_login(f):
 def require_admin(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        if not session.get('logged_in'):
+        if not session_is_valid():
             return jsonify({"error": "Not authenticated"}), 401
         if not session.get('is_admin'):
-            app.logger.warning(f"Unauthorized admin access attempt by user {session.get('user_id')}")
+            app.logger.warning("Unauthorized admin access attempt by user %s", session.get('user_id'))
             return jsonify({"error": "Admin privileges required"}), 403
         return f(*args, **kwargs)
     return decorated
 
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 1))
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', BCRYPT_WORKERS * 4))
+BCRYPT_TIMEOUT = 10
+
+class HasherBusy(Exception):
+    """The password hashing pool is saturated; answer 503 and let the client retry."""
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool (bcrypt releases the GIL).
+
+    At most max_pending hashes may be queued or running; beyond that calls
+    fail fast with HasherBusy instead of tying up request threads, so a
+    burst of logins cannot starve autosaves.
+    """
+
+    def __init__(self, workers, max_pending, rounds, timeout):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+
+    def _done(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def _submit(self, fn, *args):
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy()
+            self.pending += 1
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            future.cancel()
+            raise HasherBusy()
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def hash_many(self, passwords):
+        """Hash a batch (bulk user creation) on the same pool.
+
+        At most one hash per worker is in flight at a time, so a login
+        arriving meanwhile waits for one round rather than the whole batch.
+        Batch hashes count as pending but never raise HasherBusy.
+        """
+        hashes, in_flight = [], deque()
+        for password in passwords:
+            if len(in_flight) >= self.workers:
+                hashes.append(in_flight.popleft().result())
+            with self._lock:
+                self.pending += 1
+            in_flight.append(self._submit(self._hash, password))
+        hashes.extend(future.result() for future in in_flight)
+        return hashes
+
+    def check(self, password, password_hash):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different cost than configured."""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_MAX_PENDING, BCRYPT_ROUNDS, BCRYPT_TIMEOUT)
+
+def hasher_busy_response():
+    return jsonify({"error": "Server busy, please retry shortly"}), 503, {'Retry-After': '2'}
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -366,10 +567,22 @@ class User(db.Model):
     email = db.Column(db.String(255), unique=True)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    # Incremented on every change to the user's entries or settings
+    data_version = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    # Set once series_points has been backfilled from the user's history
+    series_built = db.Column(db.Boolean, default=False, nullable=False, server_default='0')
+    # Set once the emotion index has been backfilled from the user's history
+    emotions_built = db.Column(db.Boolean, default=False, nullable=False, server_default='0')
+    # Set when an admin deletes the account; its data is then purged in
+    # batches and the row removed last (see purge_user_data)
+    deleted_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     entries = db.relationship('JournalEntry', backref='user', lazy=True, cascade='all, delete-orphan')
     settings = db.relationship('Settings', backref='user', lazy=True, cascade='all, delete-orphan', uselist=False)
+    archives = db.relationship('EntryArchive', backref='user', lazy=True, cascade='all, delete-orphan')
+    series = db.relationship('SeriesPoint', backref='user', lazy=True, cascade='all, delete-orphan')
+    revisions = db.relationship('EntryRevision', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self, include_sensitive=False):
         data = {
@@ -393,10 +606,15 @@ class JournalEntry(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     content = db.Column(db.JSON, nullable=False)
+    # content_hash() of to_dict(); NULL for rows written before it existed
+    content_hash = db.Column(db.String(64))
     __table_args__ = (
         db.UniqueConstraint('user_id', 'date', name='unique_user_date'),
     )
 
+    def current_hash(self):
+        return self.content_hash or content_hash(self.to_dict())
+
     def to_dict(self):
         data = self.content.copy()
         data['date'] = self.date
@@ -409,6 +627,591 @@ class Settings(db.Model):
     data = db.Column(db.JSON, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class EntryArchive(db.Model):
+    """Cold storage: one zlib-compressed JSON blob per user and year.
+
+    The blob maps date -> {"content", "created_at", "updated_at"}.
+    """
+    __tablename__ = 'entry_archives'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    entry_count = db.Column(db.Integer, default=0, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', name='unique_user_year'),
+    )
+
+    def load(self):
+        if not self.data:
+            return {}
+        return json.loads(zlib.decompress(self.data))
+
+    def store(self, items):
+        self.data = zlib.compress(json.dumps(items, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+        self.entry_count = len(items)
+
+class ChangeEvent(db.Model):
+    """Change feed behind /api/events. The id doubles as the event version
+    and clients resume from it (Last-Event-ID), so ids are never reused:
+    AUTOINCREMENT keeps them growing after pruning or purges."""
+    __tablename__ = 'change_events'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    date = db.Column(db.String(10))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_change_events_user_id', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def to_dict(self):
+        data = {'type': self.kind, 'action': self.action, 'version': self.id}
+        if self.date:
+            data['date'] = self.date
+        return data
+
+class SeriesPoint(db.Model):
+    """Precomputed chart rollups: sums and counts per metric for one
+    day, ISO week (bucket = Monday) or month (bucket = 1st)."""
+    __tablename__ = 'series_points'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    resolution = db.Column(db.String(5), nullable=False)
+    bucket = db.Column(db.String(10), nullable=False)
+    mood_sum = db.Column(db.Float, default=0, nullable=False)
+    mood_count = db.Column(db.Integer, default=0, nullable=False)
+    sleep_sum = db.Column(db.Float, default=0, nullable=False)
+    sleep_count = db.Column(db.Integer, default=0, nullable=False)
+    quality_sum = db.Column(db.Float, default=0, nullable=False)
+    quality_count = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'resolution', 'bucket', name='unique_user_series_bucket'),
+    )
+
+class CycleEmotion(db.Model):
+    """One emotion of one vicious cycle, normalised out of entry JSON.
+
+    cycle is the cycle's position in the entry's viciousCycles; name is the
+    normalised emotion name (see emotion_key).
+    """
+    __tablename__ = 'cycle_emotions'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.String(10), nullable=False)
+    cycle = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(200), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    __table_args__ = (
+        db.Index('ix_cycle_emotions_user_date', 'user_id', 'date'),
+    )
+
+class EmotionStat(db.Model):
+    """Monthly rollup per emotion: cycles it appeared in and the score sum."""
+    __tablename__ = 'emotion_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    bucket = db.Column(db.String(10), nullable=False)
+    name = db.Column(db.String(200), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'bucket', 'name', name='unique_user_emotion_bucket'),
+    )
+
+class EmotionPair(db.Model):
+    """Monthly co-occurrence count of two emotions in the same cycle (a < b)."""
+    __tablename__ = 'emotion_pairs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    bucket = db.Column(db.String(10), nullable=False)
+    a = db.Column(db.String(200), nullable=False)
+    b = db.Column(db.String(200), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'bucket', 'a', 'b', name='unique_user_emotion_pair'),
+    )
+
+class EntryRevision(db.Model):
+    """One saved state of an entry.
+
+    kind is 'full' (data = compressed content), 'delta' (data = compressed
+    {"set": {...}, "unset": [...]} of top-level keys against the previous
+    revision) or 'deleted' (no data).
+    """
+    __tablename__ = 'entry_revisions'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.String(10), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    data = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', 'seq', name='unique_user_date_seq'),
+    )
+
+    def payload(self):
+        return json.loads(zlib.decompress(self.data)) if self.data else None
+
+    def set_payload(self, kind, payload):
+        self.kind = kind
+        self.data = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9) \
+            if payload is not None else None
+
+    def to_dict(self):
+        return {
+            'revision': self.seq,
+            'kind': self.kind,
+            'size': len(self.data or b''),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class MaintenanceJob(db.Model):
+    """Schedule, lease and last outcome of one maintenance job.
+
+    A worker runs a job only after claiming its lease with a conditional
+    UPDATE, so each run happens in exactly one gunicorn worker.
+    """
+    __tablename__ = 'maintenance_jobs'
+    name = db.Column(db.String(50), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    lease_owner = db.Column(db.String(100))
+    lease_expires = db.Column(db.DateTime)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Float)
+    last_status = db.Column(db.String(10))
+    last_result = db.Column(db.String(500))
+    runs = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat() if value else None
+        return {
+            'name': self.name,
+            'next_run_at': iso(self.next_run_at),
+            'running': bool(self.lease_expires and self.lease_expires > datetime.utcnow()),
+            'lease_owner': self.lease_owner,
+            'last_started_at': iso(self.last_started_at),
+            'last_finished_at': iso(self.last_finished_at),
+            'last_duration_ms': self.last_duration_ms,
+            'last_status': self.last_status,
+            'last_result': self.last_result,
+            'runs': self.runs
+        }
+
+def content_hash(content):
+    """SHA-256 of the canonical JSON form of sanitised entry content."""
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _archive_item(entry):
+    return {
+        'content': entry.content,
+        'created_at': entry.created_at.isoformat() if entry.created_at else None,
+        'updated_at': entry.updated_at.isoformat() if entry.updated_at else None
+    }
+
+def _archived_to_dict(date_key, item):
+    data = dict(item['content'])
+    data['date'] = date_key
+    return data
+
+def archive_old_entries(max_age_days=None):
+    """Move entries older than max_age_days into the yearly archives.
+
+    Works one (user, year) group per transaction to keep write locks short.
+    Returns the number of entries archived.
+    """
+    if max_age_days is None:
+        max_age_days = ARCHIVE_AFTER_DAYS
+    if not max_age_days or max_age_days <= 0:
+        return 0
+
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime('%Y-%m-%d')
+    groups = db.session.query(JournalEntry.user_id, db.func.substr(JournalEntry.date, 1, 4)) \
+        .filter(JournalEntry.date < cutoff).distinct().all()
+
+    moved = 0
+    for user_id, year in groups:
+        try:
+            entries = JournalEntry.query.filter(
+                JournalEntry.user_id == user_id,
+                JournalEntry.date < cutoff,
+                JournalEntry.date.like(f'{year}-%')
+            ).all()
+            if not entries:
+                continue
+            archive = EntryArchive.query.filter_by(user_id=user_id, year=int(year)).first()
+            if not archive:
+                archive = EntryArchive(user_id=user_id, year=int(year))
+                db.session.add(archive)
+            items = archive.load()
+            for entry in entries:
+                items[entry.date] = _archive_item(entry)
+            archive.store(items)
+            JournalEntry.query.filter(JournalEntry.id.in_([e.id for e in entries])) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+            moved += len(entries)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Archiving failed for user %s, year %s: %s", user_id, year, e)
+
+    if moved:
+        app.logger.info("Archived %s entries older than %s", moved, cutoff)
+    return moved
+
+def unarchive_entry(user_id, date_key):
+    """Remove one entry from its archive blob and return its item, or None.
+
+    Does not commit; the caller commits together with its own change.
+    """
+    archive = EntryArchive.query.filter_by(user_id=user_id, year=int(date_key[:4])).first()
+    if not archive:
+        return None
+    items = archive.load()
+    item = items.pop(date_key, None)
+    if item is None:
+        return None
+    if items:
+        archive.store(items)
+    else:
+        db.session.delete(archive)
+    return item
+
+def load_user_entries(user_id, ordered=False):
+    """All entries of a user as {date: entry dict}, hot and archived.
+
+    Hot rows win over archived copies of the same date.
+    """
+    result = {}
+    archives = EntryArchive.query.filter_by(user_id=user_id).order_by(EntryArchive.year).all()
+    for archive in archives:
+        for date_key, item in archive.load().items():
+            result[date_key] = _archived_to_dict(date_key, item)
+
+    query = JournalEntry.query.filter_by(user_id=user_id)
+    if ordered:
+        query = query.order_by(JournalEntry.date)
+    for entry in query.all():
+        result[entry.date] = entry.to_dict()
+
+    if ordered and archives:
+        result = dict(sorted(result.items()))
+    return result
+
+def load_user_entries_json(user_id, ordered=False):
+    """load_user_entries() already encoded as a JSON object, in UTF-8 bytes.
+
+    Hot rows are selected as the JSON text they are stored as (json_set
+    adds the date) and spliced into the body without being decoded in
+    Python; only archived years go through json.loads and back.
+    """
+    docs = {}
+    archives = EntryArchive.query.filter_by(user_id=user_id).order_by(EntryArchive.year).all()
+    for archive in archives:
+        for date_key, item in archive.load().items():
+            docs[date_key] = app.json.dumps(_archived_to_dict(date_key, item))
+
+    query = db.select(JournalEntry.date, db.func.json_set(JournalEntry.content, '$.date', JournalEntry.date)) \
+        .where(JournalEntry.user_id == user_id)
+    if ordered:
+        query = query.order_by(JournalEntry.date)
+    for date_key, doc in db.session.execute(query):
+        docs[date_key] = doc
+
+    if ordered and archives:
+        docs = dict(sorted(docs.items()))
+    # Dates are YYYY-MM-DD, nothing to escape in the keys
+    return ('{' + ','.join(f'"{date_key}":{doc}' for date_key, doc in docs.items()) + '}').encode('utf-8')
+
+def load_archived_entry(user_id, date_key):
+    """One archived entry as a dict, or None."""
+    archive = EntryArchive.query.filter_by(user_id=user_id, year=int(date_key[:4])).first()
+    if archive:
+        item = archive.load().get(date_key)
+        if item is not None:
+            return _archived_to_dict(date_key, item)
+    return None
+
+def load_user_entry(user_id, date_key):
+    """One entry as a dict, from the hot table or its archive, or None."""
+    entry = JournalEntry.query.filter_by(user_id=user_id, date=date_key).first()
+    if entry:
+        return entry.to_dict()
+    return load_archived_entry(user_id, date_key)
+
+def count_user_entries(user_id):
+    hot = JournalEntry.query.filter_by(user_id=user_id).count()
+    archived = db.session.query(db.func.coalesce(db.func.sum(EntryArchive.entry_count), 0)) \
+        .filter(EntryArchive.user_id == user_id).scalar()
+    return hot + int(archived)
+
+_change_condition = threading.Condition()
+_open_streams = {}
+_open_streams_lock = threading.Lock()
+
+def record_change(user_id, kind, action='saved', date=None):
+    """Queue a change event and bump the user's data version in the current
+    transaction; call notify_change() after commit."""
+    db.session.add(ChangeEvent(user_id=user_id, kind=kind, action=action, date=date))
+    # updated_at is passed through so the bump doesn't trigger its onupdate
+    User.query.filter_by(id=user_id).update(
+        {User.data_version: User.data_version + 1, User.updated_at: User.updated_at},
+        synchronize_session=False
+    )
+
+def get_data_version(user_id):
+    return db.session.query(User.data_version).filter(User.id == user_id).scalar()
+
+class ReadCache:
+    """Size-bounded LRU of serialised per-user payloads, tagged with the
+    data version they were built from.
+
+    Each gunicorn worker has its own cache; staleness is detected by
+    comparing against users.data_version, a primary-key lookup.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] != version:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, version, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._items[key] = (version, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k in self._items if k[1] == user_id]:
+                self.size -= len(self._items.pop(key)[1])
+
+read_cache = ReadCache(READ_CACHE_MAX_BYTES)
+
+replicator = Replicator(DATABASE_FILE, REPLICA_PATH, REPLICA_SYNC_INTERVAL, app.logger,
+                        min_copy_interval=REPLICA_MIN_COPY_INTERVAL) if REPLICA_PATH else None
+_replica_engines = {}
+
+def replica_engine():
+    """Read-only engine on the replica, one per process."""
+    engine = _replica_engines.get(os.getpid())
+    if engine is None:
+        engine = create_engine(f'sqlite:///file:{os.path.abspath(REPLICA_PATH)}?mode=ro&uri=true',
+                               connect_args={'timeout': 10})
+        _replica_engines[os.getpid()] = engine
+    return engine
+
+@contextmanager
+def replica_reads(user_id=None, version=None):
+    """Run the block's queries on the replica if it is current enough.
+
+    For a user's data the replica must already hold their current
+    data_version, so nobody reads back something older than their own last
+    save; other reads accept up to REPLICA_MAX_LAG seconds of lag. Falls
+    back to the primary otherwise. Only for blocks that don't write.
+    """
+    use = REPLICA_READS and replicator is not None and replicator.readable(REPLICA_MAX_LAG)
+    if use and user_id is not None:
+        if version is None:
+            version = get_data_version(user_id)
+        try:
+            with replica_engine().connect() as conn:
+                replica_version = conn.execute(
+                    db.select(User.data_version).where(User.id == user_id)
+                ).scalar()
+        except Exception as e:
+            app.logger.warning("Replica unavailable: %s", e)
+            replica_version = None
+        use = replica_version is not None and version is not None and replica_version >= version
+    if not use:
+        yield False
+        return
+    g._replica_reads = True
+    try:
+        yield True
+    finally:
+        g._replica_reads = False
+
+# Most SQL statements a request to these endpoints may run (checked on every
+# request; a warning in production, an exception under app.testing). Set from
+# the measured worst case, in parentheses, plus a little headroom: maximal
+# entries, first stats request after a save (index rebuild), cold caches.
+# tests/test_query_budgets.py drives each endpoint against its budget.
+QUERY_BUDGETS = {
+    'get_entries': 5,         # (4)
+    'get_entry': 3,           # (2)
+    'query_entries': 4,       # (3)
+    'get_settings': 4,        # (3)
+    'save_settings': 6,       # (5)
+    'save_entry': 21,         # (18)
+    'delete_entry': 18,       # (15)
+    'export_json': 4,         # (3)
+    'export_csv': 4,          # (3)
+    'export_pdf': 4,          # (3)
+    'export_sqlite': 4,       # (2)
+    'get_series': 11,         # (9)
+    'get_emotion_stats': 18,  # (15)
+    'list_revisions': 3,      # (2)
+    'list_users': 3,          # (2)
+    'get_user': 5,            # (4)
+}
+
+profiler = RequestProfiler(
+    ProfileStore(os.path.join('logs', 'profiles'), keep=PROFILE_KEEP),
+    ProfilerConfig(os.path.join('instance', 'profiler.json')),
+    budgets=QUERY_BUDGETS,
+    strict=os.getenv('QUERY_BUDGET_STRICT') == '1'
+)
+profiler.init_app(app, user_id=lambda: session.get('user_id'),
+                  can_force=lambda: bool(session.get('is_admin')))
+
+# Route classes. Sized for gunicorn's default 4 threads per worker: heavy
+# lanes shed as soon as 2 (export) or 3 (auth) governed requests tie up the
+# worker, so at least one thread is always left for autosaves. Interactive
+# lanes never shed and queue for longer.
+# Event streams are idle most of the time and take their slot in the
+# 'stream' lane for as long as they are open (stream_events acquires and
+# releases it, the lane outlives the request). They don't count as
+# pressure: an open stream must not get exports or logins shed. Instead a
+# stream ends, freeing its thread, whenever all of the worker's threads
+# are busy.
+ADMISSION_LANES = {
+    # lane: (limit, queue, queue timeout s, shed_at, Retry-After s, pressure)
+    'write': (16, 32, 10.0, None, 1, True),
+    'read': (8, 16, 5.0, None, 1, True),
+    'export': (1, 1, 2.0, 2, 5, True),
+    'auth': (2, 1, 3.0, 3, 2, True),
+    'stream': (2, 0, 0.0, None, 10, False),
+}
+
+ROUTE_LANES = {
+    'save_entry': 'write',
+    'delete_entry': 'write',
+    'save_settings': 'write',
+    'restore_revision': 'write',
+    'get_entries': 'read',
+    'get_entry': 'read',
+    'query_entries': 'read',
+    'get_settings': 'read',
+    'get_series': 'read',
+    'get_emotion_stats': 'read',
+    'list_revisions': 'read',
+    'get_revision': 'read',
+    'export_json': 'export',
+    'export_csv': 'export',
+    'export_pdf': 'export',
+    'export_sqlite': 'export',
+    'import_sqlite': 'export',
+    'manual_backup': 'export',
+    'run_archive': 'export',
+    'bulk_create_users': 'export',
+    'login': 'auth',
+    'create_user': 'auth',
+    'update_user': 'auth',
+    'reset_user_password': 'auth',
+}
+
+def parse_lane_limits(spec):
+    """Parse 'export=2,auth=4' into per-lane concurrency limits."""
+    limits = {}
+    for part in (spec or '').split(','):
+        name, _, limit = part.partition('=')
+        if name.strip() in ADMISSION_LANES and limit.strip().isdigit() and int(limit) > 0:
+            limits[name.strip()] = int(limit)
+    return limits
+
+def build_governor():
+    limits = parse_lane_limits(ADMISSION_LIMITS)
+    lanes = []
+    for name, (limit, queue, timeout, shed_at, retry_after, pressure) in ADMISSION_LANES.items():
+        limit = limits.get(name, limit)
+        if shed_at is not None:
+            shed_at = max(shed_at, limit)
+        lanes.append(Lane(name, limit, queue, timeout, shed_at, retry_after, pressure))
+    return Governor(lanes, ROUTE_LANES)
+
+def admission_rejected_response(e):
+    app.logger.info("Request shed: %s %s (%s lane, %s)", request.method, request.path, e.lane.name, e.reason)
+    return (jsonify({"error": "Server busy, please retry shortly"}), 503,
+            {'Retry-After': str(e.lane.retry_after)})
+
+governor = build_governor()
+governor.init_app(app, on_reject=admission_rejected_response)
+
+def cached_json_response(kind, user_id, build, raw=False):
+    """JSON response for a per-user payload, served from read_cache while the
+    user's data version is unchanged. Also answers If-None-Match with 304.
+    With raw=True, build() returns the encoded payload itself."""
+    # The version is read before the data: a concurrent save can then only
+    # make the cached payload newer than its tag, never older.
+    version = get_data_version(user_id)
+    if version is None:
+        return app.response_class(build(), mimetype='application/json') if raw else jsonify(build())
+
+    payload = read_cache.get((kind, user_id), version)
+    if payload is None:
+        with replica_reads(user_id, version):
+            data = build()
+        payload = data if raw else app.json.dumps_bytes(data)
+        read_cache.put((kind, user_id), version, payload)
+
+    response = app.response_class(payload, mimetype='application/json')
+    response.set_etag(f'{kind}-{user_id}-{version}')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def change_stamp():
+    try:
+        return os.stat(CHANGE_STAMP_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def notify_change():
+    """Wake this process's event streams. Other workers' streams notice the
+    touched CHANGE_STAMP_FILE on their next poll."""
+    try:
+        with open(CHANGE_STAMP_FILE, 'a'):
+            os.utime(CHANGE_STAMP_FILE)
+    except OSError as e:
+        app.logger.warning("Could not touch %s: %s", CHANGE_STAMP_FILE, e)
+    with _change_condition:
+        _change_condition.notify_all()
+
+def prune_change_events(max_age_hours=CHANGE_EVENT_RETENTION_HOURS):
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    deleted = ChangeEvent.query.filter(ChangeEvent.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
 def migrate_json_to_db():
     if not os.path.exists(OLD_DATA_FILE):
         return
@@ -438,11 +1241,76 @@ def set_security_headers(response):
     response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
     return response
 
-with app.app_context():
-    db.create_all()
-    migrate_json_to_db()
-    if should_create_backup():
-        create_backup()
+# Columns added after their table was first created. db.create_all() only
+# creates missing tables, so existing databases get these via ALTER TABLE.
+SCHEMA_ADDITIONS = {
+    'users': [
+        ('data_version', 'INTEGER NOT NULL DEFAULT 0'),
+        ('series_built', 'BOOLEAN NOT NULL DEFAULT 0'),
+        ('emotions_built', 'BOOLEAN NOT NULL DEFAULT 0'),
+        ('deleted_at', 'DATETIME'),
+    ],
+    'entries': [
+        ('content_hash', 'VARCHAR(64)'),
+    ],
+}
+
+# Expression indexes over entry JSON backing /api/entries/query. Queries only
+# use them when they repeat the exact expression, see ENTRY_QUERY_FIELDS.
+SCHEMA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_entries_mood ON entries (user_id, json_extract(content, '$.generalMood'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_sleep_quality ON entries (user_id, json_extract(content, '$.sleep.quality'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_caffeine ON entries (user_id, json_array_length(content, '$.caffeine'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_exercise ON entries (user_id, json_array_length(content, '$.exercise'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_cannabis ON entries (user_id, json_array_length(content, '$.cannabis'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_medication ON entries (user_id, json_array_length(content, '$.medication'))",
+    "CREATE INDEX IF NOT EXISTS ix_entries_custom ON entries (user_id, json_array_length(content, '$.custom'))",
+]
+
+def ensure_schema():
+    with db.engine.begin() as conn:
+        for table, columns in SCHEMA_ADDITIONS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({table})')}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+                    app.logger.info("Added column %s.%s", table, name)
+        for ddl in SCHEMA_INDEXES:
+            conn.exec_driver_sql(ddl)
+        ensure_change_events_autoincrement(conn)
+        normalize_stored_moods(conn)
+
+def ensure_change_events_autoincrement(conn):
+    """Rebuild a change_events table created without AUTOINCREMENT, whose
+    ids SQLite would reuse once the newest rows are pruned."""
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'change_events'"
+    ).scalar()
+    if not ddl or 'AUTOINCREMENT' in ddl.upper():
+        return
+    columns = ', '.join(column.name for column in ChangeEvent.__table__.columns)
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_change_events_user_id')
+    conn.exec_driver_sql('ALTER TABLE change_events RENAME TO change_events_old')
+    ChangeEvent.__table__.create(conn)
+    conn.exec_driver_sql(f'INSERT INTO change_events ({columns}) SELECT {columns} FROM change_events_old')
+    conn.exec_driver_sql('DROP TABLE change_events_old')
+    app.logger.info("Rebuilt change_events with AUTOINCREMENT ids")
+
+def normalize_stored_moods(conn):
+    """Convert generalMood strings saved by older versions ("7", "") into
+    numbers, so the mood index compares them as numbers."""
+    rows = conn.exec_driver_sql(
+        "SELECT id, date, content FROM entries WHERE json_type(content, '$.generalMood') = 'text'"
+    ).fetchall()
+    for entry_id, date_key, raw in rows:
+        content = json.loads(raw)
+        content['generalMood'] = sanitize_mood(content['generalMood'])
+        conn.exec_driver_sql(
+            'UPDATE entries SET content = ?, content_hash = ? WHERE id = ?',
+            (json.dumps(content), content_hash({**content, 'date': date_key}), entry_id)
+        )
+    if rows:
+        app.logger.info("Normalized generalMood of %s entries", len(rows))
 
 @app.route('/')
 def index():
@@ -487,10 +1355,7 @@ def login():
 
         if not user:
             try:
-                password_matches = bcrypt.checkpw(
-                    password.encode('utf-8'),
-                    PASSWORD_HASH.encode('utf-8')
-                )
+                password_matches = hasher.check(password, PASSWORD_HASH)
                 if username == USERNAME and password_matches:
                     admin_user = User.query.filter_by(username=USERNAME, is_admin=True).first()
                     if not admin_user:
@@ -502,37 +1367,45 @@ def login():
                         )
                         db.session.add(admin_user)
                         db.session.commit()
-                        app.logger.info(f"Auto-created admin user from .env: {USERNAME}")
+                        app.logger.info("Auto-created admin user from .env: %s", USERNAME)
 
                     user = admin_user
                 else:
-                    app.logger.warning(f"Failed login attempt for {username} from {request.remote_addr}")
+                    app.logger.warning("Failed login attempt for %s from %s", username, request.remote_addr)
                     return jsonify({"error": "Invalid credentials"}), 401
+            except HasherBusy:
+                raise
             except Exception as e:
-                app.logger.error(f"Password verification error: {e}")
-                app.logger.warning(f"Failed login attempt for {username} from {request.remote_addr}")
+                app.logger.error("Password verification error: %s", e)
+                app.logger.warning("Failed login attempt for %s from %s", username, request.remote_addr)
                 return jsonify({"error": "Invalid credentials"}), 401
         else:
             if not user.is_active:
-                app.logger.warning(f"Login attempt for inactive user {username} from {request.remote_addr}")
+                app.logger.warning("Login attempt for inactive user %s from %s", username, request.remote_addr)
                 return jsonify({"error": "Account is disabled"}), 403
 
-            password_matches = bcrypt.checkpw(
-                password.encode('utf-8'),
-                user.password_hash.encode('utf-8')
-            )
+            password_matches = hasher.check(password, user.password_hash)
 
             if not password_matches:
-                app.logger.warning(f"Failed login attempt for {username} from {request.remote_addr}")
+                app.logger.warning("Failed login attempt for %s from %s", username, request.remote_addr)
                 return jsonify({"error": "Invalid credentials"}), 401
 
+        # Transparently upgrade hashes made with an older BCRYPT_ROUNDS
+        if hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hasher.hash(password)
+                db.session.commit()
+                app.logger.info("Rehashed password for user %s with cost %s", user.username, hasher.rounds)
+            except HasherBusy:
+                pass  # retried on a later login
+
         session.permanent = True
         session['logged_in'] = True
         session['user_id'] = user.id
         session['username'] = user.username
         session['is_admin'] = user.is_admin
 
-        app.logger.info(f"User {user.username} (ID: {user.id}) logged in from {request.remote_addr}")
+        app.logger.info("User %s (ID: %s) logged in from %s", user.username, user.id, request.remote_addr)
 
         return jsonify({
             "status": "success",
@@ -544,20 +1417,23 @@ def login():
             }
         })
 
+    except HasherBusy:
+        app.logger.warning("Login rejected, password hashing saturated")
+        return hasher_busy_response()
     except Exception as e:
-        app.logger.error(f"Login error: {e}")
+        app.logger.error("Login error: %s", e)
         return jsonify({"error": "Authentication error"}), 500
 
 @app.route('/api/logout', methods=['POST'])
 def logout():
     username = session.get('username')
     session.clear()
-    app.logger.info(f"User {username} logged out")
+    app.logger.info("User %s logged out", username)
     return jsonify({"status": "success", "message": "Logged out"})
 
 @app.route('/api/check-auth', methods=['GET'])
 def check_auth():
-    if session.get('logged_in'):
+    if session_is_valid():
         return jsonify({
             "authenticated": True,
             "username": session.get('username'),
@@ -571,13 +1447,235 @@ def check_auth():
 def get_entries():
     try:
         user_id = session.get('user_id')
-        entries = JournalEntry.query.filter_by(user_id=user_id).all()
-        result = {entry.date: entry.to_dict() for entry in entries}
-        return jsonify(result)
+        return cached_json_response('entries', user_id, lambda: load_user_entries_json(user_id), raw=True)
     except Exception as e:
-        app.logger.error(f"Read error: {e}")
+        app.logger.error("Read error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
+def _sql_extract(path):
+    # The path is rendered inline, not bound, so SQLite matches the index
+    return db.func.json_extract(JournalEntry.content, db.literal_column(f"'{path}'"))
+
+def _sql_count(path):
+    return db.func.json_array_length(JournalEntry.content, db.literal_column(f"'{path}'"))
+
+def _count_of(field):
+    def get(content):
+        value = content.get(field)
+        return len(value) if isinstance(value, list) else None
+    return get
+
+# Filterable fields: SQL expression (mirrors SCHEMA_INDEXES) and the same
+# value read from a content dict, used for archived entries.
+ENTRY_QUERY_FIELDS = {
+    'generalMood': (_sql_extract('$.generalMood'), lambda c: parse_number(c.get('generalMood'))),
+    'sleep.quality': (
+        _sql_extract('$.sleep.quality'),
+        lambda c: parse_number(c['sleep'].get('quality')) if isinstance(c.get('sleep'), dict) else None
+    ),
+}
+for _field in ['exercise', 'caffeine', 'cannabis', 'medication', 'custom']:
+    ENTRY_QUERY_FIELDS[_field] = (_sql_count(f'$.{_field}'), _count_of(_field))
+
+ENTRY_QUERY_OPS = {
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'eq': lambda a, b: a == b,
+}
+
+def parse_entry_filters(args):
+    """Parse ?generalMood.lt=4&caffeine.gte=1 into (field, op, value) triples.
+
+    Returns (filters, error).
+    """
+    filters = []
+    for key, raw in args.items(multi=True):
+        if key in ('from', 'to'):
+            continue
+        field, _, op = key.rpartition('.')
+        if field not in ENTRY_QUERY_FIELDS or op not in ENTRY_QUERY_OPS:
+            return None, f"Unknown filter: {key}"
+        try:
+            value = float(raw)
+        except ValueError:
+            return None, f"Filter {key} needs a number"
+        filters.append((field, op, int(value) if value.is_integer() else value))
+    if len(filters) > 10:
+        return None, "Too many filters"
+    return filters, None
+
+def query_user_entries(user_id, filters, date_from=None, date_to=None):
+    """Entries of a user matching all filters, as {date: entry} ordered by date.
+
+    Hot entries are filtered in SQL through the expression indexes; archived
+    years overlapping the date range are filtered in Python.
+    """
+    query = JournalEntry.query.filter(JournalEntry.user_id == user_id)
+    if date_from:
+        query = query.filter(JournalEntry.date >= date_from)
+    if date_to:
+        query = query.filter(JournalEntry.date <= date_to)
+    for field, op, value in filters:
+        query = query.filter(ENTRY_QUERY_OPS[op](ENTRY_QUERY_FIELDS[field][0], value))
+
+    result = {}
+    archives = EntryArchive.query.filter(EntryArchive.user_id == user_id)
+    if date_from:
+        archives = archives.filter(EntryArchive.year >= int(date_from[:4]))
+    if date_to:
+        archives = archives.filter(EntryArchive.year <= int(date_to[:4]))
+    for archive in archives.all():
+        for date_key, item in archive.load().items():
+            if (date_from and date_key < date_from) or (date_to and date_key > date_to):
+                continue
+            if all(_matches(item['content'], field, op, value) for field, op, value in filters):
+                result[date_key] = _archived_to_dict(date_key, item)
+
+    for entry in query.all():
+        result[entry.date] = entry.to_dict()
+    return dict(sorted(result.items()))
+
+def _matches(content, field, op, value):
+    actual = ENTRY_QUERY_FIELDS[field][1](content)
+    if isinstance(actual, bool) or not isinstance(actual, (int, float)):
+        return False
+    return ENTRY_QUERY_OPS[op](actual, value)
+
+@app.route('/api/entries/query', methods=['GET'])
+@require_login
+def query_entries():
+    """Filter entries server-side, e.g. ?generalMood.lt=4&sleep.quality.lt=5&caffeine.gte=1
+
+    Operators: lt, lte, gt, gte, eq. Optional from/to date bounds (YYYY-MM-DD).
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    for value in (date_from, date_to):
+        if value and not validate_date(value):
+            return jsonify({"error": "Invalid date format"}), 400
+
+    filters, error = parse_entry_filters(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        user_id = session.get('user_id')
+        with replica_reads(user_id):
+            entries = query_user_entries(user_id, filters, date_from, date_to)
+        return jsonify({"entries": entries, "count": len(entries)})
+    except Exception as e:
+        app.logger.error("Query error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/entries/<date>', methods=['GET'])
+@require_login
+def get_entry(date):
+    """Fetch a single entry, e.g. after an /api/events notification"""
+    if not validate_date(date):
+        return jsonify({"error": "Invalid date format"}), 400
+
+    try:
+        entry = load_user_entry(session.get('user_id'), date)
+        if entry is None:
+            return jsonify({"error": "Entry not found"}), 404
+        response = jsonify(entry)
+        response.headers['X-Entry-Hash'] = content_hash(entry)
+        return response
+    except Exception as e:
+        app.logger.error("Read error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/events', methods=['GET'])
+@require_login
+def stream_events():
+    """Server-Sent Events stream of this user's entry/settings changes.
+
+    Streams are closed after SSE_MAX_DURATION, or earlier when the worker
+    needs the thread; EventSource reconnects on its own and resumes from
+    the Last-Event-ID header. Open streams are capped per worker (the
+    'stream' lane) and per user; over either cap the request gets 503 with
+    Retry-After.
+    """
+    user_id = session.get('user_id')
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+
+    try:
+        if last_id is not None:
+            last_id = int(last_id)
+        else:
+            last_id = db.session.query(db.func.coalesce(db.func.max(ChangeEvent.id), 0)) \
+                .filter(ChangeEvent.user_id == user_id).scalar()
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid event id"}), 400
+
+    lane = governor.lanes['stream']
+    with _open_streams_lock:
+        if _open_streams.get(user_id, 0) >= SSE_MAX_STREAMS_PER_USER:
+            app.logger.info("Event stream refused for user %s: %s already open", user_id, SSE_MAX_STREAMS_PER_USER)
+            return (jsonify({"error": "Too many open event streams"}), 503,
+                    {'Retry-After': str(lane.retry_after)})
+        _open_streams[user_id] = _open_streams.get(user_id, 0) + 1
+
+    def release_user():
+        with _open_streams_lock:
+            _open_streams[user_id] -= 1
+            if not _open_streams[user_id]:
+                del _open_streams[user_id]
+
+    try:
+        governor.acquire(lane)
+    except AdmissionRejected as e:
+        release_user()
+        return admission_rejected_response(e)
+
+    def release():
+        governor.release(lane)
+        release_user()
+
+    def generate(last_id):
+        started = time.monotonic()
+        last_sent = last_checked = started
+        stamp = None
+        yield "retry: 3000\n\n"
+        while time.monotonic() - started < SSE_MAX_DURATION:
+            # Query only after a change somewhere (or once per keepalive,
+            # in case a writer could not touch the stamp)
+            current = change_stamp()
+            payloads = []
+            if current is None or current != stamp or time.monotonic() - last_checked >= SSE_KEEPALIVE:
+                stamp, last_checked = current, time.monotonic()
+                with app.app_context():
+                    events = ChangeEvent.query.filter(ChangeEvent.user_id == user_id, ChangeEvent.id > last_id) \
+                        .order_by(ChangeEvent.id).limit(100).all()
+                    payloads = [(event.id, event.kind, app.json.dumps(event.to_dict())) for event in events]
+                    db.session.remove()
+
+            for event_id, kind, payload in payloads:
+                yield f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+                last_id = event_id
+                last_sent = time.monotonic()
+
+            if not payloads and time.monotonic() - last_sent >= SSE_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+            with _change_condition:
+                _change_condition.wait(SSE_POLL_INTERVAL)
+
+            if governor.busy_threads() >= REQUEST_THREADS:
+                # Requests may be queued behind this idle stream; the client
+                # reconnects after `retry` and resumes where it left off
+                break
+
+    response = app.response_class(generate(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Runs when the server closes the body: stream ended or client went away
+    response.call_on_close(release)
+    return response
+
 def validate_journal_entry(data):
     """Validate journal entry data to prevent injection and corruption"""
     if not isinstance(data, dict):
@@ -633,6 +1731,30 @@ def validate_journal_entry(data):
 
     return True, None
 
+def write_entry(user_id, date_key, content, entry):
+    """Create or update an entry along with its revision, chart series and
+    change event. `entry` is the hot row the caller already loaded for
+    date_key, or None. Does not commit."""
+    if entry:
+        previous = entry.content
+        entry.content = content
+    else:
+        previous = None
+        entry = JournalEntry(user_id=user_id, date=date_key, content=content)
+        # Editing an archived day brings it back into the hot table
+        archived = unarchive_entry(user_id, date_key)
+        if archived:
+            previous = archived['content']
+            if archived.get('created_at'):
+                entry.created_at = datetime.fromisoformat(archived['created_at'])
+        db.session.add(entry)
+    entry.content_hash = content_hash(entry.to_dict())
+    record_revision(user_id, date_key, previous, content)
+    update_series(user_id, date_key, previous, content)
+    update_emotions(user_id, date_key, previous, content)
+    record_change(user_id, 'entry', 'saved', date_key)
+    return entry
+
 @app.route('/api/save', methods=['POST'])
 @require_login
 def save_entry():
@@ -643,26 +1765,35 @@ def save_entry():
 
     sanitized_data = sanitize_entry_data(data)
     if not sanitized_data or 'date' not in sanitized_data:
-        app.logger.warning(f"Invalid entry data from user {session.get('user_id')}")
+        app.logger.warning("Invalid entry data from user %s", session.get('user_id'))
         return jsonify({"error": "Invalid entry data"}), 400
 
     date_key = sanitized_data['date']
     user_id = session.get('user_id')
 
     try:
+        # Autosaves and offline-queue retries often resend what is already
+        # stored; answer those without opening a write transaction
+        digest = content_hash(sanitized_data)
         entry = JournalEntry.query.filter_by(user_id=user_id, date=date_key).first()
-
-        if entry:
-            entry.content = sanitized_data
-        else:
-            entry = JournalEntry(user_id=user_id, date=date_key, content=sanitized_data)
-            db.session.add(entry)
+        if entry and entry.current_hash() == digest:
+            return jsonify({"status": "success", "unchanged": True, "hash": digest, "data": entry.to_dict()})
+        if entry is None:
+            # Same for an archived day: resending it must not unarchive it
+            archived = load_archived_entry(user_id, date_key)
+            if archived is not None and content_hash(archived) == digest:
+                return jsonify({"status": "success", "unchanged": True, "hash": digest, "data": archived})
+
+        entry = write_entry(user_id, date_key, sanitized_data, entry)
+        # Serialised before the commit expires the row
+        response = jsonify({"status": "success", "hash": digest, "data": entry.to_dict()})
         db.session.commit()
-        app.logger.info(f"Entry saved: {date_key} for user {user_id}")
-        return jsonify({"status": "success", "data": entry.to_dict()})
+        notify_change()
+        app.logger.info("Entry saved: %s for user %s", date_key, user_id)
+        return response
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Write error: {e}")
+        app.logger.error("Write error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/delete/<date>', methods=['DELETE'])
@@ -678,14 +1809,24 @@ def delete_entry(date):
     try:
         entry = JournalEntry.query.filter_by(user_id=user_id, date=date).first()
         if entry:
+            previous = entry.content
             db.session.delete(entry)
-            db.session.commit()
-            app.logger.info(f"Entry deleted: {date} for user {user_id}")
-            return jsonify({"status": "deleted"})
-        return jsonify({"status": "not found"}), 404
+        else:
+            archived = unarchive_entry(user_id, date)
+            if archived is None:
+                return jsonify({"status": "not found"}), 404
+            previous = archived['content']
+        record_revision(user_id, date, previous, None)
+        update_series(user_id, date, previous, None)
+        update_emotions(user_id, date, previous, None)
+        record_change(user_id, 'entry', 'deleted', date)
+        db.session.commit()
+        notify_change()
+        app.logger.info("Entry deleted: %s for user %s", date, user_id)
+        return jsonify({"status": "deleted"})
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Delete error: {e}")
+        app.logger.error("Delete error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/settings', methods=['GET'])
@@ -693,25 +1834,28 @@ def delete_entry(date):
 def get_settings():
     try:
         user_id = session.get('user_id')
-        settings = Settings.query.filter_by(user_id=user_id).first()
-        if settings:
-            return jsonify(settings.data)
-        return jsonify({})
+
+        def build():
+            settings = Settings.query.filter_by(user_id=user_id).first()
+            return settings.data if settings else {}
+
+        return cached_json_response('settings', user_id, build)
     except Exception as e:
-        app.logger.error(f"Settings read error: {e}")
+        app.logger.error("Settings read error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/settings', methods=['POST'])
 @require_login
 def save_settings():
+    # Read outside the try: a 400/413 from the body must not become a 500
+    data = request.json
     try:
-        data = request.json
         user_id = session.get('user_id')
 
         if not data or not isinstance(data, dict):
             return jsonify({"error": "Invalid settings data"}), 400
 
-        if len(json.dumps(data)) > 100000:
+        if len(app.json.dumps_bytes(data)) > 100000:
             return jsonify({"error": "Settings data too large"}), 400
 
         settings = Settings.query.filter_by(user_id=user_id).first()
@@ -722,12 +1866,14 @@ def save_settings():
             settings = Settings(user_id=user_id, data=data)
             db.session.add(settings)
 
+        record_change(user_id, 'settings')
         db.session.commit()
-        app.logger.info(f"Settings saved for user {user_id}")
+        notify_change()
+        app.logger.info("Settings saved for user %s", user_id)
         return jsonify({"status": "success"})
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Settings save error: {e}")
+        app.logger.error("Settings save error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/export/json', methods=['GET'])
@@ -736,18 +1882,22 @@ def export_json():
     """Export all journal entries as JSON"""
     try:
         user_id = session.get('user_id')
-        entries = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.date).all()
-        data = {entry.date: entry.to_dict() for entry in entries}
+        pretty = request.args.get('pretty', '').lower() in ('1', 'true', 'yes')
+        with replica_reads(user_id):
+            if pretty:
+                body = app.json.dumps_bytes(load_user_entries(user_id, ordered=True), pretty=True)
+            else:
+                body = load_user_entries_json(user_id, ordered=True)
 
         from flask import make_response
-        response = make_response(json.dumps(data, indent=2, ensure_ascii=False))
-        response.headers['Content-Type'] = 'application/json'
+        response = make_response(body)
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
         response.headers['Content-Disposition'] = f'attachment; filename=journal_export_{datetime.now().strftime("%Y%m%d")}.json'
 
-        app.logger.info(f"JSON export completed for user {user_id}")
+        app.logger.info("JSON export completed for user %s", user_id)
         return response
     except Exception as e:
-        app.logger.error(f"JSON export error: {e}")
+        app.logger.error("JSON export error: %s", e)
         return jsonify({"error": "Export failed"}), 500
 
 @app.route('/api/export/csv', methods=['GET'])
@@ -756,7 +1906,8 @@ def export_csv():
     """Export all journal entries as CSV"""
     try:
         user_id = session.get('user_id')
-        entries = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.date).all()
+        with replica_reads(user_id):
+            entries = load_user_entries(user_id, ordered=True)
 
         output = StringIO()
         writer = csv.writer(output)
@@ -765,8 +1916,7 @@ def export_csv():
         writer.writerow(['Date', 'Sleep Time', 'Mood', 'Notes', 'Dreams', 'Goals', 'Gratitude', 'Tags'])
 
         # Write data
-        for entry in entries:
-            data = entry.to_dict()
+        for data in entries.values():
             writer.writerow([
                 data.get('date', ''),
                 data.get('sleepTime', ''),
@@ -783,10 +1933,10 @@ def export_csv():
         response.headers['Content-Type'] = 'text/csv'
         response.headers['Content-Disposition'] = f'attachment; filename=journal_export_{datetime.now().strftime("%Y%m%d")}.csv'
 
-        app.logger.info(f"CSV export completed for user {user_id}")
+        app.logger.info("CSV export completed for user %s", user_id)
         return response
     except Exception as e:
-        app.logger.error(f"CSV export error: {e}")
+        app.logger.error("CSV export error: %s", e)
         return jsonify({"error": "Export failed"}), 500
 
 @app.route('/api/export/pdf', methods=['GET'])
@@ -795,7 +1945,8 @@ def export_pdf():
     """Export all journal entries as PDF"""
     try:
         user_id = session.get('user_id')
-        entries = JournalEntry.query.filter_by(user_id=user_id).order_by(JournalEntry.date).all()
+        with replica_reads(user_id):
+            entries = load_user_entries(user_id, ordered=True)
 
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -814,9 +1965,7 @@ def export_pdf():
         story.append(Spacer(1, 0.2*inch))
 
         # Add entries
-        for entry in entries:
-            data = entry.to_dict()
-
+        for data in entries.values():
             # Date header
             date_style = ParagraphStyle(
                 'DateHeader',
@@ -862,7 +2011,7 @@ def export_pdf():
         app.logger.info("PDF export completed")
         return response
     except Exception as e:
-        app.logger.error(f"PDF export error: {e}")
+        app.logger.error("PDF export error: %s", e)
         return jsonify({"error": "Export failed"}), 500
 
 @app.route('/api/backup/create', methods=['POST'])
@@ -876,9 +2025,1073 @@ def manual_backup():
         else:
             return jsonify({"error": "Backup failed"}), 500
     except Exception as e:
-        app.logger.error(f"Manual backup error: {e}")
+        app.logger.error("Manual backup error: %s", e)
         return jsonify({"error": "Backup failed"}), 500
 
+# ============================================================================
+# SQLITE EXPORT / IMPORT
+# ============================================================================
+
+SQLITE_EXPORT_FORMAT = 'moodix-journal'
+SQLITE_EXPORT_VERSION = 1
+
+SQLITE_EXPORT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS entries (
+    date TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS settings (id INTEGER PRIMARY KEY CHECK (id = 1), data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS archive_years (year INTEGER PRIMARY KEY, updated_at TEXT);
+"""
+
+_export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-export')
+_export_builds = {}
+_export_lock = threading.Lock()
+
+def sqlite_export_path(user_id):
+    return os.path.join(EXPORT_DIR, f'user-{user_id}.sqlite')
+
+def _open_sqlite_readonly(path):
+    conn = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True)
+    # Views and triggers of an untrusted file must not call SQL functions
+    conn.execute('PRAGMA trusted_schema = OFF')
+    return conn
+
+def _sqlite_export_meta(path):
+    """The meta table of an export file as a dict, or None."""
+    try:
+        conn = _open_sqlite_readonly(path)
+        try:
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    if meta.get('format') != SQLITE_EXPORT_FORMAT or meta.get('format_version') != str(SQLITE_EXPORT_VERSION):
+        return None
+    return meta
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def build_sqlite_export(user_id):
+    """Bring the user's export file up to the current data version and
+    return (path, version).
+
+    The previous file is copied and patched: only entries whose content hash
+    changed are rewritten, and an archive year is only decompressed when
+    its blob changed. The new file replaces the old one atomically, so
+    downloads in progress keep reading a complete file.
+    """
+    version = get_data_version(user_id)
+    path = sqlite_export_path(user_id)
+    previous = _sqlite_export_meta(path) if os.path.exists(path) else None
+    if previous and previous.get('data_version') == str(version):
+        return path, version
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    if previous:
+        shutil.copyfile(path, tmp)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+
+    try:
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.executescript(SQLITE_EXPORT_SCHEMA)
+            existing = {row[0]: (row[1], row[2]) for row in
+                        conn.execute('SELECT date, content_hash, archived FROM entries')}
+            known_years = dict(conn.execute('SELECT year, updated_at FROM archive_years'))
+            wanted = {}
+            rows = []
+
+            def stage(date_key, data, created_at, updated_at, archived, digest=None):
+                state = (digest or content_hash(data), archived)
+                wanted[date_key] = state
+                if existing.get(date_key) != state:
+                    rows.append((date_key, json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+                                 state[0], created_at, updated_at, archived))
+
+            archived_by_year = {}
+            for date_key, state in existing.items():
+                if state[1]:
+                    archived_by_year.setdefault(date_key[:4], []).append(date_key)
+
+            years = {}
+            for year, updated_at in db.session.query(EntryArchive.year, EntryArchive.updated_at) \
+                    .filter(EntryArchive.user_id == user_id):
+                years[year] = _isoformat(updated_at)
+                if year in known_years and known_years[year] == years[year]:
+                    for date_key in archived_by_year.get(str(year), []):
+                        wanted[date_key] = existing[date_key]
+                    continue
+                archive = EntryArchive.query.filter_by(user_id=user_id, year=year).first()
+                for date_key, item in archive.load().items():
+                    stage(date_key, _archived_to_dict(date_key, item),
+                          item.get('created_at'), item.get('updated_at'), 1)
+
+            # Hot rows win over archived copies; only changed ones are loaded
+            stale = []
+            for date_key, digest in db.session.query(JournalEntry.date, JournalEntry.content_hash) \
+                    .filter(JournalEntry.user_id == user_id):
+                if digest and existing.get(date_key) == (digest, 0):
+                    wanted[date_key] = (digest, 0)
+                else:
+                    stale.append(date_key)
+            for start in range(0, len(stale), EXPORT_BATCH_SIZE):
+                for entry in JournalEntry.query.filter(JournalEntry.user_id == user_id,
+                                                       JournalEntry.date.in_(stale[start:start + EXPORT_BATCH_SIZE])):
+                    stage(entry.date, entry.to_dict(), _isoformat(entry.created_at),
+                          _isoformat(entry.updated_at), 0, entry.content_hash)
+
+            conn.executemany('DELETE FROM entries WHERE date = ?',
+                             [(date_key,) for date_key in existing if date_key not in wanted])
+            conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('DELETE FROM archive_years')
+            conn.executemany('INSERT INTO archive_years VALUES (?, ?)', years.items())
+
+            settings = Settings.query.filter_by(user_id=user_id).first()
+            conn.execute('DELETE FROM settings')
+            if settings:
+                conn.execute('INSERT INTO settings VALUES (1, ?)',
+                             (json.dumps(settings.data, ensure_ascii=False, separators=(',', ':')),))
+
+            conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                ('format', SQLITE_EXPORT_FORMAT),
+                ('format_version', str(SQLITE_EXPORT_VERSION)),
+                ('user_id', str(user_id)),
+                ('data_version', str(version)),
+                ('exported_at', datetime.utcnow().isoformat(timespec='seconds')),
+                ('entry_count', str(len(wanted)))
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    app.logger.info("SQLite export built for user %s: %s entries rewritten, version %s",
+                    user_id, len(rows), version)
+    return path, version
+
+def _build_sqlite_export_task(user_id):
+    with app.app_context():
+        try:
+            return build_sqlite_export(user_id)
+        finally:
+            db.session.remove()
+
+def request_sqlite_export(user_id):
+    """Future of (path, version) for the user's export, joining a build
+    already queued or running in this process."""
+    with _export_lock:
+        future = _export_builds.get(user_id)
+        if future is None:
+            future = _export_executor.submit(_build_sqlite_export_task, user_id)
+            _export_builds[user_id] = future
+
+            def forget(done):
+                with _export_lock:
+                    if _export_builds.get(user_id) is done:
+                        del _export_builds[user_id]
+            future.add_done_callback(forget)
+        return future
+
+@app.route('/api/export/sqlite', methods=['GET'])
+@require_login
+def export_sqlite():
+    """Export entries and settings as a standalone SQLite database.
+
+    The file is kept per user and only rebuilt (incrementally, in the
+    background) when the data version moved. If the build takes longer
+    than EXPORT_WAIT seconds the client gets 202 and should retry.
+    """
+    try:
+        user_id = session.get('user_id')
+        path = sqlite_export_path(user_id)
+        version = get_data_version(user_id)
+        meta = _sqlite_export_meta(path) if os.path.exists(path) else None
+        if not meta or meta.get('data_version') != str(version):
+            try:
+                path, version = request_sqlite_export(user_id).result(timeout=EXPORT_WAIT)
+            except FuturesTimeout:
+                return jsonify({"status": "building"}), 202, {'Retry-After': str(EXPORT_WAIT)}
+
+        response = send_file(os.path.abspath(path), mimetype='application/vnd.sqlite3',
+                             as_attachment=True, etag=f'sqlite-{user_id}-{version}',
+                             download_name=f'journal_export_{datetime.now().strftime("%Y%m%d")}.sqlite')
+        response.headers['Cache-Control'] = 'private, no-cache'
+        os.utime(path)
+        app.logger.info("SQLite export served for user %s", user_id)
+        return response
+    except Exception as e:
+        app.logger.error("SQLite export error: %s", e)
+        return jsonify({"error": "Export failed"}), 500
+
+def read_sqlite_export(path):
+    """(entries, settings) from an uploaded export file: entries is a list
+    of entry dicts as exported, settings a dict or None. Raises ValueError
+    if the file is not a readable export."""
+    with open(path, 'rb') as f:
+        if f.read(16) != b'SQLite format 3\x00':
+            raise ValueError("Not an SQLite file")
+    try:
+        conn = _open_sqlite_readonly(path)
+        try:
+            if conn.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+                raise ValueError("Corrupt SQLite file")
+            tables = dict(conn.execute("SELECT name, type FROM sqlite_master"))
+            if tables.get('meta') != 'table' or tables.get('entries') != 'table':
+                raise ValueError("Not a journal export")
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+            if meta.get('format') != SQLITE_EXPORT_FORMAT:
+                raise ValueError("Not a journal export")
+            if not str(meta.get('format_version', '')).isdigit() or \
+                    int(meta['format_version']) > SQLITE_EXPORT_VERSION:
+                raise ValueError("Unsupported export version")
+
+            entries = []
+            for (content,) in conn.execute('SELECT content FROM entries ORDER BY date'):
+                try:
+                    entries.append(json.loads(content))
+                except (TypeError, ValueError):
+                    continue
+            settings = None
+            if tables.get('settings') == 'table':
+                row = conn.execute('SELECT data FROM settings WHERE id = 1').fetchone()
+                if row:
+                    settings = json.loads(row[0])
+            return entries, settings
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise ValueError(f"Unreadable SQLite file: {e}")
+
+def import_entries(user_id, entries):
+    """Store imported entry dicts in bulk. Entries already stored with the
+    same content are left alone; the others are upserted in batches, each
+    archive year holding some of them is rewritten once, each gets one
+    revision and the whole import one change event. Chart series and
+    emotion rollups are only marked unbuilt: the caller rebuilds them once
+    after committing. Returns (imported, unchanged, skipped). Does not
+    commit."""
+    changes, skipped = {}, 0
+    for data in entries:
+        sanitized = sanitize_entry_data(data)
+        if not sanitized or 'date' not in sanitized:
+            skipped += 1
+            continue
+        changes[sanitized['date']] = sanitized
+
+    def batches(dates):
+        dates = list(dates)
+        for start in range(0, len(dates), EXPORT_BATCH_SIZE):
+            yield dates[start:start + EXPORT_BATCH_SIZE]
+
+    # Previous content and creation time of each date, hot rows winning
+    # over archived copies
+    previous, created = {}, {}
+    hot = set()
+    for batch in batches(changes):
+        for date_key, content in db.session.query(JournalEntry.date, JournalEntry.content)                 .filter(JournalEntry.user_id == user_id, JournalEntry.date.in_(batch)):
+            previous[date_key] = content
+            hot.add(date_key)
+    archives = {}
+    for year in {date_key[:4] for date_key in changes if date_key not in hot}:
+        archive = EntryArchive.query.filter_by(user_id=user_id, year=int(year)).first()
+        if archive:
+            archives[archive] = items = archive.load()
+            for date_key, item in items.items():
+                if date_key in changes and date_key not in hot:
+                    previous[date_key] = item['content']
+                    if item.get('created_at'):
+                        created[date_key] = datetime.fromisoformat(item['created_at'])
+
+    digests = {}
+    for date_key, content in list(changes.items()):
+        digests[date_key] = content_hash(content)
+        if date_key in previous and content_hash(dict(previous[date_key], date=date_key)) == digests[date_key]:
+            del changes[date_key]
+    unchanged = len(digests) - len(changes)
+    if not changes:
+        return 0, unchanged, skipped
+
+    # Imported archived days come back into the hot table, like edits
+    for archive, items in archives.items():
+        moved = [date_key for date_key in items if date_key in changes and date_key not in hot]
+        if not moved:
+            continue
+        for date_key in moved:
+            del items[date_key]
+        if items:
+            archive.store(items)
+        else:
+            db.session.delete(archive)
+
+    now = datetime.utcnow()
+    stmt = sqlite_insert(JournalEntry)
+    stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'date'], set_={
+        'content': stmt.excluded.content,
+        'content_hash': stmt.excluded.content_hash,
+        'updated_at': stmt.excluded.updated_at,
+    })
+    for batch in batches(changes):
+        db.session.execute(stmt, [
+            {'user_id': user_id, 'date': date_key, 'content': changes[date_key],
+             'content_hash': digests[date_key], 'created_at': created.get(date_key, now), 'updated_at': now}
+            for date_key in batch
+        ])
+
+    # One revision each, seeded with the replaced content for entries saved
+    # before revisions existed (as record_revision does)
+    latest = {}
+    for batch in batches(changes):
+        latest.update(db.session.query(EntryRevision.date, db.func.max(EntryRevision.seq))
+                      .filter(EntryRevision.user_id == user_id, EntryRevision.date.in_(batch))
+                      .group_by(EntryRevision.date))
+    revisions = []
+    for date_key, content in changes.items():
+        base = previous.get(date_key)
+        seq = latest.get(date_key, 0) + 1
+        if seq == 1 and base is not None:
+            seed = EntryRevision(user_id=user_id, date=date_key, seq=1, created_at=now)
+            seed.set_payload('full', base)
+            revisions.append(seed)
+            seq = 2
+        revision = EntryRevision(user_id=user_id, date=date_key, seq=seq, created_at=now)
+        if base is None or seq % REVISION_FULL_EVERY == 1:
+            revision.set_payload('full', content)
+        else:
+            revision.set_payload('delta', content_delta(base, content))
+        revisions.append(revision)
+    db.session.bulk_save_objects(revisions)
+
+    User.query.filter_by(id=user_id).update(
+        {User.series_built: False, User.emotions_built: False, User.updated_at: User.updated_at},
+        synchronize_session=False
+    )
+    record_change(user_id, 'entry', 'imported')
+    return len(changes), unchanged, skipped
+
+@app.route('/api/import/sqlite', methods=['POST'])
+@require_login
+def import_sqlite():
+    """Import a file made by /api/export/sqlite, sent as the multipart field
+    "file" or as the raw body. Entries already stored with the same content
+    are left alone."""
+    user_id = session.get('user_id')
+    upload = request.files.get('file')
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.import', dir=EXPORT_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(upload.stream if upload else request.stream, f)
+        try:
+            entries, settings = read_sqlite_export(tmp)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    finally:
+        os.remove(tmp)
+
+    try:
+        imported, unchanged, skipped = import_entries(user_id, entries)
+
+        if isinstance(settings, dict) and len(app.json.dumps_bytes(settings)) <= 100000:
+            row = Settings.query.filter_by(user_id=user_id).first()
+            if row is None:
+                db.session.add(Settings(user_id=user_id, data=settings))
+                record_change(user_id, 'settings')
+            elif row.data != settings:
+                row.data = settings
+                record_change(user_id, 'settings')
+        db.session.commit()
+        notify_change()
+        app.logger.info("SQLite import for user %s: %s imported, %s unchanged, %s skipped",
+                        user_id, imported, unchanged, skipped)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("SQLite import error: %s", e)
+        return jsonify({"error": "Import failed"}), 500
+
+    if imported:
+        # Left unbuilt by import_entries, so a failure here only defers the
+        # rebuild to the next read
+        try:
+            rebuild_series(user_id)
+            rebuild_emotions(user_id)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Rebuilding rollups after import failed for user %s: %s", user_id, e)
+    return jsonify({"status": "success", "imported": imported,
+                    "unchanged": unchanged, "skipped": skipped})
+
+# ============================================================================
+# ENTRY REVISIONS
+# ============================================================================
+
+def content_delta(old, new):
+    """Top-level key delta turning `old` into `new`."""
+    delta = {'set': {}, 'unset': []}
+    for key, value in new.items():
+        if key not in old or old[key] != value:
+            delta['set'][key] = value
+    delta['unset'] = [key for key in old if key not in new]
+    return delta
+
+def apply_delta(content, delta):
+    result = dict(content)
+    result.update(delta['set'])
+    for key in delta['unset']:
+        result.pop(key, None)
+    return result
+
+def revision_content(user_id, date_key, seq):
+    """Rebuild the content of revision `seq` from the nearest full snapshot.
+
+    Returns None for a deletion; raises LookupError if the revision is gone.
+    """
+    base_seq = db.session.query(db.func.max(EntryRevision.seq)).filter(
+        EntryRevision.user_id == user_id,
+        EntryRevision.date == date_key,
+        EntryRevision.seq <= seq,
+        EntryRevision.kind != 'delta'
+    ).scalar_subquery()
+    chain = EntryRevision.query.filter(
+        EntryRevision.user_id == user_id,
+        EntryRevision.date == date_key,
+        EntryRevision.seq.between(base_seq, seq)
+    ).order_by(EntryRevision.seq).all()
+    if not chain or chain[-1].seq != seq:
+        raise LookupError(f"Revision {seq} not found")
+
+    content = None
+    for revision in chain:
+        if revision.kind == 'delta':
+            content = apply_delta(content, revision.payload())
+        else:
+            content = revision.payload()
+    return content
+
+def record_revision(user_id, date_key, previous, content):
+    """Record `content` (None for a deletion) as the entry's newest revision.
+
+    `previous` is the content being replaced; it seeds the history of
+    entries saved before revisions existed. Saves within
+    REVISION_COALESCE_SECONDS of the latest revision replace it.
+    """
+    latest = EntryRevision.query.filter_by(user_id=user_id, date=date_key) \
+        .order_by(EntryRevision.seq.desc()).first()
+
+    if latest is None and previous is not None:
+        latest = EntryRevision(user_id=user_id, date=date_key, seq=1)
+        latest.set_payload('full', previous)
+        db.session.add(latest)
+        db.session.flush()
+
+    if previous == content and latest is not None:
+        return latest
+
+    now = datetime.utcnow()
+    if (latest is not None and latest.seq > 1 and latest.kind != 'full'
+            and latest.created_at and (now - latest.created_at).total_seconds() < REVISION_COALESCE_SECONDS):
+        # Rewrite the latest revision against its own predecessor
+        revision = latest
+        base = revision_content(user_id, date_key, latest.seq - 1)
+    else:
+        revision = EntryRevision(user_id=user_id, date=date_key, seq=(latest.seq + 1) if latest else 1, created_at=now)
+        db.session.add(revision)
+        base = previous
+
+    if content is None:
+        revision.set_payload('deleted', None)
+    elif base is None or revision.seq % REVISION_FULL_EVERY == 1:
+        revision.set_payload('full', content)
+    else:
+        revision.set_payload('delta', content_delta(base, content))
+    revision.updated_at = now
+
+    if revision is not latest and revision.seq > REVISION_KEEP and revision.seq % REVISION_FULL_EVERY == 0:
+        prune_entry_revisions(user_id, date_key)
+    return revision
+
+def prune_entry_revisions(user_id, date_key, keep=None, max_age_days=None):
+    """Apply the retention policy to one entry's history.
+
+    Keeps the newest `keep` revisions that are younger than `max_age_days`
+    (the newest one is always kept). The oldest kept revision is rewritten
+    as a full snapshot so its chain stays complete. Does not commit.
+    """
+    keep = REVISION_KEEP if keep is None else keep
+    max_age_days = REVISION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    base = EntryRevision.query.filter_by(user_id=user_id, date=date_key)
+    newest = base.order_by(EntryRevision.seq.desc()).first()
+    if newest is None:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    first_kept = base.filter(
+        EntryRevision.seq > newest.seq - keep,
+        db.or_(EntryRevision.created_at >= cutoff, EntryRevision.seq == newest.seq)
+    ).order_by(EntryRevision.seq).first()
+    if first_kept is None or first_kept.seq == base.order_by(EntryRevision.seq).first().seq:
+        return 0
+
+    if first_kept.kind == 'delta':
+        first_kept.set_payload('full', revision_content(user_id, date_key, first_kept.seq))
+        db.session.flush()
+    return base.filter(EntryRevision.seq < first_kept.seq).delete(synchronize_session=False)
+
+def prune_revisions():
+    """Apply the retention policy to every entry with revisions past their age."""
+    cutoff = datetime.utcnow() - timedelta(days=REVISION_MAX_AGE_DAYS)
+    groups = db.session.query(EntryRevision.user_id, EntryRevision.date) \
+        .filter(EntryRevision.created_at < cutoff).distinct().all()
+    removed = 0
+    for user_id, date_key in groups:
+        try:
+            removed += prune_entry_revisions(user_id, date_key)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Revision pruning failed for user %s, %s: %s", user_id, date_key, e)
+    return removed
+
+@app.route('/api/entries/<date>/revisions', methods=['GET'])
+@require_login
+def list_revisions(date):
+    """List the saved revisions of an entry, newest first"""
+    if not validate_date(date):
+        return jsonify({"error": "Invalid date format"}), 400
+
+    try:
+        revisions = EntryRevision.query.filter_by(user_id=session.get('user_id'), date=date) \
+            .order_by(EntryRevision.seq.desc()).all()
+        return jsonify({"date": date, "revisions": [r.to_dict() for r in revisions]})
+    except Exception as e:
+        app.logger.error("Revision list error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/entries/<date>/revisions/<int:revision>', methods=['GET'])
+@require_login
+def get_revision(date, revision):
+    """Content of one revision (null content for a deletion)"""
+    if not validate_date(date):
+        return jsonify({"error": "Invalid date format"}), 400
+
+    try:
+        content = revision_content(session.get('user_id'), date, revision)
+        return jsonify({"date": date, "revision": revision, "content": content})
+    except LookupError:
+        return jsonify({"error": "Revision not found"}), 404
+    except Exception as e:
+        app.logger.error("Revision read error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/entries/<date>/revisions/<int:revision>/restore', methods=['POST'])
+@require_login
+def restore_revision(date, revision):
+    """Make an earlier revision the current content (recorded as a new revision)"""
+    if not validate_date(date):
+        return jsonify({"error": "Invalid date format"}), 400
+
+    user_id = session.get('user_id')
+    try:
+        content = revision_content(user_id, date, revision)
+        if content is None:
+            return jsonify({"error": "Cannot restore a deletion"}), 400
+
+        entry = JournalEntry.query.filter_by(user_id=user_id, date=date).first()
+        entry = write_entry(user_id, date, content, entry)
+        response = jsonify({"status": "success", "data": entry.to_dict()})
+        db.session.commit()
+        notify_change()
+        app.logger.info("Entry %s restored to revision %s for user %s", date, revision, user_id)
+        return response
+    except LookupError:
+        db.session.rollback()
+        return jsonify({"error": "Revision not found"}), 404
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Revision restore error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+# ============================================================================
+# STATS TIME SERIES
+# ============================================================================
+
+SERIES_METRICS = ('mood', 'sleep', 'quality')
+SERIES_RESOLUTIONS = ('day', 'week', 'month')
+SERIES_MAX_POINTS = 2000
+
+def series_values(content):
+    """Chart values of one entry, following the Stats tab: mood counts when
+    above 0, sleep is the number of hours ticked in sleepHours."""
+    values = {}
+    try:
+        mood = float(content.get('generalMood') or 0)
+        if mood > 0:
+            values['mood'] = mood
+    except (TypeError, ValueError):
+        pass
+    hours = content.get('sleepHours')
+    if isinstance(hours, list) and any(hours):
+        values['sleep'] = float(sum(1 for h in hours if h))
+    sleep = content.get('sleep')
+    if isinstance(sleep, dict) and isinstance(sleep.get('quality'), (int, float)):
+        values['quality'] = float(sleep['quality'])
+    return values
+
+def series_bucket(date_key, resolution):
+    if resolution == 'week':
+        day = datetime.strptime(date_key, '%Y-%m-%d')
+        return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+    if resolution == 'month':
+        return date_key[:8] + '01'
+    return date_key
+
+def add_to_rollups(model, keys, rows):
+    """Add the counters of rows (dicts holding keys + counters) to model's
+    rollup rows in one INSERT ... ON CONFLICT DO UPDATE statement."""
+    if not rows:
+        return
+    stmt = sqlite_insert(model).values(rows)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: model.__table__.c[c] + stmt.excluded[c] for c in rows[0] if c not in keys}
+    ))
+
+def update_series(user_id, date_key, previous, content):
+    """Move the day, week and month points containing date_key from the
+    values of `previous` to those of `content` (either None when the entry
+    did not or no longer exists). Runs in the caller's transaction and
+    costs nothing when the chart values did not change."""
+    old, new = series_values(previous or {}), series_values(content or {})
+    if old == new:
+        return
+    delta = {}
+    for metric in SERIES_METRICS:
+        delta[f'{metric}_sum'] = new.get(metric, 0) - old.get(metric, 0)
+        delta[f'{metric}_count'] = (metric in new) - (metric in old)
+    buckets = [(resolution, series_bucket(date_key, resolution)) for resolution in SERIES_RESOLUTIONS]
+    add_to_rollups(SeriesPoint, ['user_id', 'resolution', 'bucket'], [
+        {'user_id': user_id, 'resolution': resolution, 'bucket': bucket, **delta}
+        for resolution, bucket in buckets
+    ])
+    if any(delta[f'{m}_count'] < 0 for m in SERIES_METRICS):
+        SeriesPoint.query.filter(
+            SeriesPoint.user_id == user_id,
+            SeriesPoint.bucket.in_([bucket for _, bucket in buckets]),
+            *[getattr(SeriesPoint, f'{m}_count') == 0 for m in SERIES_METRICS]
+        ).delete(synchronize_session=False)
+
+def rebuild_series(user_id):
+    """Recompute all series points of a user from their full history."""
+    SeriesPoint.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rollups = {resolution: {} for resolution in SERIES_RESOLUTIONS}
+    for date_key, data in load_user_entries(user_id).items():
+        values = series_values(data)
+        if not values:
+            continue
+        for resolution in SERIES_RESOLUTIONS:
+            totals = rollups[resolution].setdefault(series_bucket(date_key, resolution), {})
+            for metric, value in values.items():
+                totals[f'{metric}_sum'] = totals.get(f'{metric}_sum', 0) + value
+                totals[f'{metric}_count'] = totals.get(f'{metric}_count', 0) + 1
+    empty = {f'{m}_{k}': 0 for m in SERIES_METRICS for k in ('sum', 'count')}
+    db.session.bulk_insert_mappings(SeriesPoint, [
+        {**empty, **totals, 'user_id': user_id, 'resolution': resolution, 'bucket': bucket}
+        for resolution, buckets in rollups.items() for bucket, totals in buckets.items()
+    ])
+    User.query.filter_by(id=user_id).update(
+        {User.series_built: True, User.updated_at: User.updated_at}, synchronize_session=False
+    )
+    db.session.commit()
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y, ...), ...].
+
+    Keeps the first and last points and, per bucket, the point forming the
+    largest triangle with its neighbours, which preserves peaks and dips.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        next_bucket = points[end:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+        ax, ay = points[a][0], points[a][1]
+        best, best_area = start, -1
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+def build_series(user_id, resolution, metrics, date_from, date_to, max_points, downsample):
+    def points_query(res):
+        query = SeriesPoint.query.filter_by(user_id=user_id, resolution=res)
+        if date_from:
+            query = query.filter(SeriesPoint.bucket >= series_bucket(date_from, res))
+        if date_to:
+            query = query.filter(SeriesPoint.bucket <= date_to)
+        return query
+
+    if resolution == 'auto':
+        # Finest resolution whose bucket count fits in max_points
+        resolution = next((r for r in ('day', 'week') if points_query(r).count() <= max_points), 'month')
+
+    rows = points_query(resolution).order_by(SeriesPoint.bucket).all()
+    series = {}
+    for metric in metrics:
+        points = [
+            (datetime.strptime(row.bucket, '%Y-%m-%d').toordinal(),
+             round(getattr(row, f'{metric}_sum') / getattr(row, f'{metric}_count'), 2),
+             row.bucket)
+            for row in rows if getattr(row, f'{metric}_count')
+        ]
+        if downsample == 'lttb':
+            points = lttb(points, max_points)
+        series[metric] = [[bucket, value] for _, value, bucket in points]
+    return {"resolution": resolution, "series": series}
+
+@app.route('/api/stats/series', methods=['GET'])
+@require_login
+def get_series():
+    """Chart series at day/week/month resolution.
+
+    Query params: resolution=day|week|month|auto (default auto), metrics=mood,sleep,quality,
+    from/to (YYYY-MM-DD), max_points (default 365), downsample=lttb to cap
+    a day series with shape-preserving downsampling.
+    """
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in SERIES_RESOLUTIONS + ('auto',):
+        return jsonify({"error": "Invalid resolution"}), 400
+
+    metrics = [m for m in request.args.get('metrics', ','.join(SERIES_METRICS)).split(',') if m]
+    if not metrics or any(m not in SERIES_METRICS for m in metrics):
+        return jsonify({"error": "Invalid metrics"}), 400
+
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    for value in (date_from, date_to):
+        if value and not validate_date(value):
+            return jsonify({"error": "Invalid date format"}), 400
+
+    try:
+        max_points = int(request.args.get('max_points', 365))
+    except ValueError:
+        return jsonify({"error": "max_points must be an integer"}), 400
+    if not 3 <= max_points <= SERIES_MAX_POINTS:
+        return jsonify({"error": f"max_points must be between 3 and {SERIES_MAX_POINTS}"}), 400
+
+    downsample = request.args.get('downsample')
+    if downsample not in (None, 'lttb'):
+        return jsonify({"error": "Invalid downsample mode"}), 400
+
+    user_id = session.get('user_id')
+    try:
+        if not db.session.query(User.series_built).filter(User.id == user_id).scalar():
+            rebuild_series(user_id)
+        cache_kind = f'series-{hashlib.sha256(request.query_string).hexdigest()}'
+        return cached_json_response(cache_kind, user_id, lambda: build_series(
+            user_id, resolution, metrics, date_from, date_to, max_points, downsample
+        ))
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Series error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+# ============================================================================
+# EMOTION ANALYTICS
+# ============================================================================
+
+EMOTION_TOP_DEFAULT = 10
+EMOTION_TOP_MAX = 50
+
+def emotion_key(name):
+    """Normalised emotion name: trimmed, single-spaced, case-folded."""
+    return ' '.join(name.split()).casefold()
+
+def cycle_emotions(content):
+    """[(cycle, name, score)] of an entry; an emotion listed twice in the
+    same cycle counts once, with its highest score."""
+    rows = []
+    cycles = content.get('viciousCycles') if content else None
+    for position, cycle in enumerate(cycles if isinstance(cycles, list) else []):
+        if not isinstance(cycle, dict):
+            continue
+        scores = {}
+        for emo in cycle.get('emotions') or []:
+            if not isinstance(emo, dict) or not isinstance(emo.get('name'), str):
+                continue
+            name = emotion_key(emo['name'])
+            if name:
+                score = emo.get('score') if isinstance(emo.get('score'), int) else 0
+                scores[name] = max(scores.get(name, score), score)
+        rows.extend((position, name, score) for name, score in scores.items())
+    return rows
+
+def _emotion_rollups(rows):
+    """Monthly per-emotion counts/score sums and pair counts of
+    [(date, cycle, name, score)]."""
+    stats, pairs, cycles = {}, {}, {}
+    for date_key, cycle, name, score in rows:
+        bucket = series_bucket(date_key, 'month')
+        totals = stats.setdefault(bucket, {}).setdefault(name, [0, 0])
+        totals[0] += 1
+        totals[1] += score
+        cycles.setdefault((bucket, date_key, cycle), []).append(name)
+    for (bucket, _, _), names in cycles.items():
+        names.sort()
+        counts = pairs.setdefault(bucket, {})
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                counts[(a, b)] = counts.get((a, b), 0) + 1
+    return stats, pairs
+
+def _add_emotion_rollups(user_id, stats, pairs):
+    db.session.bulk_insert_mappings(EmotionStat, [
+        {'user_id': user_id, 'bucket': bucket, 'name': name, 'count': count, 'score_sum': score_sum}
+        for bucket, names in stats.items() for name, (count, score_sum) in names.items()
+    ])
+    db.session.bulk_insert_mappings(EmotionPair, [
+        {'user_id': user_id, 'bucket': bucket, 'a': a, 'b': b, 'count': count}
+        for bucket, counts in pairs.items() for (a, b), count in counts.items()
+    ])
+
+def update_emotions(user_id, date_key, previous, content):
+    """Reindex the cycle emotions of one entry after a save (content) or
+    delete (None) and move its month's rollups by the difference with
+    `previous`. Runs in the caller's transaction; costs nothing when the
+    cycle emotions did not change."""
+    old, new = cycle_emotions(previous), cycle_emotions(content)
+    if old == new:
+        return
+    if old:
+        CycleEmotion.query.filter_by(user_id=user_id, date=date_key).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(CycleEmotion, [
+        {'user_id': user_id, 'date': date_key, 'cycle': cycle, 'name': name, 'score': score}
+        for cycle, name, score in new
+    ])
+
+    bucket = series_bucket(date_key, 'month')
+    old_stats, old_pairs = (r.get(bucket, {}) for r in _emotion_rollups([(date_key, *row) for row in old]))
+    new_stats, new_pairs = (r.get(bucket, {}) for r in _emotion_rollups([(date_key, *row) for row in new]))
+    stats = []
+    for name in old_stats.keys() | new_stats.keys():
+        (old_count, old_sum), (new_count, new_sum) = old_stats.get(name, (0, 0)), new_stats.get(name, (0, 0))
+        if (old_count, old_sum) != (new_count, new_sum):
+            stats.append({'user_id': user_id, 'bucket': bucket, 'name': name,
+                          'count': new_count - old_count, 'score_sum': new_sum - old_sum})
+    pairs = []
+    for a, b in old_pairs.keys() | new_pairs.keys():
+        count = new_pairs.get((a, b), 0) - old_pairs.get((a, b), 0)
+        if count:
+            pairs.append({'user_id': user_id, 'bucket': bucket, 'a': a, 'b': b, 'count': count})
+    add_to_rollups(EmotionStat, ['user_id', 'bucket', 'name'], stats)
+    add_to_rollups(EmotionPair, ['user_id', 'bucket', 'a', 'b'], pairs)
+    if any(row['count'] < 0 for row in stats):
+        EmotionStat.query.filter_by(user_id=user_id, bucket=bucket) \
+            .filter(EmotionStat.count <= 0).delete(synchronize_session=False)
+    if any(row['count'] < 0 for row in pairs):
+        EmotionPair.query.filter_by(user_id=user_id, bucket=bucket) \
+            .filter(EmotionPair.count <= 0).delete(synchronize_session=False)
+
+def rebuild_emotions(user_id):
+    """Recompute a user's emotion index and rollups from their full history."""
+    for model in (CycleEmotion, EmotionStat, EmotionPair):
+        model.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rows = []
+    for date_key, data in load_user_entries(user_id).items():
+        rows.extend((date_key, cycle, name, score) for cycle, name, score in cycle_emotions(data))
+    db.session.bulk_insert_mappings(CycleEmotion, [
+        {'user_id': user_id, 'date': d, 'cycle': c, 'name': n, 'score': sc} for d, c, n, sc in rows
+    ])
+    _add_emotion_rollups(user_id, *_emotion_rollups(rows))
+    User.query.filter_by(id=user_id).update(
+        {User.emotions_built: True, User.updated_at: User.updated_at}, synchronize_session=False
+    )
+    db.session.commit()
+
+def build_emotion_report(user_id, date_from, date_to, top, names):
+    def in_range(query, model):
+        query = query.filter(model.user_id == user_id)
+        if date_from:
+            query = query.filter(model.bucket >= series_bucket(date_from, 'month'))
+        if date_to:
+            query = query.filter(model.bucket <= date_to)
+        return query
+
+    totals = in_range(db.session.query(
+        EmotionStat.name, db.func.sum(EmotionStat.count), db.func.sum(EmotionStat.score_sum)
+    ), EmotionStat).group_by(EmotionStat.name).order_by(db.func.sum(EmotionStat.count).desc(), EmotionStat.name).all()
+    frequency = [
+        {"name": name, "count": count, "avg_score": round(score_sum / count, 2)}
+        for name, count, score_sum in totals
+    ]
+    selected = names or [row['name'] for row in frequency[:top]]
+
+    series = {name: [] for name in selected}
+    if selected:
+        rows = in_range(EmotionStat.query, EmotionStat).filter(EmotionStat.name.in_(selected)) \
+            .order_by(EmotionStat.bucket).all()
+        for row in rows:
+            series[row.name].append([row.bucket, round(row.score_sum / row.count, 2)])
+
+    index = {name: i for i, name in enumerate(selected)}
+    matrix = [[0] * len(selected) for _ in selected]
+    if selected:
+        pair_rows = in_range(db.session.query(EmotionPair.a, EmotionPair.b, db.func.sum(EmotionPair.count)),
+                             EmotionPair) \
+            .filter(EmotionPair.a.in_(selected), EmotionPair.b.in_(selected)) \
+            .group_by(EmotionPair.a, EmotionPair.b).all()
+        for a, b, count in pair_rows:
+            matrix[index[a]][index[b]] = matrix[index[b]][index[a]] = count
+        for name, i in index.items():
+            matrix[i][i] = next((row['count'] for row in frequency if row['name'] == name), 0)
+
+    return {
+        "frequency": frequency,
+        "series": series,
+        "cooccurrence": {"emotions": selected, "matrix": matrix}
+    }
+
+@app.route('/api/stats/emotions', methods=['GET'])
+@require_login
+def get_emotion_stats():
+    """Emotion analytics from the vicious cycle index.
+
+    Query params: from/to (YYYY-MM-DD, month granularity), top (emotions kept
+    in series and co-occurrence, default 10) or emotions=a,b,c to pick them.
+    Returns frequency with average scores, monthly average score per emotion
+    and a co-occurrence matrix whose diagonal holds each emotion's count.
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    for value in (date_from, date_to):
+        if value and not validate_date(value):
+            return jsonify({"error": "Invalid date format"}), 400
+
+    try:
+        top = int(request.args.get('top', EMOTION_TOP_DEFAULT))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    if not 1 <= top <= EMOTION_TOP_MAX:
+        return jsonify({"error": f"top must be between 1 and {EMOTION_TOP_MAX}"}), 400
+
+    names = []
+    for name in request.args.get('emotions', '').split(','):
+        name = emotion_key(name)
+        if name and name not in names:
+            names.append(name)
+    if len(names) > EMOTION_TOP_MAX:
+        return jsonify({"error": f"At most {EMOTION_TOP_MAX} emotions"}), 400
+
+    user_id = session.get('user_id')
+    try:
+        if not db.session.query(User.emotions_built).filter(User.id == user_id).scalar():
+            rebuild_emotions(user_id)
+        cache_kind = f'emotions-{hashlib.sha256(request.query_string).hexdigest()}'
+        return cached_json_response(cache_kind, user_id, lambda: build_emotion_report(
+            user_id, date_from, date_to, top, names
+        ))
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Emotion stats error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+# ============================================================================
+# ACCOUNT PURGE
+# ============================================================================
+
+# Every table holding per-user rows; the users row itself goes last
+PURGE_MODELS = (JournalEntry, EntryRevision, EntryArchive, SeriesPoint, CycleEmotion,
+                EmotionStat, EmotionPair, ChangeEvent, Settings)
+
+_purge_lock = threading.Lock()
+_purge_requested = threading.Event()
+_purge_thread = None
+
+def count_user_rows(user_id):
+    return sum(model.query.filter_by(user_id=user_id).count() for model in PURGE_MODELS)
+
+def purge_user_data(user_id, pause=0.0):
+    """Delete a deleted account's rows in short batched transactions, then the
+    account itself. Each batch holds the write lock only briefly, and an
+    interrupted purge simply resumes. Returns the number of rows removed."""
+    removed = 0
+    for model in PURGE_MODELS:
+        while True:
+            batch = db.session.query(model.id).filter(model.user_id == user_id) \
+                .limit(PURGE_BATCH_SIZE).scalar_subquery()
+            count = model.query.filter(model.id.in_(batch)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += count
+            if count < PURGE_BATCH_SIZE:
+                break
+            if pause:
+                time.sleep(pause)
+    User.query.filter(User.id == user_id, User.deleted_at.isnot(None)).delete(synchronize_session=False)
+    db.session.commit()
+    read_cache.invalidate_user(user_id)
+    if os.path.exists(sqlite_export_path(user_id)):
+        os.remove(sqlite_export_path(user_id))
+    return removed
+
+def purge_deleted_users(pause=0.0):
+    """Purge every account marked deleted. Returns how many were purged."""
+    user_ids = [row[0] for row in db.session.query(User.id).filter(User.deleted_at.isnot(None))]
+    for user_id in user_ids:
+        removed = purge_user_data(user_id, pause=pause)
+        app.logger.info("Purged deleted user %s (%s rows)", user_id, removed)
+    return len(user_ids)
+
+def _purge_worker():
+    global _purge_thread
+    with app.app_context():
+        try:
+            while True:
+                _purge_requested.clear()
+                try:
+                    purge_deleted_users(pause=PURGE_BATCH_PAUSE)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Account purge failed")
+                with _purge_lock:
+                    # A deletion committed while we were purging re-sets the flag
+                    if not _purge_requested.is_set():
+                        _purge_thread = None
+                        return
+        finally:
+            db.session.remove()
+
+def start_purge_worker():
+    """Wake the background purge thread, starting it if needed."""
+    global _purge_thread
+    with _purge_lock:
+        _purge_requested.set()
+        if _purge_thread is None:
+            _purge_thread = threading.Thread(target=_purge_worker, name='account-purge', daemon=True)
+            _purge_thread.start()
+
 # ============================================================================
 # USER MANAGEMENT ROUTES (Admin Only)
 # ============================================================================
@@ -888,37 +3101,46 @@ def manual_backup():
 def list_users():
     """List all users (admin only)"""
     try:
-        users = User.query.all()
+        with replica_reads():
+            users = User.query.filter(User.deleted_at.is_(None)).all()
         return jsonify({
             "users": [user.to_dict() for user in users],
             "total": len(users)
         })
     except Exception as e:
-        app.logger.error(f"List users error: {e}")
+        app.logger.error("List users error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
+def validate_new_user(username, password):
+    """Return an error message for invalid new-user fields, or None"""
+    if not username or not password:
+        return "Username and password are required"
+    if not isinstance(username, str) or not isinstance(password, str):
+        return "Username and password must be text"
+
+    # Validate username length and format
+    if len(username) < 3 or len(username) > 100:
+        return "Username must be between 3 and 100 characters"
+
+    # Validate password strength
+    if len(password) < 8:
+        return "Password must be at least 8 characters"
+    return None
+
 @app.route('/api/admin/users', methods=['POST'])
 @require_admin
 def create_user():
     """Create a new user (admin only)"""
+    data = request.json
     try:
-        data = request.json
-
         # Validate required fields
         username = data.get('username')
         password = data.get('password')
         email = data.get('email')
 
-        if not username or not password:
-            return jsonify({"error": "Username and password are required"}), 400
-
-        # Validate username length and format
-        if len(username) < 3 or len(username) > 100:
-            return jsonify({"error": "Username must be between 3 and 100 characters"}), 400
-
-        # Validate password strength
-        if len(password) < 8:
-            return jsonify({"error": "Password must be at least 8 characters"}), 400
+        error = validate_new_user(username, password)
+        if error:
+            return jsonify({"error": error}), 400
 
         # Check if username already exists
         existing_user = User.query.filter_by(username=username).first()
@@ -932,7 +3154,7 @@ def create_user():
                 return jsonify({"error": "Email already exists"}), 400
 
         # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = hasher.hash(password)
 
         # Create new user
         new_user = User(
@@ -946,7 +3168,7 @@ def create_user():
         db.session.add(new_user)
         db.session.commit()
 
-        app.logger.info(f"Admin {session.get('username')} created user {username} (ID: {new_user.id})")
+        app.logger.info("Admin %s created user %s (ID: %s)", session.get('username'), username, new_user.id)
 
         return jsonify({
             "status": "success",
@@ -954,22 +3176,151 @@ def create_user():
             "user": new_user.to_dict()
         }), 201
 
+    except HasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Create user error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+BULK_MAX_USERS = 1000
+_bulk_lock = threading.Lock()
+
+def _parse_flag(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+def _chunks(items, size=500):
+    # SQLite caps the number of bound parameters per statement
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@app.route('/api/admin/users/bulk', methods=['POST'])
+@require_admin
+def bulk_create_users():
+    """Create many users at once from a JSON list or a CSV upload (admin only)
+
+    JSON: {"users": [{"username", "password", "email", "is_admin", "is_active"}, ...]}
+    CSV: header row with the same column names (Content-Type: text/csv).
+    Valid rows are inserted in one transaction; the response reports every row.
+    """
+    if request.mimetype in ('text/csv', 'application/csv'):
+        rows = list(csv.DictReader(StringIO(request.get_data(as_text=True))))
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('users') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            return jsonify({"error": "Expected a list of users"}), 400
+
+    if not rows:
+        return jsonify({"error": "No users provided"}), 400
+    if len(rows) > BULK_MAX_USERS:
+        return jsonify({"error": f"At most {BULK_MAX_USERS} users per request"}), 400
+
+    # One bulk job per process: its hashes keep every hasher worker busy
+    if not _bulk_lock.acquire(blocking=False):
+        return hasher_busy_response()
+    try:
+        results = []
+        candidates = []
+        seen_usernames, seen_emails = set(), set()
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results.append({"row": index, "status": "error", "error": "Invalid row"})
+                continue
+            username = row.get('username')
+            if isinstance(username, str):
+                username = username.strip()
+            email = row.get('email')
+            if isinstance(email, str):
+                email = email.strip() or None
+            result = {"row": index, "username": username}
+            error = validate_new_user(username, row.get('password'))
+            if not error and email is not None and not isinstance(email, str):
+                error = "Invalid email"
+            if not error and username in seen_usernames:
+                error = "Duplicate username in request"
+            if not error and email and email in seen_emails:
+                error = "Duplicate email in request"
+            if error:
+                result.update(status="error", error=error)
+            else:
+                seen_usernames.add(username)
+                if email:
+                    seen_emails.add(email)
+                candidates.append((result, row, username, email))
+            results.append(result)
+
+        # Uniqueness against existing accounts: one set-based query per 500 names
+        taken_usernames, taken_emails = set(), set()
+        for names in _chunks(sorted(seen_usernames)):
+            taken_usernames.update(u for (u,) in db.session.query(User.username).filter(User.username.in_(names)))
+        for emails in _chunks(sorted(seen_emails)):
+            taken_emails.update(e for (e,) in db.session.query(User.email).filter(User.email.in_(emails)))
+
+        valid = []
+        for result, row, username, email in candidates:
+            if username in taken_usernames:
+                result.update(status="error", error="Username already exists")
+            elif email and email in taken_emails:
+                result.update(status="error", error="Email already exists")
+            else:
+                valid.append((result, row, username, email))
+
+        hashes = hasher.hash_many([row['password'] for _, row, _, _ in valid])
+
+        new_users = []
+        for (result, row, username, email), password_hash in zip(valid, hashes):
+            new_users.append(User(
+                username=username,
+                password_hash=password_hash,
+                email=email,
+                is_admin=_parse_flag(row.get('is_admin'), False),
+                is_active=_parse_flag(row.get('is_active'), True)
+            ))
+        db.session.add_all(new_users)
+        db.session.commit()
+
+        for (result, _, _, _), user in zip(valid, new_users):
+            result.update(status="created", id=user.id)
+
+        created = len(new_users)
+        app.logger.info("Admin %s bulk-created %s users (%s rejected)",
+                        session.get('username'), created, len(results) - created)
+
+        return jsonify({
+            "status": "success",
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }), 201 if created else 200
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Conflicting users were created concurrently, please retry"}), 409
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Create user error: {e}")
+        app.logger.error("Bulk create users error: %s", e)
         return jsonify({"error": "Server error"}), 500
+    finally:
+        _bulk_lock.release()
 
 @app.route('/api/admin/users/<int:user_id>', methods=['GET'])
 @require_admin
 def get_user(user_id):
     """Get user details (admin only)"""
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        with replica_reads():
+            user = User.query.filter_by(id=user_id, deleted_at=None).first()
+            if not user:
+                return jsonify({"error": "User not found"}), 404
 
-        # Include entry count
-        entry_count = JournalEntry.query.filter_by(user_id=user.id).count()
+            # Include entry count
+            entry_count = count_user_entries(user.id)
 
         user_data = user.to_dict()
         user_data['entry_count'] = entry_count
@@ -977,20 +3328,19 @@ def get_user(user_id):
         return jsonify(user_data)
 
     except Exception as e:
-        app.logger.error(f"Get user error: {e}")
+        app.logger.error("Get user error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/admin/users/<int:user_id>', methods=['PUT'])
 @require_admin
 def update_user(user_id):
     """Update user details (admin only)"""
+    data = request.json
     try:
-        user = User.query.get(user_id)
+        user = User.query.filter_by(id=user_id, deleted_at=None).first()
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        data = request.json
-
         # Prevent admin from disabling themselves
         if user.id == session.get('user_id') and data.get('is_active') is False:
             return jsonify({"error": "Cannot disable your own account"}), 400
@@ -1020,7 +3370,7 @@ def update_user(user_id):
         if 'password' in data and data['password']:
             if len(data['password']) < 8:
                 return jsonify({"error": "Password must be at least 8 characters"}), 400
-            user.password_hash = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            user.password_hash = hasher.hash(data['password'])
 
         # Update is_admin if provided
         if 'is_admin' in data:
@@ -1033,7 +3383,7 @@ def update_user(user_id):
         user.updated_at = datetime.utcnow()
         db.session.commit()
 
-        app.logger.info(f"Admin {session.get('username')} updated user {user.username} (ID: {user.id})")
+        app.logger.info("Admin %s updated user %s (ID: %s)", session.get('username'), user.username, user.id)
 
         return jsonify({
             "status": "success",
@@ -1041,9 +3391,12 @@ def update_user(user_id):
             "user": user.to_dict()
         })
 
+    except HasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Update user error: {e}")
+        app.logger.error("Update user error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
@@ -1051,7 +3404,7 @@ def update_user(user_id):
 def delete_user(user_id):
     """Delete a user and all their data (admin only)"""
     try:
-        user = User.query.get(user_id)
+        user = User.query.filter_by(id=user_id, deleted_at=None).first()
         if not user:
             return jsonify({"error": "User not found"}), 404
 
@@ -1059,33 +3412,46 @@ def delete_user(user_id):
         if user.id == session.get('user_id'):
             return jsonify({"error": "Cannot delete your own account"}), 400
 
-        # Delete user (cascade will delete entries and settings)
+        # Mark the account deleted right away (freeing its username and
+        # email), then purge its data in batches
         username = user.username
-        db.session.delete(user)
+        user.deleted_at = datetime.utcnow()
+        user.is_active = False
+        user.username = f"deleted-{user.id}-{secrets.token_hex(4)}"
+        user.email = None
         db.session.commit()
+        read_cache.invalidate_user(user_id)
+
+        app.logger.info("Admin %s deleted user %s (ID: %s)", session.get('username'), username, user_id)
 
-        app.logger.info(f"Admin {session.get('username')} deleted user {username} (ID: {user_id})")
+        if count_user_rows(user_id) <= PURGE_INLINE_MAX_ROWS:
+            purge_user_data(user_id)
+            return jsonify({
+                "status": "success",
+                "message": f"User {username} and all associated data deleted"
+            })
 
+        start_purge_worker()
         return jsonify({
-            "status": "success",
-            "message": f"User {username} and all associated data deleted"
-        })
+            "status": "accepted",
+            "message": f"User {username} deleted; their data is being removed in the background"
+        }), 202
 
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Delete user error: {e}")
+        app.logger.error("Delete user error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
 @app.route('/api/admin/users/<int:user_id>/reset-password', methods=['POST'])
 @require_admin
 def reset_user_password(user_id):
     """Reset a user's password (admin only)"""
+    data = request.json
     try:
-        user = User.query.get(user_id)
+        user = User.query.filter_by(id=user_id, deleted_at=None).first()
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        data = request.json
         new_password = data.get('password')
 
         if not new_password:
@@ -1095,22 +3461,421 @@ def reset_user_password(user_id):
             return jsonify({"error": "Password must be at least 8 characters"}), 400
 
         # Update password
-        user.password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        user.password_hash = hasher.hash(new_password)
         user.updated_at = datetime.utcnow()
         db.session.commit()
 
-        app.logger.info(f"Admin {session.get('username')} reset password for user {user.username} (ID: {user.id})")
+        app.logger.info("Admin %s reset password for user %s (ID: %s)", session.get('username'), user.username, user.id)
 
         return jsonify({
             "status": "success",
             "message": f"Password reset for user {user.username}"
         })
 
+    except HasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Reset password error: {e}")
+        app.logger.error("Reset password error: %s", e)
         return jsonify({"error": "Server error"}), 500
 
+@app.route('/api/admin/archive', methods=['POST'])
+@require_admin
+def run_archive():
+    """Move old entries to the yearly archives now (admin only)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        days = data.get('older_than_days', ARCHIVE_AFTER_DAYS)
+        if not isinstance(days, int) or days < 1:
+            return jsonify({"error": "older_than_days must be a positive integer"}), 400
+
+        archived = archive_old_entries(days)
+        app.logger.info("Admin %s archived %s entries older than %s days", session.get('username'), archived, days)
+
+        return jsonify({"status": "success", "archived": archived})
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Archive error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/admin/profiler', methods=['GET'])
+@require_admin
+def get_profiler_config():
+    """Profiling switches and query budgets (admin only)"""
+    return jsonify({"config": profiler.config.get(), "query_budgets": QUERY_BUDGETS})
+
+@app.route('/api/admin/profiler', methods=['PUT'])
+@require_admin
+def update_profiler_config():
+    """Change which requests are profiled (admin only).
+
+    Body: {"enabled": bool, "sample_rate": 0..1, "endpoints": [...], "user_ids": [...]};
+    empty lists match every endpoint / user. A single request can also be
+    profiled by an admin with the "X-Profile: 1" header.
+    """
+    data = request.get_json(silent=True) or {}
+    changes = {}
+    if 'enabled' in data:
+        if not isinstance(data['enabled'], bool):
+            return jsonify({"error": "enabled must be a boolean"}), 400
+        changes['enabled'] = data['enabled']
+    if 'sample_rate' in data:
+        rate = data['sample_rate']
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+            return jsonify({"error": "sample_rate must be between 0 and 1"}), 400
+        changes['sample_rate'] = float(rate)
+    if 'endpoints' in data:
+        endpoints = data['endpoints']
+        if not isinstance(endpoints, list) or any(e not in app.view_functions for e in endpoints):
+            return jsonify({"error": "endpoints must be a list of endpoint names"}), 400
+        changes['endpoints'] = endpoints
+    if 'user_ids' in data:
+        user_ids = data['user_ids']
+        if not isinstance(user_ids, list) or not all(isinstance(u, int) for u in user_ids):
+            return jsonify({"error": "user_ids must be a list of integers"}), 400
+        changes['user_ids'] = user_ids
+
+    try:
+        config = profiler.config.update(changes)
+        app.logger.info("Admin %s updated profiler config: %s", session.get('username'), config)
+        return jsonify({"status": "success", "config": config})
+    except OSError as e:
+        app.logger.error("Profiler config error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    """Recent request profiles, newest first, without their details (admin only)"""
+    profiles = profiler.store.list()
+    return jsonify({"profiles": profiles, "total": len(profiles)})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """One profile with its SQL statements and sampled stacks (admin only)"""
+    if not re.fullmatch(r'[0-9a-f]{12}', profile_id):
+        return jsonify({"error": "Invalid profile id"}), 400
+    record = profiler.store.get(profile_id)
+    if record is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(record)
+
+@app.route('/api/admin/profiles', methods=['DELETE'])
+@require_admin
+def clear_profiles():
+    """Drop all stored profiles (admin only)"""
+    profiler.store.clear()
+    return jsonify({"status": "success"})
+
+@app.route('/api/admin/admission', methods=['GET'])
+@require_admin
+def get_admission_stats():
+    """Per-lane concurrency, queue depth and shed counters of the worker
+    that answers (admin only)"""
+    return jsonify({
+        "pid": os.getpid(),
+        "lanes": governor.stats(),
+        "bcrypt": {"pending": hasher.pending, "max_pending": hasher.max_pending,
+                   "rejected": hasher.rejected}
+    })
+
+# ============================================================================
+# MAINTENANCE SCHEDULER
+# ============================================================================
+
+def job_optimize():
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA analysis_limit = 1000')
+        conn.exec_driver_sql('PRAGMA optimize')
+    return "ok"
+
+def job_analyze():
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA analysis_limit = 1000')
+        conn.exec_driver_sql('ANALYZE')
+    return "ok"
+
+def job_reclaim():
+    """Return free pages to the filesystem. The first time the free list
+    grows past RECLAIM_VACUUM_RATIO the database is switched to incremental
+    auto-vacuum (that takes one full VACUUM); afterwards each run releases
+    up to RECLAIM_MAX_PAGES pages without rewriting the file."""
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        pages = conn.exec_driver_sql('PRAGMA page_count').scalar()
+        free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+        if not free:
+            return "no free pages"
+        if conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+            conn.exec_driver_sql(f'PRAGMA incremental_vacuum({RECLAIM_MAX_PAGES})').fetchall()
+        elif free / pages >= RECLAIM_VACUUM_RATIO:
+            conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.exec_driver_sql('VACUUM')
+        else:
+            return f"{free} of {pages} pages free, below threshold"
+        left = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+    return f"released {free - left} of {pages} pages"
+
+def job_sessions():
+    """Delete expired flask_session files. Each starts with its expiry as a
+    4-byte timestamp (0 = never), as written by cachelib's FileSystemCache."""
+    directory = app.config['SESSION_FILE_DIR']
+    now = time.time()
+    removed = 0
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, name)
+        if name.startswith('__') or not os.path.isfile(path):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(4)
+            if len(header) == 4 and 0 < struct.unpack('I', header)[0] < now:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return f"removed {removed} expired sessions"
+
+def job_exports():
+    """Delete SQLite exports nobody downloaded for EXPORT_KEEP_DAYS and
+    leftovers of interrupted builds or imports."""
+    now = time.time()
+    removed = 0
+    for name in os.listdir(EXPORT_DIR) if os.path.isdir(EXPORT_DIR) else []:
+        path = os.path.join(EXPORT_DIR, name)
+        max_age = EXPORT_KEEP_DAYS * 86400 if name.endswith('.sqlite') else 3600
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return f"removed {removed} export files"
+
+def job_backup():
+    if not should_create_backup():
+        return "not due"
+    return "snapshot created" if create_backup() else "snapshot failed"
+
+# name -> (function, default interval in seconds)
+MAINTENANCE_JOBS = {
+    'backup': (job_backup, 3600),
+    'optimize': (job_optimize, 6 * 3600),
+    'analyze': (job_analyze, 7 * 86400),
+    'reclaim': (job_reclaim, 86400),
+    'sessions': (job_sessions, 6 * 3600),
+    'archive': (lambda: f"archived {archive_old_entries()} entries", 86400),
+    'change_events': (lambda: f"pruned {prune_change_events()} events", 3600),
+    'revisions': (lambda: f"pruned {prune_revisions()} revisions", 86400),
+    'purge': (lambda: f"purged {purge_deleted_users(pause=PURGE_BATCH_PAUSE)} accounts", 3600),
+    'exports': (job_exports, 86400),
+}
+
+def parse_intervals(spec):
+    """Parse 'backup=43200,optimize=3600' into per-job intervals; 0 disables a job."""
+    intervals = {}
+    for part in (spec or '').split(','):
+        name, _, seconds = part.partition('=')
+        if name.strip() in MAINTENANCE_JOBS and seconds.strip().isdigit():
+            intervals[name.strip()] = int(seconds)
+    return intervals
+
+MAINTENANCE_INTERVALS = parse_intervals(os.getenv('MAINTENANCE_INTERVALS'))
+
+_maintenance_lock = threading.Lock()
+_maintenance_pid = None
+_background_pid = None
+_maintenance_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+def job_interval(name):
+    return MAINTENANCE_INTERVALS.get(name, MAINTENANCE_JOBS[name][1])
+
+def _next_run(name, now):
+    return now + timedelta(seconds=job_interval(name) * (1 + random.uniform(0, MAINTENANCE_JITTER)))
+
+def ensure_maintenance_jobs():
+    """Create schedule rows for new jobs, first due within one tick."""
+    existing = {name for (name,) in db.session.query(MaintenanceJob.name)}
+    now = datetime.utcnow()
+    for name in MAINTENANCE_JOBS:
+        if name not in existing:
+            db.session.add(MaintenanceJob(
+                name=name, next_run_at=now + timedelta(seconds=random.uniform(0, MAINTENANCE_TICK))
+            ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+def run_job(name):
+    """Claim name's lease if it is due and not running elsewhere, then run it.
+    Returns False when the job was not claimed."""
+    now = datetime.utcnow()
+    claimed = MaintenanceJob.query.filter(
+        MaintenanceJob.name == name,
+        MaintenanceJob.next_run_at <= now,
+        db.or_(MaintenanceJob.lease_expires.is_(None), MaintenanceJob.lease_expires < now)
+    ).update({
+        MaintenanceJob.lease_owner: _maintenance_owner,
+        MaintenanceJob.lease_expires: now + timedelta(seconds=MAINTENANCE_LEASE_SECONDS),
+        MaintenanceJob.last_started_at: now
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return False
+
+    started = time.perf_counter()
+    try:
+        result, status = MAINTENANCE_JOBS[name][0](), 'ok'
+    except Exception as e:
+        db.session.rollback()
+        result, status = str(e), 'error'
+        app.logger.error("Maintenance job %s failed: %s", name, e)
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    finished = datetime.utcnow()
+    MaintenanceJob.query.filter_by(name=name, lease_owner=_maintenance_owner).update({
+        MaintenanceJob.lease_owner: None,
+        MaintenanceJob.lease_expires: None,
+        MaintenanceJob.next_run_at: _next_run(name, finished),
+        MaintenanceJob.last_finished_at: finished,
+        MaintenanceJob.last_duration_ms: duration_ms,
+        MaintenanceJob.last_status: status,
+        MaintenanceJob.last_result: str(result)[:500],
+        MaintenanceJob.runs: MaintenanceJob.runs + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    app.logger.info("Maintenance job %s: %s (%s ms)", name, result, duration_ms)
+    return True
+
+def run_due_jobs(names=None):
+    for name in names or MAINTENANCE_JOBS:
+        if job_interval(name) > 0:
+            run_job(name)
+
+def _maintenance_loop(names):
+    with app.app_context():
+        ensure_maintenance_jobs()
+        while True:
+            time.sleep(MAINTENANCE_TICK * random.uniform(0.5, 1.5))
+            try:
+                run_due_jobs(names)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error("Maintenance scheduler error: %s", e)
+            finally:
+                db.session.remove()
+
+def start_maintenance():
+    """Start this process's scheduler thread (once per process; forked
+    workers get their own). With MAINTENANCE_ENABLED=0 it still runs the
+    backup job, so turning housekeeping off never silently stops backups."""
+    global _maintenance_pid, _maintenance_owner, _background_pid
+    _background_pid = os.getpid()
+    names = None
+    if not MAINTENANCE_ENABLED:
+        names = ('backup',)
+        app.logger.warning("MAINTENANCE_ENABLED=0: only the backup job runs; archiving, pruning, "
+                           "session cleanup and database optimisation are off")
+    if job_interval('backup') <= 0:
+        app.logger.warning("Automatic backups are disabled (backup=0 in MAINTENANCE_INTERVALS)")
+    with _maintenance_lock:
+        if _maintenance_pid == os.getpid():
+            return
+        _maintenance_pid = os.getpid()
+        _maintenance_owner = f"{socket.gethostname()}:{os.getpid()}"
+        threading.Thread(target=_maintenance_loop, args=(names,), name='maintenance', daemon=True).start()
+
+def start_background_threads():
+    """Start the maintenance scheduler and, if configured, replication in
+    this process. Called from gunicorn's post_fork and, as a fallback for
+    other servers, on the first request."""
+    start_maintenance()
+    if not MAINTENANCE_ENABLED:
+        # Without the scheduler nothing else resumes interrupted purges
+        start_purge_worker()
+    if replicator is not None:
+        replicator.start()
+
+@app.before_request
+def ensure_background_started():
+    if _background_pid != os.getpid() and not app.testing:
+        start_background_threads()
+
+@app.route('/api/admin/maintenance', methods=['GET'])
+@require_admin
+def list_maintenance_jobs():
+    """Maintenance jobs with their cadence and last run (admin only)"""
+    try:
+        jobs = {job.name: job for job in MaintenanceJob.query.all()}
+        result = []
+        for name in MAINTENANCE_JOBS:
+            data = jobs[name].to_dict() if name in jobs else {'name': name}
+            data['interval_seconds'] = job_interval(name)
+            result.append(data)
+        replication = None
+        if replicator is not None:
+            replication = {"path": REPLICA_PATH, "reads": REPLICA_READS,
+                           "lag_seconds": replicator.lag(), "state": replicator.state()}
+        return jsonify({"jobs": result, "replication": replication})
+    except Exception as e:
+        app.logger.error("Maintenance status error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+@app.route('/api/admin/maintenance/<name>/run', methods=['POST'])
+@require_admin
+def schedule_maintenance_job(name):
+    """Make a job due now; a scheduler thread picks it up within a tick (admin only)"""
+    if name not in MAINTENANCE_JOBS:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        ensure_maintenance_jobs()
+        MaintenanceJob.query.filter_by(name=name).update(
+            {MaintenanceJob.next_run_at: datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        app.logger.info("Admin %s scheduled maintenance job %s", session.get('username'), name)
+        return jsonify({"status": "scheduled", "job": name}), 202
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Maintenance schedule error: %s", e)
+        return jsonify({"error": "Server error"}), 500
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+def init_app_data():
+    """One-time startup work: schema creation, legacy migration, job schedule.
+
+    Archiving, pruning, backups and other housekeeping run on the
+    maintenance scheduler (see MAINTENANCE_JOBS).
+
+    Runs at import unless JOURNAL_DEFER_INIT=1, in which case the process
+    manager (see gunicorn.conf.py) calls it once before forking workers.
+    """
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+        migrate_json_to_db()
+        import_legacy_backups()
+        ensure_maintenance_jobs()
+        # Purges interrupted by a restart resume on the first scheduler tick
+        if User.query.filter(User.deleted_at.isnot(None)).count():
+            MaintenanceJob.query.filter_by(name='purge').update(
+                {MaintenanceJob.next_run_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+        if REPLICA_PATH:
+            # Persistent; lets the replica copy run without blocking writers
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+if os.getenv('JOURNAL_DEFER_INIT') != '1':
+    init_app_data()
+
 if __name__ == '__main__':
     import os as _os
 
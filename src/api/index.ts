@@ -66,6 +66,24 @@ let _saveRetryAttempts = 0;
 const MAX_RETRIES = 3;
 const RETRY_DELAY = 1000;
 
+// Larger bodies are gzipped before upload where the browser supports
+// CompressionStream; the server inflates Content-Encoding: gzip requests
+const COMPRESS_MIN_BYTES = 1024;
+
+const jsonBody = async (body: string): Promise<{ body: BodyInit; headers: Record<string, string> }> => {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+  if (body.length < COMPRESS_MIN_BYTES || typeof CompressionStream === 'undefined') {
+    return { body, headers };
+  }
+  try {
+    const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+    const compressed = await new Response(stream).arrayBuffer();
+    return { body: compressed, headers: { ...headers, 'Content-Encoding': 'gzip' } };
+  } catch {
+    return { body, headers };
+  }
+};
+
 // --- API Methods ---
 export const api = {
   _isOnline,
@@ -127,11 +145,11 @@ export const api = {
   },
 
   _saveToServer: async (entry: JournalEntry): Promise<boolean> => {
+    const body = JSON.stringify(entry);
     const res = await fetch('/api/save', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
       credentials: 'include',
-      body: JSON.stringify(entry),
+      ...(await jsonBody(body)),
     });
     return res.ok;
   },
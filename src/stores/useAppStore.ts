@@ -257,7 +257,7 @@ export const useJournalStore = create<JournalState>()(
             custom: apiEntry.custom || [],
             activityLog: finalActivityLog,
             viciousCycles: apiEntry.viciousCycles || [],
-            generalMood: apiEntry.generalMood || '',
+            generalMood: apiEntry.generalMood ? String(apiEntry.generalMood) : '',
             dailyNote: apiEntry.dailyNote || '',
             thoughts: apiEntry.thoughts || '',
           };
@@ -37,9 +37,14 @@ if not exist ".env" (
     exit /b 1
 )
 
-REM Run the app
+REM Run the app (production: waitress via run_server.py)
 echo Starting server...
 echo.
-python serv.py
+findstr /b /c:"FLASK_ENV=production" .env >nul
+if %errorlevel%==0 (
+    python run_server.py
+) else (
+    python serv.py
+)
 
 pause
@@ -42,9 +42,13 @@ if [ ! -f ".env" ]; then
     exit 1
 fi
 
-# Run the app
+# Run the app (production: gunicorn/waitress via run_server.py)
 echo "Starting server..."
 echo
-python3 serv.py
+if [ "$FLASK_ENV" = "production" ] || grep -q '^FLASK_ENV=production' .env; then
+    python3 run_server.py
+else
+    python3 serv.py
+fi
 
 read -p "Press Enter to exit..."
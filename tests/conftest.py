@@ -0,0 +1,53 @@
+"""Shared fixtures.
+
+The backend runs from a copy in a temporary directory: Flask keeps the
+database in the app module's instance/ folder, so tests never touch the
+real one.
+"""
+import os
+import sys
+import glob
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGIN = {'Origin': 'http://localhost'}
+
+
+@pytest.fixture(scope='session')
+def serv(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('app')
+    for module in glob.glob(os.path.join(ROOT, '*.py')):
+        shutil.copy(module, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, str(workdir))
+    os.environ.setdefault('SECRET_KEY', 'test')
+    os.environ['BCRYPT_ROUNDS'] = '4'
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    import serv as module
+    module.app.testing = True
+    module.limiter.enabled = False
+    return module
+
+
+@pytest.fixture
+def client(serv):
+    client = serv.app.test_client()
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'}, headers=ORIGIN)
+    assert response.status_code == 200
+    return client
+
+
+def login(serv, username, password):
+    client = serv.app.test_client()
+    response = client.post('/api/login', json={'username': username, 'password': password}, headers=ORIGIN)
+    assert response.status_code == 200
+    return client
+
+
+def new_user(serv, admin, username, password='test-pass-123'):
+    """Create a user through the admin API; returns (user_id, logged-in client)."""
+    response = admin.post('/api/admin/users', json={'username': username, 'password': password}, headers=ORIGIN)
+    assert response.status_code == 201
+    return response.get_json()['user']['id'], login(serv, username, password)
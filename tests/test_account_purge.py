@@ -0,0 +1,38 @@
+"""Deleted accounts lose their sessions at once, and interrupted purges
+are rescheduled at startup."""
+from datetime import datetime
+
+from conftest import ORIGIN
+
+
+def test_deleted_account_session_is_rejected(serv, client):
+    response = client.post('/api/admin/users', headers=ORIGIN,
+                           json={'username': 'leaving', 'password': 'leaving-pass-1', 'email': 'l@example.com'})
+    assert response.status_code in (200, 201)
+    user_id = response.get_json()['user']['id']
+
+    other = serv.app.test_client()
+    assert other.post('/api/login', json={'username': 'leaving', 'password': 'leaving-pass-1'},
+                      headers=ORIGIN).status_code == 200
+    assert other.get('/api/entries').status_code == 200
+
+    assert client.delete(f'/api/admin/users/{user_id}', headers=ORIGIN).status_code in (200, 202)
+    assert other.get('/api/entries').status_code == 401
+    assert other.get('/api/check-auth').status_code == 401
+
+
+def test_pending_purge_rescheduled_at_startup(serv):
+    with serv.app.app_context():
+        user = serv.User(username='half-purged', password_hash='x', deleted_at=datetime.utcnow())
+        serv.db.session.add(user)
+        serv.db.session.commit()
+        serv.MaintenanceJob.query.filter_by(name='purge').update(
+            {serv.MaintenanceJob.next_run_at: datetime(2100, 1, 1)}, synchronize_session=False)
+        serv.db.session.commit()
+
+    serv.init_app_data()
+    with serv.app.app_context():
+        job = serv.db.session.get(serv.MaintenanceJob, 'purge')
+        assert job.next_run_at <= datetime.utcnow()
+        assert serv.purge_deleted_users() >= 1
+        assert serv.User.query.filter_by(username='half-purged').first() is None
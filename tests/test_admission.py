@@ -0,0 +1,87 @@
+"""Admission lanes: requests over a lane's limit queue, are admitted when a
+slot frees up, and are rejected (503 with the lane's Retry-After) when the
+queue is full, the wait times out or the process is too busy."""
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionRejected, Governor, Lane
+from conftest import ORIGIN
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_queued_request_gets_the_freed_slot():
+    lane = Lane('write', limit=1, queue=1, timeout=5)
+    governor = Governor([lane], {})
+    governor.acquire(lane)
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (governor.acquire(lane), admitted.set()))
+    waiter.start()
+    wait_for(lambda: lane.waiting == 1)
+
+    with pytest.raises(AdmissionRejected) as e:
+        governor.acquire(lane)
+    assert e.value.reason == 'queue_full'
+    assert not admitted.is_set()
+
+    governor.release(lane)
+    waiter.join()
+    assert admitted.is_set()
+    assert (lane.active, lane.waiting, lane.admitted, lane.queued) == (1, 0, 2, 1)
+    assert lane.stats()['rejected'] == {'shed': 0, 'queue_full': 1, 'timeout': 0}
+
+
+def test_queue_timeout():
+    lane = Lane('read', limit=1, queue=1, timeout=0.05)
+    governor = Governor([lane], {})
+    governor.acquire(lane)
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected) as e:
+        governor.acquire(lane)
+    assert e.value.reason == 'timeout'
+    assert 0.05 <= time.monotonic() - started < 1
+    assert (lane.active, lane.waiting) == (1, 0)
+
+    governor.release(lane)
+    governor.acquire(lane)
+    assert lane.active == 1
+
+
+def test_heavy_lane_sheds_under_pressure():
+    write = Lane('write', limit=4, queue=4, timeout=1)
+    export = Lane('export', limit=1, queue=1, timeout=1, shed_at=2)
+    stream = Lane('stream', limit=2, pressure=False)
+    governor = Governor([write, export, stream], {})
+    governor.acquire(stream)
+    governor.acquire(stream)
+    governor.acquire(export)
+    governor.release(export)
+    governor.acquire(write)
+    governor.acquire(write)
+    with pytest.raises(AdmissionRejected) as e:
+        governor.acquire(export)
+    assert e.value.reason == 'shed'
+    governor.acquire(write)
+    assert governor.busy_threads() == 2
+
+
+def test_rejected_request_gets_retry_after(serv, client, monkeypatch):
+    lane = serv.governor.lanes['export']
+    monkeypatch.setattr(lane, 'timeout', 0.05)
+    serv.governor.acquire(lane)
+    try:
+        response = client.get('/api/export/json', headers=ORIGIN)
+    finally:
+        serv.governor.release(lane)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(lane.retry_after)
+    assert lane.rejected['timeout'] >= 1
+
+    assert client.get('/api/export/json', headers=ORIGIN).status_code == 200
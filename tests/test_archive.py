@@ -0,0 +1,59 @@
+"""Old entries move to yearly archives and stay readable, writable and
+deletable through the usual endpoints."""
+from conftest import ORIGIN, new_user
+
+
+def entry(date, mood=5, note='note'):
+    return {'date': date, 'generalMood': mood, 'dailyNote': note}
+
+
+def test_archived_entries_read_through(serv, client):
+    user_id, user = new_user(serv, client, 'archivist')
+    for date in ('2020-01-05', '2020-02-10', '2021-03-01'):
+        assert user.post('/api/save', json=entry(date), headers=ORIGIN).status_code == 200
+    with serv.app.app_context():
+        assert serv.archive_old_entries(max_age_days=30) >= 3
+        assert serv.JournalEntry.query.filter_by(user_id=user_id).count() == 0
+        assert {a.year: a.entry_count for a in serv.EntryArchive.query.filter_by(user_id=user_id)} == {2020: 2, 2021: 1}
+
+    entries = user.get('/api/entries').get_json()
+    assert sorted(entries) == ['2020-01-05', '2020-02-10', '2021-03-01']
+    assert user.get('/api/entries/2020-02-10').get_json() == entry('2020-02-10')
+    found = user.get('/api/entries/query?generalMood.gte=5').get_json()
+    assert found['count'] == 3
+
+
+def test_unchanged_save_keeps_entry_archived(serv, client):
+    user_id, user = new_user(serv, client, 'archivist2')
+    user.post('/api/save', json=entry('2020-01-05'), headers=ORIGIN)
+    with serv.app.app_context():
+        serv.archive_old_entries(max_age_days=30)
+        archive = serv.EntryArchive.query.filter_by(user_id=user_id).one()
+        blob, version = archive.data, serv.get_data_version(user_id)
+
+    response = user.post('/api/save', json=entry('2020-01-05'), headers=ORIGIN)
+    assert response.get_json()['unchanged'] is True
+    with serv.app.app_context():
+        assert serv.JournalEntry.query.filter_by(user_id=user_id).count() == 0
+        assert serv.EntryArchive.query.filter_by(user_id=user_id).one().data == blob
+        assert serv.get_data_version(user_id) == version
+
+
+def test_edit_and_delete_archived_entry(serv, client):
+    user_id, user = new_user(serv, client, 'archivist3')
+    for date in ('2020-01-05', '2020-01-06'):
+        user.post('/api/save', json=entry(date), headers=ORIGIN)
+    with serv.app.app_context():
+        serv.archive_old_entries(max_age_days=30)
+
+    response = user.post('/api/save', json=entry('2020-01-05', note='edited'), headers=ORIGIN)
+    assert 'unchanged' not in response.get_json()
+    with serv.app.app_context():
+        assert serv.JournalEntry.query.filter_by(user_id=user_id).one().date == '2020-01-05'
+        assert serv.EntryArchive.query.filter_by(user_id=user_id).one().entry_count == 1
+    assert user.get('/api/entries/2020-01-05').get_json()['dailyNote'] == 'edited'
+
+    assert user.delete('/api/delete/2020-01-06', headers=ORIGIN).status_code == 200
+    with serv.app.app_context():
+        assert serv.EntryArchive.query.filter_by(user_id=user_id).count() == 0
+    assert sorted(user.get('/api/entries').get_json()) == ['2020-01-05']
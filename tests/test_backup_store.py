@@ -0,0 +1,58 @@
+"""Legacy full-copy backups are imported into the snapshot store, in time
+order, and then fall under its retention."""
+import os
+import sqlite3
+
+from backup_store import BackupStore
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (x)')
+    conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_backups_imported_and_pruned(tmp_path):
+    backups = tmp_path / 'backups'
+    backups.mkdir()
+    store = BackupStore(str(backups / 'store'))
+    current = str(tmp_path / 'journal.db')
+    make_db(current, 10)
+    store.create_snapshot(current)
+
+    make_db(str(backups / 'journal_backup_20230101_120000.db'), 1000)
+    make_db(str(backups / 'journal_backup_20230102_120000.db'), 2000)
+    (backups / 'journal_backup_broken.db').write_bytes(b'not a database')
+    with open(backups / 'journal_backup_20230102_120000.db', 'rb') as f:
+        original = f.read()
+
+    records = store.import_legacy(str(backups))
+    assert [r['id'] for r in records] == ['20230101_120000', '20230102_120000']
+    assert sorted(os.listdir(backups)) == ['journal_backup_broken.db', 'store']
+    assert [s['id'] for s in store.snapshots()][:2] == ['20230101_120000', '20230102_120000']
+    assert store.import_legacy(str(backups)) == []
+
+    restored = str(tmp_path / 'restored.db')
+    store.restore('20230102_120000', restored)
+    with open(restored, 'rb') as f:
+        assert f.read() == original
+
+    assert store.prune(keep=1) == ['20230101_120000', '20230102_120000']
+    assert store.latest()['id'] not in ('20230101_120000', '20230102_120000')
+    assert store.verify(store.latest()['id']) == []
+
+
+def test_legacy_import_runs_at_startup_only(serv):
+    legacy = os.path.join(serv.BACKUP_DIR, 'journal_backup_20230103_120000.db')
+    os.makedirs(serv.BACKUP_DIR, exist_ok=True)
+    make_db(legacy, 10)
+
+    with serv.app.app_context():
+        assert serv.create_backup()
+    assert os.path.exists(legacy)
+
+    serv.init_app_data()
+    assert not os.path.exists(legacy)
+    assert '20230103_120000' in [s['id'] for s in serv.backup_store.snapshots()]
@@ -0,0 +1,33 @@
+"""Bulk user creation validates every row and hashes on the shared
+bcrypt pool."""
+from conftest import ORIGIN, login
+
+
+def test_bulk_create(serv, client, monkeypatch):
+    batches = []
+    hash_many = serv.hasher.hash_many
+    monkeypatch.setattr(serv.hasher, 'hash_many', lambda passwords: batches.append(len(passwords)) or hash_many(passwords))
+
+    users = [{'username': f'bulk{i}', 'password': f'bulk-pass-{i}', 'email': f'bulk{i}@example.com'} for i in range(6)]
+    users += [
+        {'username': 'bulk0', 'password': 'another-pass'},
+        {'username': 'bulk-short', 'password': 'x'},
+        {'username': 'bulk-mail', 'password': 'bulk-pass-x', 'email': 'bulk1@example.com'},
+        'not a row',
+    ]
+    response = client.post('/api/admin/users/bulk', json={'users': users}, headers=ORIGIN)
+    assert response.status_code == 201
+    statuses = [row['status'] for row in response.get_json()['results']]
+    assert statuses == ['created'] * 6 + ['error'] * 4
+    assert batches == [6]
+    login(serv, 'bulk3', 'bulk-pass-3')
+
+    again = client.post('/api/admin/users/bulk', json={'users': users[:1]}, headers=ORIGIN).get_json()
+    assert again['results'][0]['error'] == 'Username already exists'
+
+
+def test_hash_many_uses_the_pool(serv):
+    hasher = serv.PasswordHasher(workers=2, max_pending=1, rounds=4, timeout=5)
+    hashes = hasher.hash_many([f'password{i}' for i in range(5)])
+    assert [hasher.check(f'password{i}', h) for i, h in enumerate(hashes)] == [True] * 5
+    assert hasher.rejected == 0
@@ -0,0 +1,39 @@
+"""Emotion rollups moved by each save match a full rebuild."""
+from conftest import ORIGIN, new_user
+
+
+def cycles(*groups):
+    return [{'id': i, 'emotions': [{'id': j, 'name': name, 'score': score}
+                                   for j, (name, score) in enumerate(group)]}
+            for i, group in enumerate(groups)]
+
+
+def stored(serv, user_id):
+    with serv.app.app_context():
+        return (sorted((s.bucket, s.name, s.count, s.score_sum) for s in serv.EmotionStat.query.filter_by(user_id=user_id)),
+                sorted((p.bucket, p.a, p.b, p.count) for p in serv.EmotionPair.query.filter_by(user_id=user_id)))
+
+
+def test_incremental_rollups_match_rebuild(serv, client):
+    user_id, user = new_user(serv, client, 'feelings')
+    saves = [
+        ('2024-01-03', cycles([('Fear', 3), ('anger', 2)], [('fear', 5)])),
+        ('2024-01-04', cycles([('fear', 1), ('shame', 4), ('anger', 0)])),
+        ('2024-01-03', cycles([('fear', 4)], [('joy', 2), ('anger', 2)])),
+        ('2024-02-01', cycles([('joy', 7)])),
+        ('2024-01-04', []),
+        ('2024-02-01', cycles([('joy', 7)])),
+    ]
+    for date, viciousCycles in saves:
+        assert user.post('/api/save', json={'date': date, 'viciousCycles': viciousCycles},
+                         headers=ORIGIN).status_code == 200
+    user.delete('/api/delete/2024-02-01', headers=ORIGIN)
+    incremental = stored(serv, user_id)
+    assert incremental == (
+        [('2024-01-01', 'anger', 1, 2), ('2024-01-01', 'fear', 1, 4), ('2024-01-01', 'joy', 1, 2)],
+        [('2024-01-01', 'anger', 'joy', 1)],
+    )
+
+    with serv.app.app_context():
+        serv.rebuild_emotions(user_id)
+    assert stored(serv, user_id) == incremental
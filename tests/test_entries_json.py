@@ -0,0 +1,41 @@
+"""/api/entries splices stored JSON text (json_set adds the date) into the
+body; it must decode to exactly what to_dict() gives, big integers
+included."""
+import json
+
+from conftest import new_user
+
+CONTENT = {
+    'generalMood': 7,
+    'dailyNote': 'café   "quoted" \\ \U0001f600',
+    'counter': 2 ** 70,
+    'negative': -(2 ** 80) + 1,
+    'edge': 2 ** 63,
+    'ratio': 0.1,
+    'tiny': 1.5e-300,
+    'nested': {'list': [1, None, True, {'deep': [10 ** 30 + 1]}], 'empty': {}},
+}
+
+
+def test_raw_read_path_matches_to_dict(serv, client):
+    user_id, user = new_user(serv, client, 'rawreader')
+    with serv.app.app_context():
+        for date_key in ('2020-06-01', '2025-01-02', '2025-01-01'):
+            serv.db.session.add(serv.JournalEntry(user_id=user_id, date=date_key,
+                                                  content=dict(CONTENT, date=date_key)))
+        serv.db.session.commit()
+        serv.archive_old_entries(max_age_days=365 * 3)
+        # The stored date is not trusted: the column wins, as in to_dict()
+        entry = serv.JournalEntry.query.filter_by(user_id=user_id, date='2025-01-01').one()
+        entry.content = dict(CONTENT, date='1999-01-01')
+        serv.db.session.commit()
+
+        expected = serv.load_user_entries(user_id, ordered=True)
+        assert expected['2025-01-01'] == entry.to_dict()
+        assert expected['2025-01-01']['counter'] == 2 ** 70
+        for ordered in (False, True):
+            raw = json.loads(serv.load_user_entries_json(user_id, ordered=ordered))
+            assert raw == expected
+        assert list(raw) == ['2020-06-01', '2025-01-01', '2025-01-02']
+
+    assert json.loads(user.get('/api/entries').data) == expected
@@ -0,0 +1,56 @@
+"""/api/entries/query: numbers are stored numeric, so the indexed SQL
+filters and the Python filters over archived entries agree."""
+import json
+
+from conftest import ORIGIN, new_user
+
+MOODS = {'2024-03-01': '3', '2024-03-02': 8, '2024-03-03': '', '2024-03-04': '7.5'}
+
+
+def dates(user, query):
+    return sorted(user.get('/api/entries/query?' + query).get_json()['entries'])
+
+
+def test_moods_stored_as_numbers(serv, client):
+    user_id, user = new_user(serv, client, 'numeric')
+    for date, mood in MOODS.items():
+        user.post('/api/save', json={'date': date, 'generalMood': mood,
+                                     'sleep': {'quality': '6'}}, headers=ORIGIN)
+    entries = user.get('/api/entries').get_json()
+    assert [entries[d]['generalMood'] for d in MOODS] == [3, 8, None, 7.5]
+    assert entries['2024-03-01']['sleep'] == {'quality': 6}
+
+    assert dates(user, 'generalMood.lt=5') == ['2024-03-01']
+    assert dates(user, 'generalMood.gt=5') == ['2024-03-02', '2024-03-04']
+    assert dates(user, 'generalMood.eq=7.5') == ['2024-03-04']
+    assert len(dates(user, 'sleep.quality.eq=6')) == 4
+    assert user.get('/api/entries/query?generalMood.lt=x').status_code == 400
+
+
+def test_hot_and_archived_filters_agree(serv, client):
+    user_id, user = new_user(serv, client, 'numeric-archived')
+    for date, mood in MOODS.items():
+        for year in ('2020', '2024'):
+            user.post('/api/save', json={'date': year + date[4:], 'generalMood': mood}, headers=ORIGIN)
+    with serv.app.app_context():
+        serv.archive_old_entries(max_age_days=365 * 3)
+        assert serv.EntryArchive.query.filter_by(user_id=user_id).count() == 1
+
+    for query in ('generalMood.lt=5', 'generalMood.gt=5', 'generalMood.gte=0', 'generalMood.eq=8'):
+        found = dates(user, query)
+        assert [d[5:] for d in found if d < '2024'] == [d[5:] for d in found if d >= '2024'], query
+
+
+def test_legacy_string_moods_normalized(serv, client):
+    user_id, user = new_user(serv, client, 'numeric-legacy')
+    user.post('/api/save', json={'date': '2024-04-01', 'generalMood': 4}, headers=ORIGIN)
+    with serv.app.app_context():
+        with serv.db.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "UPDATE entries SET content = ?, content_hash = NULL WHERE user_id = ?",
+                (json.dumps({'generalMood': '9'}), user_id))
+        serv.ensure_schema()
+        entry = serv.JournalEntry.query.filter_by(user_id=user_id).one()
+        assert entry.content == {'generalMood': 9}
+        assert entry.content_hash == serv.content_hash(entry.to_dict())
+    assert dates(user, 'generalMood.gt=5') == ['2024-04-01']
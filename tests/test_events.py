@@ -0,0 +1,92 @@
+"""Change feed ids are never reused, and event streams are capped per
+worker and per user."""
+import time
+from datetime import datetime
+
+from conftest import ORIGIN
+
+
+def test_change_event_ids_not_reused_after_prune(serv):
+    with serv.app.app_context():
+        serv.record_change(1, 'settings')
+        serv.db.session.commit()
+        newest = serv.db.session.query(serv.db.func.max(serv.ChangeEvent.id)).scalar()
+        serv.ChangeEvent.query.delete()
+        serv.record_change(1, 'settings')
+        serv.db.session.commit()
+        assert serv.db.session.query(serv.db.func.max(serv.ChangeEvent.id)).scalar() > newest
+
+
+def test_legacy_change_events_table_rebuilt(serv):
+    with serv.app.app_context():
+        with serv.db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE change_events')
+            conn.exec_driver_sql(
+                'CREATE TABLE change_events (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, '
+                'kind VARCHAR(20) NOT NULL, action VARCHAR(20) NOT NULL, date VARCHAR(10), created_at DATETIME)')
+            conn.exec_driver_sql('CREATE INDEX ix_change_events_user_id ON change_events (user_id, id)')
+            conn.exec_driver_sql("INSERT INTO change_events VALUES (7, 1, 'entry', 'saved', '2024-01-01', ?)",
+                                 (datetime.utcnow(),))
+            serv.ensure_change_events_autoincrement(conn)
+            ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'change_events'").scalar()
+            assert 'AUTOINCREMENT' in ddl
+            assert conn.exec_driver_sql('SELECT id, date FROM change_events').fetchall() == [(7, '2024-01-01')]
+            conn.exec_driver_sql('DELETE FROM change_events')
+        serv.record_change(1, 'settings')
+        serv.db.session.commit()
+        assert serv.db.session.query(serv.db.func.max(serv.ChangeEvent.id)).scalar() > 7
+
+
+def login(serv, username, password):
+    client = serv.app.test_client()
+    assert client.post('/api/login', json={'username': username, 'password': password},
+                       headers=ORIGIN).status_code == 200
+    return client
+
+
+def test_event_streams_capped(serv, client):
+    assert client.post('/api/admin/users', headers=ORIGIN,
+                       json={'username': 'streamer', 'password': 'streamer-pass-1'}).status_code == 201
+    other = login(serv, 'streamer', 'streamer-pass-1')
+
+    streams = [client.get('/api/events', buffered=False) for _ in range(serv.SSE_MAX_STREAMS_PER_USER)]
+    assert all(response.status_code == 200 for response in streams)
+    refused = client.get('/api/events', buffered=False)
+    assert refused.status_code == 503 and refused.headers['Retry-After']
+
+    # The worker's stream lane (2 by default) is full as well
+    assert other.get('/api/events', buffered=False).status_code == 503
+
+    for response in streams:
+        response.close()
+    assert serv.governor.lanes['stream'].active == 0
+    response = other.get('/api/events', buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_open_streams_do_not_shed_exports(serv, client):
+    streams = [client.get('/api/events', buffered=False) for _ in range(2)]
+    try:
+        assert all(response.status_code == 200 for response in streams)
+        for url in ('/api/export/json', '/api/export/csv'):
+            assert client.get(url).status_code == 200, url
+        assert serv.app.test_client().post('/api/login', json={'username': 'admin', 'password': 'admin'},
+                                           headers=ORIGIN).status_code == 200
+    finally:
+        for response in streams:
+            response.close()
+
+
+def test_stream_gives_thread_back_when_worker_saturated(serv, client, monkeypatch):
+    monkeypatch.setattr(serv, 'SSE_POLL_INTERVAL', 0.01)
+    response = client.get('/api/events', buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+
+    monkeypatch.setattr(serv, 'REQUEST_THREADS', 1)
+    started = time.monotonic()
+    assert list(chunks) == []
+    assert time.monotonic() - started < 1
+    response.close()
+    assert serv.governor.lanes['stream'].active == 0
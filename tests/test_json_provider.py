@@ -0,0 +1,25 @@
+"""Integers beyond 64 bits survive the orjson fast paths."""
+from conftest import ORIGIN
+
+BIG = 10 ** 20
+
+
+def test_dumps_and_loads_big_integers(serv):
+    provider = serv.app.json
+    assert provider.dumps_bytes({'id': BIG}) == b'{"id":100000000000000000000}'
+    assert provider.loads(b'{"value":99999999999999999999}') == {'value': 99999999999999999999}
+
+
+def test_entry_with_big_id_round_trips(client):
+    entry = {'date': '2024-07-01', 'timeSlots': [{'time': '08:00', 'activities': [{'id': BIG, 'name': 'walk'}]}]}
+    assert client.post('/api/save', json=entry, headers=ORIGIN).status_code == 200
+    response = client.get('/api/entries/2024-07-01')
+    assert response.status_code == 200
+    assert response.get_json()['timeSlots'][0]['activities'][0]['id'] == BIG
+
+
+def test_settings_keep_big_integers(client):
+    body = b'{"counter": 99999999999999999999}'
+    response = client.post('/api/settings', data=body, headers={**ORIGIN, 'Content-Type': 'application/json'})
+    assert response.status_code == 200
+    assert client.get('/api/settings').get_json() == {'counter': 99999999999999999999}
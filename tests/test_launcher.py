@@ -0,0 +1,62 @@
+"""run_server picks gunicorn when it can and waitress otherwise;
+gunicorn.conf.py reads its settings from the environment."""
+import os
+import sys
+import runpy
+
+import pytest
+
+import run_server
+
+
+@pytest.fixture
+def launched(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run_server, 'run_gunicorn', lambda host, port: calls.append(('gunicorn', host, port)))
+    monkeypatch.setattr(run_server, 'run_waitress', lambda host, port: calls.append(('waitress', host, port)))
+    monkeypatch.setattr(run_server.os, 'chdir', lambda path: None)
+    monkeypatch.setenv('FLASK_ENV', 'production')
+    for name in ('APP_SERVER', 'HOST', 'PORT'):
+        monkeypatch.delenv(name, raising=False)
+
+    def launch(*argv, gunicorn=True):
+        monkeypatch.setattr(run_server, 'gunicorn_available', lambda: gunicorn)
+        monkeypatch.setattr(sys, 'argv', ['run_server.py', *argv])
+        run_server.main()
+        return calls.pop()
+    return launch
+
+
+def test_server_choice(launched, monkeypatch):
+    assert launched() == ('gunicorn', '0.0.0.0', 5000)
+    assert launched(gunicorn=False) == ('waitress', '0.0.0.0', 5000)
+    assert launched('--server', 'waitress', '--port', '8080') == ('waitress', '0.0.0.0', 8080)
+    monkeypatch.setenv('APP_SERVER', 'gunicorn')
+    monkeypatch.setenv('HOST', '127.0.0.1')
+    assert launched(gunicorn=False) == ('gunicorn', '127.0.0.1', 5000)
+
+
+def test_gunicorn_command(monkeypatch):
+    # Recorded first so that the value run_gunicorn sets is undone
+    monkeypatch.setenv('GUNICORN_BIND', '')
+    monkeypatch.delenv('GUNICORN_BIND')
+    executed = []
+    monkeypatch.setattr(run_server.os, 'execv', lambda path, argv: executed.append(argv))
+    run_server.run_gunicorn('127.0.0.1', 8000)
+    assert os.environ['GUNICORN_BIND'] == '127.0.0.1:8000'
+    assert executed == [[sys.executable, '-m', 'gunicorn', '-c', run_server.GUNICORN_CONFIG, 'serv:app']]
+
+
+def test_gunicorn_config(monkeypatch):
+    # Set first so that the config's setdefault() calls leave them alone
+    monkeypatch.setenv('JOURNAL_DEFER_INIT', '1')
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    monkeypatch.setenv('GUNICORN_THREADS', '6')
+    monkeypatch.setenv('GUNICORN_BIND', 'unix:/tmp/journal.sock')
+    config = runpy.run_path(run_server.GUNICORN_CONFIG)
+    assert (config['workers'], config['threads'], config['bind']) == (3, 6, 'unix:/tmp/journal.sock')
+    assert config['worker_class'] == 'gthread' and config['preload_app']
+
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    assert 1 <= runpy.run_path(run_server.GUNICORN_CONFIG)['workers'] <= 8
@@ -0,0 +1,80 @@
+"""The logging pipeline writes JSON lines from a background thread, routes
+warnings to errors.log, samples high-volume INFO messages and drops
+records rather than block when its queue is full."""
+import json
+import logging
+
+from journal_logging import LoggingPipeline, parse_sampling
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def make_logger(name, pipeline):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(pipeline.handler)
+    return logger
+
+
+def test_json_lines_routed_by_level(tmp_path):
+    pipeline = LoggingPipeline(log_dir=str(tmp_path), sampling={})
+    pipeline.start()
+    logger = make_logger('test.routing', pipeline)
+    try:
+        args = {'count': 1}
+        logger.info("Saved %s", args, extra={'user_id': 7})
+        args['count'] = 2
+        logger.warning("Slow request: %s ms", 1200)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception("Failed")
+    finally:
+        pipeline.stop()
+        logger.removeHandler(pipeline.handler)
+
+    lines = read_lines(tmp_path / 'journal.log')
+    assert [line['msg'] for line in lines] == ["Saved {'count': 1}", 'Slow request: 1200 ms', 'Failed']
+    assert lines[0]['user_id'] == 7 and lines[0]['level'] == 'INFO' and lines[0]['logger'] == 'test.routing'
+    assert 'ValueError: boom' in lines[2]['exc']
+    assert [line['level'] for line in read_lines(tmp_path / 'errors.log')] == ['WARNING', 'ERROR']
+
+
+def test_sampling_spares_warnings(tmp_path):
+    pipeline = LoggingPipeline(log_dir=str(tmp_path), sampling=parse_sampling('Entry saved=0,Settings=1'))
+    pipeline.start()
+    logger = make_logger('test.sampling', pipeline)
+    try:
+        for i in range(20):
+            logger.info("Entry saved: %s", i)
+        logger.info("Settings saved")
+        logger.warning("Entry saved twice")
+    finally:
+        pipeline.stop()
+        logger.removeHandler(pipeline.handler)
+    assert [line['msg'] for line in read_lines(tmp_path / 'journal.log')] == ['Settings saved', 'Entry saved twice']
+
+
+def test_full_queue_drops(tmp_path):
+    pipeline = LoggingPipeline(log_dir=str(tmp_path), sampling={}, queue_size=2)
+    logger = make_logger('test.dropping', pipeline)
+    try:
+        # No listener running: the queue fills up and stays full
+        for i in range(5):
+            logger.info("Record %s", i)
+    finally:
+        logger.removeHandler(pipeline.handler)
+    assert pipeline.handler.dropped == 3
+    pipeline.start()
+    pipeline.stop()
+    assert [line['msg'] for line in read_lines(tmp_path / 'journal.log')] == ['Record 0', 'Record 1']
+
+
+def test_parse_sampling():
+    assert parse_sampling('Entry saved=0.1, Settings saved = 2,bad,Other=x') == \
+        {'Entry saved': 0.1, 'Settings saved': 1.0}
+    assert parse_sampling(None) == {}
@@ -0,0 +1,101 @@
+"""Maintenance scheduler: leases make each due job run once, failures are
+recorded, backups keep running with the scheduler disabled, and the
+sessions job sweeps expired session files."""
+import logging
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def jobs(serv, monkeypatch):
+    """Replace the job functions with recorders; returns the call log."""
+    calls = []
+    for name, (_, interval) in list(serv.MAINTENANCE_JOBS.items()):
+        monkeypatch.setitem(serv.MAINTENANCE_JOBS, name, (lambda name=name: calls.append(name) or 'done', interval))
+    with serv.app.app_context():
+        serv.ensure_maintenance_jobs()
+        serv.MaintenanceJob.query.update({serv.MaintenanceJob.next_run_at: datetime.utcnow() + timedelta(hours=1),
+                                          serv.MaintenanceJob.lease_owner: None,
+                                          serv.MaintenanceJob.lease_expires: None})
+        serv.db.session.commit()
+    return calls
+
+
+def make_due(serv, name, **values):
+    serv.MaintenanceJob.query.filter_by(name=name).update(
+        {serv.MaintenanceJob.next_run_at: datetime.utcnow() - timedelta(seconds=1),
+         **{getattr(serv.MaintenanceJob, k): v for k, v in values.items()}})
+    serv.db.session.commit()
+
+
+def test_due_job_runs_once(serv, jobs):
+    with serv.app.app_context():
+        make_due(serv, 'optimize')
+        serv.run_due_jobs()
+        serv.run_due_jobs()
+        job = serv.db.session.get(serv.MaintenanceJob, 'optimize')
+        assert jobs == ['optimize']
+        assert (job.last_status, job.last_result, job.lease_owner) == ('ok', 'done', None)
+        assert job.next_run_at > datetime.utcnow() + timedelta(hours=5)
+
+
+def test_lease_held_elsewhere(serv, jobs):
+    with serv.app.app_context():
+        make_due(serv, 'analyze', lease_owner='other:1', lease_expires=datetime.utcnow() + timedelta(minutes=5))
+        assert serv.run_job('analyze') is False
+        make_due(serv, 'analyze', lease_expires=datetime.utcnow() - timedelta(seconds=1))
+        assert serv.run_job('analyze') is True
+        assert jobs == ['analyze']
+
+
+def test_failure_recorded_and_lease_released(serv, jobs, monkeypatch):
+    def broken():
+        raise RuntimeError('disk full')
+    monkeypatch.setitem(serv.MAINTENANCE_JOBS, 'reclaim', (broken, 86400))
+    with serv.app.app_context():
+        make_due(serv, 'reclaim')
+        assert serv.run_job('reclaim') is True
+        job = serv.db.session.get(serv.MaintenanceJob, 'reclaim')
+        assert (job.last_status, job.last_result, job.lease_expires) == ('error', 'disk full', None)
+
+
+def test_backup_runs_with_scheduler_disabled(serv, jobs, monkeypatch, caplog):
+    threads = []
+
+    class Thread:
+        def __init__(self, target, args=(), **kwargs):
+            threads.append(args)
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr(serv, 'MAINTENANCE_ENABLED', False)
+    monkeypatch.setattr(serv, '_maintenance_pid', None)
+    monkeypatch.setattr(serv.threading, 'Thread', Thread)
+    with caplog.at_level(logging.WARNING, logger=serv.app.logger.name):
+        serv.start_maintenance()
+    assert threads == [(('backup',),)]
+    assert 'only the backup job runs' in caplog.text
+
+    with serv.app.app_context():
+        make_due(serv, 'backup')
+        make_due(serv, 'sessions')
+        serv.run_due_jobs(*threads[0])
+    assert jobs == ['backup']
+
+
+def test_sessions_job_removes_expired_files(serv):
+    directory = serv.app.config['SESSION_FILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    files = {'expired': int(time.time()) - 10, 'live': int(time.time()) + 3600, 'forever': 0}
+    for name, expires in files.items():
+        with open(os.path.join(directory, f'test-{name}'), 'wb') as f:
+            f.write(struct.pack('I', expires) + b'payload')
+    with serv.app.app_context():
+        serv.job_sessions()
+    left = {name for name in files if os.path.exists(os.path.join(directory, f'test-{name}'))}
+    assert left == {'live', 'forever'}
@@ -0,0 +1,59 @@
+"""The bcrypt pool bounds queued work: over max_pending, calls fail fast
+with HasherBusy and login answers 503 with Retry-After."""
+import threading
+import time
+
+import pytest
+
+from conftest import ORIGIN
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_pending_bound(serv):
+    hasher = serv.PasswordHasher(workers=1, max_pending=2, rounds=4, timeout=5)
+    release = threading.Event()
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(hasher._run(release.wait))) for _ in range(2)]
+    for caller in callers:
+        caller.start()
+    wait_for(lambda: hasher.pending == 2)
+
+    started = time.time()
+    with pytest.raises(serv.HasherBusy):
+        hasher.hash('password')
+    assert time.time() - started < 0.5
+    assert hasher.rejected == 1
+
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert results == [True, True]
+    wait_for(lambda: hasher.pending == 0)
+
+    password_hash = hasher.hash('password')
+    assert hasher.check('password', password_hash) and not hasher.check('other', password_hash)
+    assert not hasher.needs_rehash(password_hash)
+    assert serv.PasswordHasher(1, 1, 5, 5).needs_rehash(password_hash)
+
+
+def test_timeout_frees_the_slot(serv):
+    hasher = serv.PasswordHasher(workers=1, max_pending=1, rounds=4, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(serv.HasherBusy):
+        hasher._run(release.wait)
+    release.set()
+    wait_for(lambda: hasher.pending == 0)
+
+
+def test_login_sheds_when_saturated(serv, monkeypatch):
+    monkeypatch.setattr(serv, 'hasher', serv.PasswordHasher(workers=1, max_pending=0, rounds=4, timeout=5))
+    response = serv.app.test_client().post('/api/login', json={'username': 'admin', 'password': 'admin'},
+                                           headers=ORIGIN)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
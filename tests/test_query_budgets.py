@@ -0,0 +1,87 @@
+"""Query budgets hold for the largest payloads the sanitizer accepts and
+for every budgeted endpoint (budgets raise under app.testing)."""
+from conftest import ORIGIN
+
+
+def max_entry(date, tag=''):
+    """An entry at every list cap of sanitize_entry_data."""
+    return {
+        'date': date,
+        'dailyNote': 'note ' + tag,
+        'generalMood': 5,
+        'sleep': {'bedtime': '23:00', 'wake': '07:00', 'quality': 5},
+        'sleepHours': [True] * 24,
+        'caffeine': [{'time': '08:00'}] * 50,
+        'timeSlots': [
+            {'time': f'{hour:02d}:00',
+             'activities': [{'id': i, 'name': f'act{i}', 'plaisir': 5} for i in range(20)]}
+            for hour in range(24)
+        ],
+        'viciousCycles': [
+            {'id': cycle, 'situation': 'situation',
+             'emotions': [{'id': i, 'name': f'emotion{cycle}-{i}{tag}', 'score': i % 11} for i in range(20)],
+             'thoughts': [{'id': i, 'text': 'thought'} for i in range(20)],
+             'behaviors': [{'id': i, 'text': 'behavior'} for i in range(20)],
+             'consequences': [{'id': i, 'text': 'consequence'} for i in range(20)]}
+            for cycle in range(50)
+        ],
+    }
+
+
+def test_max_payload_save_within_budget(serv, client):
+    budget = serv.QUERY_BUDGETS['save_entry']
+    for tag in ('', 'edit', 'again'):
+        with serv.profiler.count_queries(budget=budget):
+            response = client.post('/api/save', json=max_entry('2024-05-02', tag), headers=ORIGIN)
+        assert response.status_code == 200
+    with serv.profiler.count_queries(budget=serv.QUERY_BUDGETS['delete_entry']):
+        assert client.delete('/api/delete/2024-05-02', headers=ORIGIN).status_code == 200
+
+
+# One request per budgeted endpoint, in an order that hits each one's worst
+# case: stats run first after saves (index rebuild), saves overwrite and
+# unarchive, the delete removes a maximal entry with its revisions.
+BUDGETED_REQUESTS = [
+    ('save_entry', 'user', 'POST', '/api/save', max_entry('2024-03-01')),
+    ('save_entry', 'user', 'POST', '/api/save', max_entry('2024-03-01', 'edit')),
+    ('save_entry', 'user', 'POST', '/api/save', max_entry('2024-03-02')),
+    ('get_series', 'user', 'GET', '/api/stats/series?resolution=day', None),
+    ('get_series', 'user', 'GET', '/api/stats/series?resolution=week&downsample=lttb&max_points=3', None),
+    ('get_emotion_stats', 'user', 'GET', '/api/stats/emotions?top=50', None),
+    ('get_emotion_stats', 'user', 'GET', '/api/stats/emotions?emotions=emotion1-1,emotion2-2', None),
+    ('save_settings', 'user', 'POST', '/api/settings', {'theme': 'dark', 'blob': 'x' * 90000}),
+    ('save_settings', 'user', 'POST', '/api/settings', {'theme': 'light'}),
+    ('get_settings', 'user', 'GET', '/api/settings', None),
+    ('get_entries', 'user', 'GET', '/api/entries', None),
+    ('get_entry', 'user', 'GET', '/api/entries/2024-03-01', None),
+    ('query_entries', 'user', 'GET', '/api/entries/query?generalMood.gte=1&caffeine.gte=1&from=2024-01-01', None),
+    ('list_revisions', 'user', 'GET', '/api/entries/2024-03-01/revisions', None),
+    ('export_json', 'user', 'GET', '/api/export/json', None),
+    ('export_csv', 'user', 'GET', '/api/export/csv', None),
+    ('export_pdf', 'user', 'GET', '/api/export/pdf', None),
+    ('export_sqlite', 'user', 'GET', '/api/export/sqlite', None),
+    ('export_sqlite', 'user', 'GET', '/api/export/sqlite', None),
+    ('delete_entry', 'user', 'DELETE', '/api/delete/2024-03-01', None),
+    ('list_users', 'admin', 'GET', '/api/admin/users', None),
+    ('get_user', 'admin', 'GET', '/api/admin/users/{user_id}', None),
+]
+
+
+def test_budgeted_routes_within_budget(serv, client):
+    """Every budgeted endpoint, driven under app.testing, where exceeding a
+    budget raises QueryBudgetExceeded out of the request."""
+    assert {endpoint for endpoint, *_ in BUDGETED_REQUESTS} == set(serv.QUERY_BUDGETS)
+
+    response = client.post('/api/admin/users', headers=ORIGIN,
+                           json={'username': 'budget', 'password': 'budget-pass-1'})
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['id']
+    user = serv.app.test_client()
+    assert user.post('/api/login', json={'username': 'budget', 'password': 'budget-pass-1'},
+                     headers=ORIGIN).status_code == 200
+
+    clients = {'user': user, 'admin': client}
+    for endpoint, who, method, url, body in BUDGETED_REQUESTS:
+        with serv.profiler.count_queries(budget=serv.QUERY_BUDGETS[endpoint]):
+            response = clients[who].open(url.format(user_id=user_id), method=method, json=body, headers=ORIGIN)
+        assert response.status_code == 200, (endpoint, response.status_code)
@@ -0,0 +1,44 @@
+"""Per-user payload cache: served while the data version is unchanged,
+rebuilt after a write, bounded in size, and answering If-None-Match."""
+from conftest import ORIGIN, new_user
+
+
+def test_lru_bounded_and_versioned(serv):
+    cache = serv.ReadCache(max_bytes=10)
+    cache.put(('entries', 1), 1, b'12345')
+    cache.put(('entries', 2), 1, b'12345')
+    assert cache.get(('entries', 1), 1) == b'12345'
+    cache.put(('settings', 1), 1, b'123')
+    assert cache.get(('entries', 2), 1) is None        # least recently used, evicted
+    assert cache.get(('entries', 1), 2) is None        # stale version
+    assert cache.size <= 10
+    cache.put(('big', 1), 1, b'x' * 11)
+    assert cache.get(('big', 1), 1) is None
+    cache.invalidate_user(1)
+    assert cache.size == 0
+
+
+def test_entries_served_from_cache_until_saved(serv, client):
+    user_id, user = new_user(serv, client, 'cached')
+    user.post('/api/save', json={'date': '2024-01-01', 'generalMood': 3}, headers=ORIGIN)
+
+    first = user.get('/api/entries')
+    hits = serv.read_cache.hits
+    second = user.get('/api/entries')
+    assert serv.read_cache.hits == hits + 1
+    assert second.data == first.data
+
+    assert user.get('/api/entries', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    user.post('/api/save', json={'date': '2024-01-01', 'generalMood': 7}, headers=ORIGIN)
+    third = user.get('/api/entries')
+    assert third.headers['ETag'] != first.headers['ETag']
+    assert third.get_json()['2024-01-01']['generalMood'] == 7
+    assert user.get('/api/entries', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_settings_cache_follows_saves(serv, client):
+    _, user = new_user(serv, client, 'cached-settings')
+    assert user.get('/api/settings').get_json() == {}
+    user.post('/api/settings', json={'theme': 'dark'}, headers=ORIGIN)
+    assert user.get('/api/settings').get_json() == {'theme': 'dark'}
@@ -0,0 +1,145 @@
+"""The replica follows a WAL primary by shipping committed frames, copies it
+in full only to start or resynchronise, and is rate-limited for non-WAL
+primaries."""
+import sqlite3
+
+from replication import Replicator
+
+
+def open_primary(path, wal=True):
+    conn = sqlite3.connect(path, isolation_level=None)
+    if wal:
+        conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE t (x, pad)')
+    return conn
+
+
+def insert(conn, *values):
+    for value in values:
+        conn.execute('INSERT INTO t VALUES (?, ?)', (value, 'p' * 500))
+
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+
+def check_replica(replicator):
+    conn = sqlite3.connect(f'file:{replicator.replica}?mode=ro', uri=True)
+    try:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    finally:
+        conn.close()
+    assert dump(replicator.replica) == dump(replicator.primary)
+
+
+def test_ships_wal_frames(tmp_path):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary)
+    replicator = Replicator(primary, str(tmp_path / 'replica' / 'journal.db'), min_copy_interval=60)
+    assert replicator.sync_once()
+    reader = sqlite3.connect(f'file:{replicator.replica}?mode=ro', uri=True)
+
+    for i in range(5):
+        insert(conn, *range(i * 20, i * 20 + 20))
+        conn.execute('DELETE FROM t WHERE x % 7 = 0')
+        assert replicator.sync_once()
+        assert reader.execute('SELECT count(*) FROM t').fetchone()[0] == \
+            conn.execute('SELECT count(*) FROM t').fetchone()[0]
+    assert not replicator.sync_once()
+    assert replicator.full_copies == 1
+    assert replicator.state()['mode'] == 'wal'
+    reader.close()
+    check_replica(replicator)
+
+
+def test_wal_restarts_after_shipping(tmp_path):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary)
+    replicator = Replicator(primary, str(tmp_path / 'replica.db'), restart_frames=5)
+    replicator.sync_once()
+    checkpoints = set()
+    for i in range(30):
+        insert(conn, i)
+        assert replicator.sync_once()
+        checkpoints.add(replicator._position['checkpoint'])
+        assert replicator._position['frame'] <= 6
+    assert len(checkpoints) > 3
+    assert replicator.full_copies == 1
+    check_replica(replicator)
+
+
+def test_new_leader_resumes(tmp_path):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary)
+    replica = str(tmp_path / 'replica.db')
+    leader = Replicator(primary, replica)
+    leader.sync_once()
+    leader._close()
+    insert(conn, 1, 2)
+
+    replicator = Replicator(primary, replica)
+    assert replicator.sync_once()
+    assert replicator.full_copies == 0
+    check_replica(replicator)
+
+
+def test_lost_wal_generation_copies(tmp_path):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary)
+    replica = str(tmp_path / 'replica.db')
+    leader = Replicator(primary, replica)
+    leader.sync_once()
+    leader._close()
+    # No leader holds the WAL: it restarts twice before the next one starts
+    for i in range(2):
+        insert(conn, i)
+        conn.execute('PRAGMA wal_checkpoint(RESTART)')
+    insert(conn, 3)
+
+    replicator = Replicator(primary, replica)
+    assert replicator.sync_once()
+    assert replicator.full_copies == 1
+    check_replica(replicator)
+
+
+def test_torn_apply_copies(tmp_path):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary)
+    replica = str(tmp_path / 'replica.db')
+    leader = Replicator(primary, replica)
+    leader.sync_once()
+    leader._close()
+    insert(conn, 1)
+    open(replica + '.dirty', 'w').close()
+
+    replicator = Replicator(primary, replica)
+    assert replicator.sync_once()
+    assert replicator.full_copies == 1
+    check_replica(replicator)
+
+
+def test_copies_rate_limited(tmp_path, monkeypatch):
+    primary = str(tmp_path / 'primary.db')
+    conn = open_primary(primary, wal=False)
+    replicator = Replicator(primary, str(tmp_path / 'replica' / 'journal.db'), min_copy_interval=60)
+
+    clock = [1000.0]
+    monkeypatch.setattr('replication.time.monotonic', lambda: clock[0])
+    assert replicator.sync_once()
+
+    conn.execute('INSERT INTO t VALUES (1, 1)')
+    assert not replicator.sync_once()
+    assert replicator.sync_once(force=True)
+
+    conn.execute('INSERT INTO t VALUES (2, 2)')
+    clock[0] += 30
+    assert not replicator.sync_once()
+    clock[0] += 31
+    assert replicator.sync_once()
+    assert sqlite3.connect(replicator.replica).execute('SELECT count(*) FROM t').fetchone()[0] == 2
+    assert not replicator.sync_once()
+    assert replicator.state()['mode'] == 'copy'
@@ -0,0 +1,62 @@
+"""Compressed request bodies: per-path decoded limits, and body errors
+reaching the client as 400/413 rather than a handler's 500."""
+import io
+import gzip
+import json
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import request_decompression
+from conftest import ORIGIN
+
+
+def gzipped(data):
+    return gzip.compress(json.dumps(data).encode())
+
+
+def post_gzip(client, url, body):
+    return client.post(url, data=body, headers={**ORIGIN, 'Content-Type': 'application/json',
+                                                'Content-Encoding': 'gzip'})
+
+
+def test_compressed_settings_saved(serv, client):
+    assert post_gzip(client, '/api/settings', gzipped({'theme': 'dark'})).status_code == 200
+    assert client.get('/api/settings').get_json()['theme'] == 'dark'
+
+
+def test_body_errors_not_turned_into_500(serv, client):
+    big = gzipped({'blob': 'x' * 300 * 1024})
+    assert post_gzip(client, '/api/settings', big).status_code == 413
+    assert post_gzip(client, '/api/settings', b'not gzip').status_code == 400
+    assert post_gzip(client, '/api/admin/users', big).status_code == 413
+    # Far below the entry limit, far above the login one
+    login = gzipped({'username': 'admin', 'password': 'x' * 20000})
+    assert post_gzip(serv.app.test_client(), '/api/login', login).status_code == 413
+
+
+def test_path_limits_longest_prefix_wins(serv):
+    decompressor = serv.app.wsgi_app
+    assert decompressor.decoded_limit('/api/login') == 16 * 1024
+    assert decompressor.decoded_limit('/api/admin/users/3') == 64 * 1024
+    assert decompressor.decoded_limit('/api/admin/users/bulk') == serv.app.config['MAX_CONTENT_LENGTH']
+    assert decompressor.decoded_limit('/api/import/sqlite') == serv.MAX_DECOMPRESSED_LENGTH
+    assert decompressor.decoded_limit('/api/save') == serv.app.config['MAX_CONTENT_LENGTH']
+
+
+def test_brotli_output_bounded_per_read():
+    brotli = pytest.importorskip('brotli')
+    if request_decompression.brotli is None:
+        pytest.skip("brotli without output_buffer_limit")
+    body = brotli.compress(b'\0' * (64 * 1024 * 1024))
+    stream = request_decompression.DecompressingStream(io.BytesIO(body), 'br', None, 1024 * 1024)
+    buffer = bytearray(4096)
+    largest = 0
+    with pytest.raises(RequestEntityTooLarge):
+        while stream.readinto(buffer):
+            largest = max(largest, len(stream._buffer))
+    assert stream.decoded_bytes < 2 * 1024 * 1024
+    assert largest < 256 * 1024
+
+    stream = request_decompression.DecompressingStream(io.BytesIO(brotli.compress(b'abc' * 100000)), 'br', None, None)
+    assert io.BufferedReader(stream).read() == b'abc' * 100000
@@ -0,0 +1,34 @@
+"""Profiler switches: the config file is re-read at most once per
+check_interval, and an update is visible at once in the writing process."""
+import json
+
+from request_profiler import ProfilerConfig
+
+
+def test_config_checked_once_per_interval(tmp_path, monkeypatch):
+    import request_profiler
+    now = [100.0]
+    monkeypatch.setattr(request_profiler.time, 'monotonic', lambda: now[0])
+    stats = []
+    stat = request_profiler.os.stat
+    monkeypatch.setattr(request_profiler.os, 'stat', lambda path: stats.append(path) or stat(path))
+
+    path = tmp_path / 'profiler.json'
+    config = ProfilerConfig(str(path), check_interval=1.0)
+    assert config.get() == ProfilerConfig.DEFAULTS
+
+    path.write_text(json.dumps({'enabled': True}))
+    for _ in range(5):
+        assert config.get()['enabled'] is False
+    assert len(stats) == 1
+
+    now[0] += 1.0
+    assert config.get()['enabled'] is True
+    assert len(stats) == 2
+
+    assert config.update({'sample_rate': 0.5})['sample_rate'] == 0.5
+    assert ProfilerConfig(str(path)).get() == {**ProfilerConfig.DEFAULTS, 'enabled': True, 'sample_rate': 0.5}
+
+    path.unlink()
+    now[0] += 1.0
+    assert config.get() == ProfilerConfig.DEFAULTS
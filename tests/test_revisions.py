@@ -0,0 +1,63 @@
+"""Entry history: revisions are recorded on save and delete, rebuilt from
+full snapshots plus deltas, and restorable."""
+import pytest
+
+from conftest import ORIGIN, new_user
+
+DATE = '2024-06-01'
+
+
+@pytest.fixture
+def no_coalesce(serv, monkeypatch):
+    monkeypatch.setattr(serv, 'REVISION_COALESCE_SECONDS', 0)
+
+
+def save(user, **content):
+    response = user.post('/api/save', json={'date': DATE, **content}, headers=ORIGIN)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def revision(user, seq):
+    return user.get(f'/api/entries/{DATE}/revisions/{seq}').get_json()['content']
+
+
+def test_history_and_restore(serv, client, no_coalesce):
+    user_id, user = new_user(serv, client, 'historian')
+    for i in range(25):
+        save(user, generalMood=i % 10, dailyNote=f'note {i}')
+    revisions = user.get(f'/api/entries/{DATE}/revisions').get_json()['revisions']
+    assert [r['revision'] for r in revisions] == list(range(25, 0, -1))
+    assert {r['kind'] for r in revisions} == {'full', 'delta'}
+    for seq in (1, 2, 20, 21, 25):
+        assert revision(user, seq) == {'date': DATE, 'generalMood': (seq - 1) % 10, 'dailyNote': f'note {seq - 1}'}
+    assert user.get(f'/api/entries/{DATE}/revisions/26').status_code == 404
+
+    restored = user.post(f'/api/entries/{DATE}/revisions/3/restore', headers=ORIGIN).get_json()
+    assert restored['data'] == revision(user, 3)
+    assert user.get(f'/api/entries/{DATE}').get_json()['dailyNote'] == 'note 2'
+    assert revision(user, 26) == revision(user, 3)
+    series = user.get('/api/stats/series?resolution=day&metrics=mood').get_json()['series']['mood']
+    assert series == [[DATE, 2.0]]
+
+
+def test_delete_then_restore(serv, client, no_coalesce):
+    user_id, user = new_user(serv, client, 'historian2')
+    save(user, generalMood=4, dailyNote='kept')
+    assert user.delete(f'/api/delete/{DATE}', headers=ORIGIN).status_code == 200
+    revisions = user.get(f'/api/entries/{DATE}/revisions').get_json()['revisions']
+    assert [r['kind'] for r in revisions] == ['deleted', 'full']
+    assert user.post(f'/api/entries/{DATE}/revisions/2/restore', headers=ORIGIN).status_code == 400
+
+    assert user.post(f'/api/entries/{DATE}/revisions/1/restore', headers=ORIGIN).status_code == 200
+    assert user.get(f'/api/entries/{DATE}').get_json() == {'date': DATE, 'generalMood': 4, 'dailyNote': 'kept'}
+
+
+def test_quick_saves_coalesce(serv, client):
+    user_id, user = new_user(serv, client, 'historian3')
+    for note in ('a', 'ab', 'abc', 'abcd'):
+        save(user, dailyNote=note)
+    revisions = user.get(f'/api/entries/{DATE}/revisions').get_json()['revisions']
+    assert [r['revision'] for r in revisions] == [2, 1]
+    assert revision(user, 1) == {'date': DATE, 'dailyNote': 'a'}
+    assert revision(user, 2) == {'date': DATE, 'dailyNote': 'abcd'}
@@ -0,0 +1,38 @@
+"""A save whose sanitised content hashes to the stored entry's is answered
+without writing: no revision, change event or data_version bump."""
+from conftest import ORIGIN, login, new_user
+
+
+def state(serv, user_id):
+    with serv.app.app_context():
+        return (serv.get_data_version(user_id),
+                serv.EntryRevision.query.filter_by(user_id=user_id).count(),
+                serv.ChangeEvent.query.filter_by(user_id=user_id).count())
+
+
+def test_identical_save_is_a_no_op(serv, client):
+    user_id, user = new_user(serv, client, 'unchanged')
+    entry = {'date': '2024-07-01', 'generalMood': '6', 'dailyNote': 'same'}
+    first = user.post('/api/save', json=entry, headers=ORIGIN).get_json()
+    assert 'unchanged' not in first
+    before = state(serv, user_id)
+
+    # Same content as sanitised, even though the client sent a string mood
+    again = user.post('/api/save', json={**entry, 'generalMood': 6}, headers=ORIGIN).get_json()
+    assert again['unchanged'] is True
+    assert again['hash'] == first['hash'] == user.get('/api/entries/2024-07-01').headers['X-Entry-Hash']
+    assert again['data'] == first['data']
+    assert state(serv, user_id) == before
+
+
+def test_save_after_change_elsewhere_is_written(serv, client):
+    """Another device edits the entry; resending the earlier body restores it."""
+    user_id, phone = new_user(serv, client, 'two-devices')
+    laptop = login(serv, 'two-devices', 'test-pass-123')
+    entry = {'date': '2024-07-02', 'dailyNote': 'phone'}
+    phone.post('/api/save', json=entry, headers=ORIGIN)
+    laptop.post('/api/save', json={**entry, 'dailyNote': 'laptop'}, headers=ORIGIN)
+
+    response = phone.post('/api/save', json=entry, headers=ORIGIN).get_json()
+    assert 'unchanged' not in response
+    assert phone.get('/api/entries/2024-07-02').get_json()['dailyNote'] == 'phone'
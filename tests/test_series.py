@@ -0,0 +1,77 @@
+"""/api/stats/series: rollups kept up to date by saves, LTTB downsampling."""
+from datetime import date, timedelta
+
+from conftest import ORIGIN, new_user
+
+START = date(2024, 1, 1)
+DAYS = 120
+
+
+def day(i):
+    return (START + timedelta(days=i)).isoformat()
+
+
+def series(user, **params):
+    query = '&'.join(f'{k}={v}' for k, v in params.items())
+    response = user.get('/api/stats/series?' + query)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def stored_points(serv, user_id):
+    with serv.app.app_context():
+        return sorted((p.resolution, p.bucket, p.mood_sum, p.mood_count, p.sleep_count)
+                      for p in serv.SeriesPoint.query.filter_by(user_id=user_id))
+
+
+def test_lttb_keeps_extremes(serv):
+    points = [(x, 5.0) for x in range(100)]
+    points[40] = (40, 10.0)
+    points[70] = (70, 0.0)
+    sampled = serv.lttb(points, 10)
+    assert len(sampled) == 10
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert (40, 10.0) in sampled and (70, 0.0) in sampled
+    assert serv.lttb(points[:5], 10) == points[:5]
+
+
+def test_downsampled_series_follows_edits(serv, client):
+    user_id, user = new_user(serv, client, 'charts')
+    for i in range(DAYS):
+        mood = 9 if i == 50 else 4 + i % 3
+        user.post('/api/save', json={'date': day(i), 'generalMood': mood}, headers=ORIGIN)
+
+    full = series(user, resolution='day', metrics='mood', max_points=DAYS)
+    assert len(full['series']['mood']) == DAYS
+
+    sampled = series(user, resolution='day', metrics='mood', max_points=30, downsample='lttb')['series']['mood']
+    assert len(sampled) == 30
+    assert sampled[0] == [day(0), 4.0] and sampled[-1] == [day(DAYS - 1), full['series']['mood'][-1][1]]
+    assert [day(50), 9.0] in sampled
+
+    # Move the spike: the cached response is dropped and the rollups follow
+    user.post('/api/save', json={'date': day(50), 'generalMood': 5}, headers=ORIGIN)
+    user.post('/api/save', json={'date': day(80), 'generalMood': 1}, headers=ORIGIN)
+    sampled = series(user, resolution='day', metrics='mood', max_points=30, downsample='lttb')['series']['mood']
+    assert [day(50), 9.0] not in sampled
+    assert [day(80), 1.0] in sampled
+
+    months = dict(series(user, resolution='month', metrics='mood')['series']['mood'])
+    january = [9 if i == 50 else 4 + i % 3 for i in range(31)]
+    assert months['2024-01-01'] == round(sum(january) / 31, 2)
+    assert series(user, resolution='auto', max_points=10)['resolution'] == 'month'
+
+
+def test_incremental_rollups_match_rebuild(serv, client):
+    user_id, user = new_user(serv, client, 'charts-rebuild')
+    for i in range(20):
+        user.post('/api/save', json={'date': day(i), 'generalMood': 3 + i % 5,
+                                     'sleepHours': [True] * (i % 8)}, headers=ORIGIN)
+    user.post('/api/save', json={'date': day(3), 'generalMood': ''}, headers=ORIGIN)
+    user.post('/api/save', json={'date': day(9), 'generalMood': 10, 'sleepHours': []}, headers=ORIGIN)
+    user.delete(f'/api/entries/{day(12)}', headers=ORIGIN)
+    incremental = stored_points(serv, user_id)
+
+    with serv.app.app_context():
+        serv.rebuild_series(user_id)
+    assert stored_points(serv, user_id) == incremental
@@ -0,0 +1,70 @@
+"""A SQLite export imported into another account reproduces its entries,
+chart series and emotion rollups; re-importing it changes nothing."""
+from io import BytesIO
+
+from conftest import ORIGIN, new_user
+
+
+def day(date, mood, note, *emotions):
+    return {'date': date, 'generalMood': mood, 'dailyNote': note, 'sleep': {'quality': mood},
+            'viciousCycles': [{'id': 0, 'emotions': [{'id': i, 'name': name, 'score': score}
+                                                     for i, (name, score) in enumerate(emotions)]}]}
+
+
+def rollups(serv, user_id):
+    with serv.app.app_context():
+        return (sorted((p.resolution, p.bucket, p.mood_sum, p.mood_count)
+                       for p in serv.SeriesPoint.query.filter_by(user_id=user_id)),
+                sorted((s.bucket, s.name, s.count, s.score_sum)
+                       for s in serv.EmotionStat.query.filter_by(user_id=user_id)),
+                sorted((p.bucket, p.a, p.b, p.count) for p in serv.EmotionPair.query.filter_by(user_id=user_id)))
+
+
+def import_file(user, data):
+    return user.post('/api/import/sqlite', data={'file': (BytesIO(data), 'journal.sqlite')},
+                     content_type='multipart/form-data', headers=ORIGIN)
+
+
+def test_export_import_round_trip(serv, client):
+    source_id, source = new_user(serv, client, 'exporter')
+    days = [
+        day('2021-03-01', 4, 'archived', ('fear', 3)),
+        day('2021-03-02', 6, 'archived too', ('joy', 5), ('fear', 1)),
+        day('2024-05-01', 7, 'same on both sides', ('joy', 6)),
+        day('2024-05-02', 3, 'rewritten', ('anger', 4), ('shame', 2)),
+        day('2024-05-03', 8, 'new', ('joy', 8)),
+    ]
+    for data in days:
+        assert source.post('/api/save', json=data, headers=ORIGIN).status_code == 200
+
+    target_id, target = new_user(serv, client, 'importer')
+    for data in (days[2], day('2021-03-02', 2, 'older copy', ('fear', 9)), day('2024-05-02', 1, 'older')):
+        target.post('/api/save', json=data, headers=ORIGIN)
+    with serv.app.app_context():
+        serv.archive_old_entries(max_age_days=365)
+        version = serv.get_data_version(target_id)
+
+    response = source.get('/api/export/sqlite')
+    assert response.status_code == 200
+    export = response.data
+
+    result = import_file(target, export).get_json()
+    assert (result['imported'], result['unchanged'], result['skipped']) == (4, 1, 0)
+    assert target.get('/api/entries').get_json() == source.get('/api/entries').get_json()
+    assert rollups(serv, target_id) == rollups(serv, source_id)
+    with serv.app.app_context():
+        # One change event for the entries (plus one for the settings)
+        assert serv.get_data_version(target_id) - version <= 2
+        # Only the unchanged day stays archived
+        assert [(a.year, list(a.load())) for a in serv.EntryArchive.query.filter_by(user_id=target_id)] == \
+            [(2024, ['2024-05-01'])]
+        assert serv.revision_content(target_id, '2024-05-02', 2)['dailyNote'] == 'rewritten'
+        assert serv.revision_content(target_id, '2024-05-02', 1)['dailyNote'] == 'older'
+        assert serv.revision_content(target_id, '2021-03-01', 1)['dailyNote'] == 'archived'
+        assert serv.revision_content(target_id, '2021-03-02', 2)['dailyNote'] == 'archived too'
+        version = serv.get_data_version(target_id)
+
+    result = import_file(target, export).get_json()
+    assert (result['imported'], result['unchanged']) == (0, 5)
+    with serv.app.app_context():
+        assert serv.get_data_version(target_id) == version